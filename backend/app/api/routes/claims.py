@@ -1,118 +1,454 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from datetime import datetime, timezone
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import JSONResponse
+from typing import Any, Dict, List, Optional, Set, Tuple
 from pydantic import BaseModel
-from app.core.db import execute_query, execute_one
-from app.schemas.models import Claim, ClaimCreate, ClaimStatus, Damage
+from app.core import archive, embedded, fingerprints, triage
+from app.core.audit import audit_writer
+from app.core.config import settings
+from app.core.db import (
+    execute_query, execute_one, find_many, insert_one, update_one_matched,
+    next_sequence, bulk_update
+)
+from app.core.documents import (
+    CLAIM_PATHS, claim_from_document, claim_to_document, claim_values,
+    damage_from_document, is_live, live_damages, projection
+)
+from app.core.fields import parse_fields, sparse_response
+from app.core.idempotency import idempotency_store
+from app.core.singleflight import reads
+from app.schemas.models import (
+    Claim, ClaimBatchResult, ClaimCreate, ClaimDuplicate, ClaimEvent, ClaimPriority,
+    ClaimStatus, ClaimStatusResult, Damage
+)
 
 router = APIRouter()
+# Métodos sobre la colección (/claims:batchGet): el prefijo se añade en main.py
+collection_router = APIRouter()
 
 class ClaimStatusUpdate(BaseModel):
     status: ClaimStatus
 
 
+class ClaimBatchGet(BaseModel):
+    ids: List[int]
+
+
+class ClaimStatusBatchUpdate(BaseModel):
+    ids: List[int]
+    status: ClaimStatus
+
+
+async def _get_damages(
+    claim_doc: Dict[str, Any], read_method: Optional[str] = None
+) -> List[Damage]:
+    """Daños de una reclamación según el modo de almacenamiento"""
+    if embedded.is_enabled():
+        return await embedded.load_damages(claim_doc, read_method)
+
+    damages_data = await execute_query(
+        "damages", live_damages({"claim_id": claim_doc["_id"]}), read_method=read_method
+    )
+    return [damage_from_document(d) for d in damages_data]
+
+
+async def _get_damages_many(
+    claim_docs: List[Dict[str, Any]]
+) -> Dict[int, List[Damage]]:
+    """Daños de varias reclamaciones con una única consulta $in"""
+    damages: Dict[int, List[Damage]] = {doc["_id"]: [] for doc in claim_docs}
+    if embedded.is_enabled():
+        for doc in claim_docs:
+            damages[doc["_id"]] = [
+                damage_from_document(d, doc["_id"])
+                for d in doc.get("damages", [])
+                if is_live(d)
+            ]
+        pending = [doc["_id"] for doc in claim_docs if doc.get("damages_spilled")]
+    else:
+        pending = list(damages)
+
+    if pending:
+        for damage_doc in await find_many(
+            "damages", live_damages({"claim_id": {"$in": pending}})
+        ):
+            damages[damage_doc["claim_id"]].append(damage_from_document(damage_doc))
+    return damages
+
+
 @router.get("/", response_model=List[Claim])
-async def get_claims():
-    """Obtener todas las reclamaciones"""
-    claims_query = "SELECT id, title, description, status FROM claims ORDER BY id"
-    claims_data = await execute_query(claims_query)
-    
+async def get_claims(fields: Optional[str] = None):
+    """Obtener todas las reclamaciones (?fields=id,title,status limita los campos)"""
+    names = parse_fields(fields, Claim)
+    if names is not None:
+        return await _get_claims_fields(names)
+
+    # Los listados toleran réplicas con algo de retraso (READ_PREFERENCES)
+    claims_data = await execute_query("claims", read_method="claims.list")
+
     claims = []
-    for claim_row in claims_data:
-        claim_id, title, description, status = claim_row
-        
+    for claim_doc in claims_data:
         # Obtener daños para cada claim
-        damages_query = "SELECT id, part, severity, image_url, price, score FROM damages WHERE claim_id = %s"
-        damages_data = await execute_query(damages_query, (claim_id,))
-        
-        damages = [
-            Damage(
-                id=d[0], part=d[1], severity=d[2], 
-                image_url=d[3], price=d[4], score=d[5], claim_id=claim_id
-            ) for d in damages_data
-        ]
-        
-        claims.append(Claim(
-            id=claim_id, title=title, description=description, 
-            status=status, damages=damages
-        ))
-    
+        damages = await _get_damages(claim_doc, "claims.list")
+        claims.append(claim_from_document(claim_doc, damages))
+
     return claims
 
 
+async def _get_claims_fields(names: Tuple[str, ...]) -> JSONResponse:
+    """Listado con solo los campos pedidos, proyectados en la consulta"""
+    claims_projection = projection(names, CLAIM_PATHS)
+    if "damages" in names:
+        claims_projection["damages_spilled"] = 1
+    claims_data = await find_many(
+        "claims", {}, projection=claims_projection, read_method="claims.list"
+    )
+
+    rows = []
+    for claim_doc in claims_data:
+        # Los daños solo se consultan si se han pedido
+        damages = (
+            await _get_damages(claim_doc, "claims.list") if "damages" in names else []
+        )
+        rows.append(claim_values(claim_doc, damages))
+
+    return sparse_response(Claim, names, rows)
+
+
+@collection_router.post(
+    "/claims:batchGet", response_model=List[ClaimBatchResult], tags=["claims"]
+)
+async def batch_get_claims(payload: ClaimBatchGet):
+    """Obtener varias reclamaciones por ID en una sola llamada (en el orden pedido)"""
+    if len(payload.ids) > settings.CLAIMS_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.CLAIMS_BATCH_MAX} ids per batch"
+        )
+
+    # 1) Una consulta para las reclamaciones y otra para sus daños
+    unique_ids = list(dict.fromkeys(payload.ids))
+    claim_docs = (
+        await find_many("claims", {"_id": {"$in": unique_ids}}) if unique_ids else []
+    )
+    damages = await _get_damages_many(claim_docs)
+    claims = {
+        doc["_id"]: claim_from_document(doc, damages[doc["_id"]]) for doc in claim_docs
+    }
+
+    # 2) Los que no están en la colección activa pueden estar archivados
+    claims.update(
+        await archive.load_archived_claims([i for i in unique_ids if i not in claims])
+    )
+
+    # 3) Resultado en el orden pedido, marcando los IDs que no existen
+    return [
+        ClaimBatchResult(id=i, found=i in claims, claim=claims.get(i))
+        for i in payload.ids
+    ]
+
+
+@collection_router.get(
+    "/claims:triage", response_model=List[ClaimPriority], tags=["claims"]
+)
+async def triage_claims(k: int = 50):
+    """
+    Las k reclamaciones PENDING más prioritarias según la severidad, la puntuación
+    y el precio de sus daños (pesos TRIAGE_* de la configuración)
+    """
+    if not 1 <= k <= settings.TRIAGE_MAX_K:
+        raise HTTPException(
+            status_code=400, detail=f"k must be between 1 and {settings.TRIAGE_MAX_K}"
+        )
+    if not triage.available():
+        raise HTTPException(status_code=503, detail="Triage requires numpy")
+
+    ranked = await triage.triage(k)
+    return [ClaimPriority(id=i, priority=p, damage_count=n) for i, p, n in ranked]
+
+
 @router.get("/{claim_id}", response_model=Claim)
 async def get_claim(claim_id: int):
     """Obtener una reclamación específica"""
-    claim_query = "SELECT id, title, description, status FROM claims WHERE id = %s"
-    claim_data = await execute_one(claim_query, (claim_id,))
-    
-    if not claim_data:
+    # Peticiones simultáneas de la misma reclamación comparten una única lectura
+    return await reads.do(
+        ("claims", "get_claim", claim_id),
+        lambda: _load_claim(claim_id),
+        tags=("claims", "damages"),
+    )
+
+
+async def _load_claim(claim_id: int) -> Claim:
+    claim_doc = await execute_one("claims", {"_id": claim_id})
+
+    if not claim_doc:
+        # Las reclamaciones cerradas hace tiempo se leen del archivo
+        archived = await archive.load_archived_claim(claim_id)
+        if archived:
+            return archived
+        raise HTTPException(status_code=404, detail="Claim not found")
+
+    # Obtener daños (en modo embebido ya vienen en el documento)
+    damages = await _get_damages(claim_doc)
+
+    return claim_from_document(claim_doc, damages)
+
+
+@router.get("/{claim_id}/history", response_model=List[ClaimEvent])
+async def get_claim_history(claim_id: int):
+    """Historial de cambios de estado de una reclamación"""
+    events = await find_many("claim_events", {"claim_id": claim_id}, sort=[("at", 1)])
+    # Eventos aún en el buffer del escritor de auditoría
+    events += audit_writer.pending(claim_id)
+
+    if (
+        not events and not await execute_one("claims", {"_id": claim_id})
+        and not await archive.load_archived_claim(claim_id)
+    ):
+        raise HTTPException(status_code=404, detail="Claim not found")
+
+    return [ClaimEvent(**e) for e in events]
+
+
+@router.get("/{claim_id}/duplicates", response_model=List[ClaimDuplicate])
+async def get_claim_duplicates(claim_id: int, limit: int = 10):
+    """
+    Posibles duplicados de una reclamación: misma huella de daños (exact) o
+    similitud MinHash estimada de al menos DUPLICATES_MIN_SIMILARITY
+    """
+    if not 1 <= limit <= settings.DUPLICATES_MAX_RESULTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be between 1 and {settings.DUPLICATES_MAX_RESULTS}",
+        )
+
+    duplicates = await fingerprints.find_duplicates(claim_id, limit)
+    if duplicates is None:
         raise HTTPException(status_code=404, detail="Claim not found")
-    
-    # Obtener daños
-    damages_query = "SELECT id, part, severity, image_url, price, score, claim_id FROM damages WHERE claim_id = %s"
-    damages_data = await execute_query(damages_query, (claim_id,))
-    
-    damages = [
-        Damage(
-            id=d[0], part=d[1], severity=d[2], 
-            image_url=d[3], price=d[4], score=d[5], claim_id=d[6]
-        ) for d in damages_data
+
+    return [
+        ClaimDuplicate(id=i, exact=exact, similarity=score)
+        for i, exact, score in duplicates
     ]
-    
-    return Claim(
-        id=claim_data[0], title=claim_data[1], 
-        description=claim_data[2], status=claim_data[3], damages=damages
-    )
 
 
 @router.post("/", response_model=Claim, status_code=201)
-async def create_claim(claim: ClaimCreate):
-    """Crear una nueva reclamación"""
-    query = """
-    INSERT INTO claims (title, description, status) 
-    VALUES (%s, %s, %s) RETURNING id
-    """
-    result = await execute_one(query, (claim.title, claim.description, claim.status))
-    
+async def create_claim(
+    claim: ClaimCreate,
+    response: Response,
+    actor: Optional[str] = Header(None, alias="X-User"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """Crear una reclamación (reintentos con la misma Idempotency-Key no duplican)"""
+    result, replayed = await idempotency_store.run(
+        "claims", idempotency_key, claim.model_dump(mode="json"),
+        lambda: _insert_claim(claim, actor)
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _insert_claim(claim: ClaimCreate, actor: Optional[str]) -> Claim:
+    claim_id = await next_sequence("claims")
+    document = {
+        "_id": claim_id,
+        **claim_to_document(claim),
+        "status_changed_at": datetime.now(timezone.utc),
+    }
+    if embedded.is_enabled():
+        document["damages"] = []
+
+    result = await insert_one("claims", document)
+
     if not result:
         raise HTTPException(status_code=500, detail="Error creating claim")
-    
-    return Claim(id=result[0], **claim.model_dump(), damages=[])
+
+    audit_writer.record(claim_id, None, claim.status.value, actor)
+
+    return Claim(id=claim_id, **claim.model_dump(), damages=[])
+
+
+def _transition_conflict(
+    current_status: str, new_status: str, description: Optional[str], high_exists: bool
+) -> Optional[str]:
+    """Reglas de un cambio de estado: devuelve el motivo del conflicto o None"""
+    # Regla: CANCELED solo desde PENDING
+    if new_status == "CANCELED" and current_status != "PENDING":
+        return "Only PENDING claims can be CANCELED"
+
+    # Regla: si hay algún daño HIGH, description > 100 para FINALIZED
+    if (
+        new_status == "FINALIZED"
+        and high_exists
+        and (not description or len(description) <= 100)
+    ):
+        return (
+            "Claims with HIGH severity damages require description > 100 chars "
+            "to be FINALIZED"
+        )
+
+    return None
+
+
+async def _high_damage_claims(claim_docs: List[Dict[str, Any]]) -> Set[int]:
+    """IDs de las reclamaciones con algún daño HIGH (una única consulta $in)"""
+    high: Set[int] = set()
+    if embedded.is_enabled():
+        high = {
+            doc["_id"]
+            for doc in claim_docs
+            if any(
+                d.get("severity") == "HIGH" and is_live(d)
+                for d in doc.get("damages", [])
+            )
+        }
+        pending = [
+            doc["_id"]
+            for doc in claim_docs
+            if doc.get("damages_spilled") and doc["_id"] not in high
+        ]
+    else:
+        pending = [doc["_id"] for doc in claim_docs]
+
+    if pending:
+        found = await find_many(
+            "damages", live_damages({"claim_id": {"$in": pending}, "severity": "HIGH"}),
+            projection={"claim_id": 1}
+        )
+        high.update(d["claim_id"] for d in found)
+    return high
 
 
 @router.patch("/{claim_id}/status", response_model=Claim)
-async def update_claim_status(claim_id: int, payload: ClaimStatusUpdate):
+async def update_claim_status(
+    claim_id: int,
+    payload: ClaimStatusUpdate,
+    actor: Optional[str] = Header(None, alias="X-User"),
+):
     # 1) Traer claim actual
-    row = await execute_one("SELECT id, title, description, status FROM claims WHERE id = %s", (claim_id,))
-    if not row:
+    claim_doc = await execute_one("claims", {"_id": claim_id})
+    if not claim_doc:
         raise HTTPException(status_code=404, detail="Claim not found")
 
-    _id, title, description, current_status = row
+    description = claim_doc.get("description")
+    current_status = claim_doc["status"]
     new_status = payload.status.value  # Enum -> str
 
-    # 2) Regla: CANCELED solo desde PENDING
-    if new_status == "CANCELED" and current_status != "PENDING":
-        raise HTTPException(status_code=409, detail="Only PENDING claims can be CANCELED")
-
-    # 3) Regla: si hay algún daño HIGH, description > 100 para FINALIZED
+    # 2) Reglas de negocio (solo FINALIZED necesita mirar los daños)
+    high_exists = False
     if new_status == "FINALIZED":
-        high_exists = await execute_one(
-            "SELECT 1 FROM damages WHERE claim_id = %s AND severity = %s LIMIT 1",
-            (claim_id, "HIGH")
-        )
-        if high_exists and (not description or len(description) <= 100):
-            raise HTTPException(
-                status_code=409,
-                detail="Claims with HIGH severity damages require description > 100 chars to be FINALIZED"
+        if embedded.is_enabled():
+            damages = await embedded.load_damages(claim_doc)
+            high_exists = any(d.severity == "HIGH" for d in damages)
+        else:
+            high_exists = bool(
+                await execute_one(
+                    "damages", live_damages({"claim_id": claim_id, "severity": "HIGH"})
+                )
             )
 
-    # 4) Persistir estado
-    updated = await execute_one(
-        "UPDATE claims SET status = %s WHERE id = %s RETURNING id",
-        (new_status, claim_id)
+    conflict = _transition_conflict(
+        current_status, new_status, description, high_exists
+    )
+    if conflict:
+        raise HTTPException(status_code=409, detail=conflict)
+
+    # 3) Persistir estado
+    updated = await update_one_matched(
+        "claims",
+        {"_id": claim_id},
+        {"status": new_status, "status_changed_at": datetime.now(timezone.utc)},
     )
     if not updated:
         raise HTTPException(status_code=500, detail="Error updating claim status")
 
+    # 4) Auditoría (se escribe en lote, fuera del camino de la petición)
+    audit_writer.record(claim_id, current_status, new_status, actor)
+
     # 5) Devolver claim completo (reutiliza la lógica del endpoint get_claim)
     return await get_claim(claim_id)
+
+
+@collection_router.post(
+    "/claims:batchUpdateStatus", response_model=List[ClaimStatusResult], tags=["claims"]
+)
+async def batch_update_claim_status(
+    payload: ClaimStatusBatchUpdate, actor: Optional[str] = Header(None, alias="X-User")
+):
+    """Cambiar el estado de varias reclamaciones con las reglas de una sola"""
+    if len(payload.ids) > settings.CLAIMS_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.CLAIMS_BATCH_MAX} ids per batch"
+        )
+
+    ids = list(dict.fromkeys(payload.ids))
+    new_status = payload.status.value
+
+    # 1) Una consulta de precondiciones (más una de daños HIGH si se pasa a FINALIZED)
+    claims_projection = {"status": 1, "description": 1}
+    if new_status == "FINALIZED" and embedded.is_enabled():
+        claims_projection.update(
+            {"damages.severity": 1, "damages.deleted_at": 1, "damages_spilled": 1}
+        )
+    claim_docs = (
+        await find_many("claims", {"_id": {"$in": ids}}, projection=claims_projection)
+        if ids
+        else []
+    )
+    high = await _high_damage_claims(claim_docs) if new_status == "FINALIZED" else set()
+
+    # 2) Reglas por reclamación
+    results: Dict[int, ClaimStatusResult] = {}
+    previous: Dict[int, str] = {}
+    for doc in claim_docs:
+        conflict = _transition_conflict(
+            doc["status"], new_status, doc.get("description"), doc["_id"] in high
+        )
+        if conflict:
+            results[doc["_id"]] = ClaimStatusResult(
+                id=doc["_id"], result="conflict", detail=conflict
+            )
+        else:
+            previous[doc["_id"]] = doc["status"]
+
+    # 3) Un único bulk_write; cada update exige que el estado no haya cambiado desde la
+    # lectura
+    if previous:
+        changed_at = datetime.now(timezone.utc)
+        updates = [
+            (
+                {"_id": i, "status": s},
+                {"status": new_status, "status_changed_at": changed_at},
+            )
+            for i, s in previous.items()
+        ]
+        matched = await bulk_update("claims", updates)
+        if matched < len(updates):
+            # Se vuelve a leer por id: cada reclamación se resuelve con su propio estado
+            docs = await find_many(
+                "claims", {"_id": {"$in": list(previous)}}, projection={"status": 1}
+            )
+            current = {doc["_id"]: doc["status"] for doc in docs}
+            for claim_id in list(previous):
+                if claim_id not in current:
+                    del previous[claim_id]  # borrada entretanto: not_found
+                elif current[claim_id] != new_status:
+                    results[claim_id] = ClaimStatusResult(
+                        id=claim_id, result="conflict",
+                        detail="Claim status changed concurrently",
+                    )
+                    del previous[claim_id]
+
+    # 4) Auditoría (una vez por reclamación) y resultado por id en el orden pedido,
+    #    con una entrada por id pedido aunque se repita, como en batchGet
+    for claim_id, current_status in previous.items():
+        results.setdefault(claim_id, ClaimStatusResult(id=claim_id, result="updated"))
+        audit_writer.record(claim_id, current_status, new_status, actor)
+
+    return [
+        results.get(i)
+        or ClaimStatusResult(id=i, result="not_found", detail="Claim not found")
+        for i in payload.ids
+    ]
@@ -1,53 +1,183 @@
-from fastapi import APIRouter, HTTPException, Response
-from typing import List
-from app.core.db import execute_query, execute_one
-from app.schemas.models import Damage, DamageCreate
+import contextlib
+import os
+import re
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import FileResponse
+from typing import List, Optional, Tuple
+from app.core import embedded
+from app.core.config import settings
+from app.core.deadline import unbounded
+from app.core.db import (
+    execute_query, execute_one, find_one, find_many, insert_one, next_sequence
+)
+from app.core.documents import (
+    DAMAGE_PATHS, LIVE_DAMAGE, damage_from_document, damage_to_document, damage_values,
+    is_live, projection
+)
+from app.core.fields import parse_fields, sparse_response
+from app.core.fingerprints import schedule_refresh
+from app.core.idempotency import idempotency_store
+from app.core.images import (
+    THUMBNAIL_CACHE_CONTROL, schedule_image_check, thumbnail_path
+)
+from app.schemas.models import Damage, DamageCreate, DamageImage
 
 router = APIRouter()
 
 
+async def _find_damage(
+    damage_id: int, deleted: bool = False
+) -> Optional[Tuple[int, str, bool, dict]]:
+    """
+    Devuelve (claim_id, status del claim, embebido, documento del daño) o None.
+    Con deleted=True solo encuentra daños borrados (para restaurarlos).
+    """
+    if embedded.is_enabled():
+        found = await embedded.find_damage(damage_id, deleted)
+        if not found:
+            return None
+        claim_doc, damage_doc, is_embedded = found
+        return claim_doc["_id"], claim_doc["status"], is_embedded, damage_doc
+
+    damage_doc = await execute_one("damages", {"_id": damage_id})
+    if not damage_doc or is_live(damage_doc) == deleted:
+        return None
+    claim_doc = await execute_one("claims", {"_id": damage_doc["claim_id"]})
+    if not claim_doc:
+        return None
+    return damage_doc["claim_id"], claim_doc["status"], False, damage_doc
+
+
+@contextlib.asynccontextmanager
+async def _follow_up(
+    claim_id: int, damage_id: Optional[int] = None, image_url: Optional[str] = None
+):
+    """
+    Encola, aunque la escritura envuelta falle o exceda el plazo (puede haberse
+    aplicado igualmente), el recálculo de la huella del claim y, si se da
+    image_url, la comprobación de la imagen. Las tareas comprueban el estado al
+    ejecutarse, así que encolarlas de más no hace daño.
+    """
+    try:
+        yield
+    finally:
+        with unbounded():
+            await schedule_refresh(claim_id)
+            if image_url:
+                await schedule_image_check(damage_id, image_url)
+
+
 @router.get("/", response_model=List[Damage])
-async def get_damages():
-    """Obtener todos los daños"""
-    query = "SELECT id, part, severity, image_url, price, score, claim_id FROM damages ORDER BY id"
-    damages_data = execute_query(query)
-    
-    return [
-        Damage(
-            id=d[0], part=d[1], severity=d[2], 
-            image_url=d[3], price=d[4], score=d[5], claim_id=d[6]
-        ) for d in damages_data
-    ]
+async def get_damages(fields: Optional[str] = None):
+    """Obtener todos los daños (?fields=id,part,price devuelve solo esos campos)"""
+    names = parse_fields(fields, Damage)
+    if names is not None:
+        if embedded.is_enabled():
+            rows = await embedded.all_damage_values(names, read_method="damages.list")
+        else:
+            damages_data = await find_many(
+                "damages",
+                LIVE_DAMAGE,
+                projection=projection(names, DAMAGE_PATHS),
+                read_method="damages.list",
+            )
+            rows = [damage_values(d) for d in damages_data]
+        return sparse_response(Damage, names, rows)
+
+    # Los listados toleran réplicas con algo de retraso (READ_PREFERENCES)
+    if embedded.is_enabled():
+        return await embedded.all_damages(read_method="damages.list")
+
+    damages_data = await execute_query(
+        "damages", LIVE_DAMAGE, read_method="damages.list"
+    )
+
+    return [damage_from_document(d) for d in damages_data]
+
+
+@router.get("/thumbnails/{name}")
+async def get_thumbnail(name: str):
+    """Miniatura cacheada (direccionada por contenido, cacheable indefinidamente)"""
+    path = thumbnail_path(name)
+    if not re.fullmatch(r"[0-9a-f]{64}\.jpg", name) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    return FileResponse(
+        path,
+        media_type="image/jpeg",
+        headers={"Cache-Control": THUMBNAIL_CACHE_CONTROL},
+    )
+
+
+@router.get("/{damage_id}/image", response_model=DamageImage)
+async def get_damage_image(damage_id: int):
+    """Metadatos de la imagen de un daño: tamaño, tipo y miniatura"""
+    meta = await find_one("damage_images", {"_id": damage_id})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Image metadata not available")
+
+    thumbnail = meta.get("thumbnail")
+    return DamageImage(
+        url=meta["url"],
+        content_type=meta.get("content_type"),
+        size=meta.get("size"),
+        thumbnail_url=(
+            f"{settings.API_V1_STR}/damages/thumbnails/{thumbnail}"
+            if thumbnail
+            else None
+        ),
+        error=meta.get("error"),
+        checked_at=meta["checked_at"],
+    )
 
 
 @router.post("/", response_model=Damage)
-async def create_damage(damage: DamageCreate, claim_id: int):
-    """Crear un nuevo daño"""
-
+async def create_damage(
+    damage: DamageCreate,
+    claim_id: int,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """Crear un nuevo daño (los reintentos con la misma Idempotency-Key no duplican)"""
+    result, replayed = await idempotency_store.run(
+        "damages",
+        idempotency_key,
+        {"claim_id": claim_id, **damage.model_dump(mode="json")},
+        lambda: _insert_damage(damage, claim_id),
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _insert_damage(damage: DamageCreate, claim_id: int) -> Damage:
     # 1) Verificar que el claim existe y obtener status del claim
-    claim_row = execute_one("SELECT id, status FROM claims WHERE id = %s", (claim_id,))
-    if not claim_row:
+    claim_doc = await execute_one("claims", {"_id": claim_id})
+    if not claim_doc:
         raise HTTPException(status_code=404, detail="Claim not found")
 
     # Solo se pueden agregar daños a claims en estado PENDING
-    _, status = claim_row
-    if status != "PENDING":
+    if claim_doc["status"] != "PENDING":
         raise HTTPException(status_code=409, detail="Damages can only be managed when claim is PENDING")
-    
-    # 2) Crear
-    query = """
-    INSERT INTO damages (part, severity, image_url, price, score, claim_id) 
-    VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
-    """
-    result = execute_one(query, (
-        damage.part, damage.severity.value if hasattr(damage.severity, "value") else damage.severity,
-        str(damage.image_url), damage.price, damage.score, claim_id
-    ))
-    
+
+    # 2) Crear (en modo embebido se añade al array del claim)
+    damage_id = await next_sequence("damages")
+    document = {**damage_to_document(damage), "deleted_at": None}
+    # 3) Huella del claim para la detección de duplicados y comprobación de la
+    #    imagen (con su miniatura) fuera de la petición
+    async with _follow_up(claim_id, damage_id, str(damage.image_url)):
+        if embedded.is_enabled():
+            result = await embedded.add_damage(claim_doc, damage_id, document)
+        else:
+            result = await insert_one(
+                "damages", {"_id": damage_id, "claim_id": claim_id, **document}
+            )
+
     if not result:
         raise HTTPException(status_code=500, detail="Error creating damage")
-    
-    return Damage(id=result[0], claim_id=claim_id, **damage.model_dump())
+
+    return Damage(id=damage_id, claim_id=claim_id, **damage.model_dump())
 
 
 @router.put("/{damage_id}", response_model=Damage)
@@ -55,35 +185,21 @@ async def update_damage(damage_id: int, damage: DamageCreate):
     """Editar un daño existente (solo si el claim está en PENDING)"""
 
     # 1) Verificar que el daño existe y obtener status del claim
-    row = execute_one("""
-        SELECT d.claim_id, c.status
-        FROM damages d
-        JOIN claims c ON c.id = d.claim_id
-        WHERE d.id = %s
-    """, (damage_id,))
+    row = await _find_damage(damage_id)
 
     if not row:
         raise HTTPException(status_code=404, detail="Damage not found")
-    
+
     # Solo se pueden actualizar daños a claims en estado PENDING
-    claim_id, status = row
+    claim_id, status, is_embedded, _ = row
     if status != "PENDING":
         raise HTTPException(status_code=409, detail="Damages can only be managed when claim is PENDING")
 
     # 2) Actualizar
-    result = execute_one("""
-        UPDATE damages
-        SET part = %s, severity = %s, image_url = %s, price = %s, score = %s
-        WHERE id = %s
-        RETURNING id
-    """, (
-        damage.part,
-        damage.severity.value if hasattr(damage.severity, "value") else damage.severity,
-        str(damage.image_url),
-        damage.price,
-        damage.score,
-        damage_id
-    ))
+    async with _follow_up(claim_id, damage_id, str(damage.image_url)):
+        result = await embedded.replace_damage(
+            claim_id, damage_id, damage_to_document(damage), is_embedded
+        )
 
     if not result:
         raise HTTPException(status_code=500, detail="Error updating damage")
@@ -93,26 +209,42 @@ async def update_damage(damage_id: int, damage: DamageCreate):
 
 @router.delete("/{damage_id}", status_code=204)
 async def delete_damage(damage_id: int):
-    """Eliminar un daño (solo si el claim está en PENDING)"""
+    """Eliminar un daño (claim en PENDING); se puede restaurar hasta que se purga"""
 
     # 1) Verificar que el daño existe y obtener status del claim
-    row = execute_one("""
-        SELECT d.claim_id, c.status
-        FROM damages d
-        JOIN claims c ON c.id = d.claim_id
-        WHERE d.id = %s
-    """, (damage_id,))
+    row = await _find_damage(damage_id)
 
     if not row:
         raise HTTPException(status_code=404, detail="Damage not found")
 
-    _, status = row
+    claim_id, status, is_embedded, _ = row
     if status != "PENDING":
         raise HTTPException(status_code=409, detail="Damages can only be managed when claim is PENDING")
 
-    # 2) Borrar
-    deleted = execute_one("DELETE FROM damages WHERE id = %s RETURNING id", (damage_id,))
+    # 2) Borrado lógico: solo se marca deleted_at
+    async with _follow_up(claim_id):
+        deleted = await embedded.remove_damage(claim_id, damage_id, is_embedded)
     if not deleted:
         raise HTTPException(status_code=500, detail="Error deleting damage")
 
     return Response(status_code=204)
+
+
+@router.post("/{damage_id}/restore", response_model=Damage)
+async def restore_damage(damage_id: int):
+    """Restaurar un daño borrado aún no purgado (solo si el claim está en PENDING)"""
+    row = await _find_damage(damage_id, deleted=True)
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Deleted damage not found")
+
+    claim_id, status, is_embedded, damage_doc = row
+    if status != "PENDING":
+        raise HTTPException(status_code=409, detail="Damages can only be managed when claim is PENDING")
+
+    async with _follow_up(claim_id):
+        restored = await embedded.restore_damage(claim_id, damage_id, is_embedded)
+    if not restored:
+        raise HTTPException(status_code=500, detail="Error restoring damage")
+
+    return damage_from_document(damage_doc, claim_id)
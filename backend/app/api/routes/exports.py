@@ -0,0 +1,27 @@
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core import export
+
+router = APIRouter()
+
+
+@router.get("/{table}")
+async def export_table(
+    table: Literal["claims", "damages"], format: Literal["parquet", "arrow"] = "parquet"
+):
+    """
+    Exportar reclamaciones o daños en formato columnar (Parquet o Arrow IPC)
+    para análisis. Se genera por lotes mientras se descarga.
+    """
+    if not export.available():
+        raise HTTPException(status_code=503, detail="Exports require pyarrow")
+
+    extension, media_type = export.FORMATS[format]
+    return StreamingResponse(
+        export.stream_export(table, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}{extension}"'},
+    )
@@ -0,0 +1,304 @@
+"""
+Importación masiva de reclamaciones y daños desde CSV o Parquet (migraciones de
+datos históricos).
+
+    cd backend
+    python -m app.bulk_import claims legacy_claims.csv
+    python -m app.bulk_import damages legacy_damages.parquet --workers 8
+
+Columnas de claims: id, title, description, status y, opcional, status_changed_at
+(ISO 8601). Columnas de damages: id, claim_id, part, severity, image_url, price, score.
+Los IDs se conservan (los daños apuntan a su reclamación por claim_id), así que se
+importan primero las reclamaciones, y los contadores se adelantan tras cada lote.
+
+El fichero se lee por bloques de --chunk-size filas que se validan con ClaimCreate /
+DamageCreate en un pool de procesos y se escriben con insert_many sin orden. Tras cada
+bloque se guarda un checkpoint (<fichero>.checkpoint): si la importación se interrumpe,
+al relanzarla sigue desde el último bloque escrito (los documentos ya insertados se
+saltan). Las filas rechazadas se guardan en <fichero>.rejected.csv con el motivo.
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.core import embedded
+from app.core.db import (
+    advance_sequence, close_mongo_connection, connect_to_mongo, insert_missing
+)
+from app.core.documents import claim_to_document, damage_to_document
+from app.core.tenancy import tenant_scope
+from app.schemas.models import ClaimCreate, DamageCreate
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional: only CSV can be imported without it
+    pq = None
+
+KINDS = ("claims", "damages")
+
+# (número de fila, fila original, motivo)
+Rejected = Tuple[int, Dict[str, Any], str]
+
+
+def read_chunks(
+    path: str, chunk_size: int, skip: int = 0
+) -> Iterator[List[Dict[str, Any]]]:
+    """Filas de un CSV o Parquet en bloques de chunk_size, saltando las skip primeras"""
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("Importing Parquet files requires pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            rows = batch.to_pylist()
+            if skip >= len(rows):
+                skip -= len(rows)
+                continue
+            yield rows[skip:]
+            skip = 0
+        return
+
+    with open(path, newline="", encoding="utf-8-sig") as source:
+        rows = itertools.islice(csv.DictReader(source), skip, None)
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            yield chunk
+
+
+def _value(row: Dict[str, Any], column: str) -> Any:
+    # CSV no distingue vacío de nulo: las celdas vacías son None
+    value = row.get(column)
+    return None if value == "" else value
+
+
+def _claim_document(row: Dict[str, Any], imported_at: datetime) -> Dict[str, Any]:
+    claim = ClaimCreate(
+        title=_value(row, "title"), description=_value(row, "description"),
+        status=_value(row, "status") or "PENDING",
+    )
+    changed_at = _value(row, "status_changed_at")
+    if isinstance(changed_at, str):
+        changed_at = datetime.fromisoformat(changed_at)
+    if isinstance(changed_at, datetime) and changed_at.tzinfo is None:
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    return {
+        "_id": int(row["id"]),
+        **claim_to_document(claim),
+        "status_changed_at": changed_at or imported_at,
+    }
+
+
+def _damage_document(row: Dict[str, Any]) -> Dict[str, Any]:
+    damage = DamageCreate(
+        **{
+            field: _value(row, field)
+            for field in ("part", "severity", "image_url", "price", "score")
+        }
+    )
+    return {
+        "_id": int(row["id"]),
+        "claim_id": int(row["claim_id"]),
+        **damage_to_document(damage),
+        "deleted_at": None,
+    }
+
+
+def _reason(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()
+        )
+    if isinstance(exc, KeyError):
+        return f"missing column {exc}"
+    return str(exc)
+
+
+def validate_chunk(
+    kind: str, rows: List[Dict[str, Any]], first_row: int
+) -> Tuple[List[Dict[str, Any]], List[Rejected]]:
+    """Documentos de las filas válidas y (fila, datos, motivo) de las rechazadas"""
+    imported_at = datetime.now(timezone.utc)
+    documents, rejected = [], []
+    for number, row in enumerate(rows, start=first_row):
+        try:
+            if kind == "claims":
+                documents.append(_claim_document(row, imported_at))
+            else:
+                documents.append(_damage_document(row))
+        except (ValidationError, ValueError, KeyError, TypeError) as exc:
+            rejected.append((number, row, _reason(exc)))
+    return documents, rejected
+
+
+class Checkpoint:
+    """Progreso de la importación de un fichero, guardado tras cada bloque escrito"""
+
+    def __init__(self, path: str, kind: str, source: str):
+        self.path = path
+        self.state: Dict[str, Any] = {
+            "kind": kind, "source": os.path.abspath(source),
+            "rows": 0, "inserted": 0, "existing": 0, "rejected": 0, "done": False,
+        }
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if (saved["kind"], saved["source"]) != (
+                self.state["kind"],
+                self.state["source"],
+            ):
+                raise ValueError(
+                    f"Checkpoint {path} belongs to another import "
+                    f"({saved['kind']} {saved['source']})"
+                )
+            self.state = saved
+
+    def save(self):
+        # Se escribe aparte y se renombra para no dejar nunca un checkpoint a medias
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+def _write_rejected(path: str, rejected: List[Rejected]):
+    new = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(["row", "error", "data"])
+        for number, row, reason in rejected:
+            writer.writerow(
+                [number, reason, json.dumps(row, default=str, ensure_ascii=False)]
+            )
+
+
+async def import_file(
+    kind: str, path: str, chunk_size: int = 5000, workers: Optional[int] = None,
+    checkpoint_path: Optional[str] = None, report: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """
+    Importa un fichero de reclamaciones o daños (kind) reanudando desde su checkpoint.
+    workers=0 valida en el propio proceso. Devuelve el estado final del checkpoint.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+    checkpoint = Checkpoint(checkpoint_path or path + ".checkpoint", kind, path)
+    state = checkpoint.state
+    if state["done"]:
+        report(
+            f"{path} ya importado ({state['rows']:,} filas); "
+            f"borra {checkpoint.path} para repetirlo"
+        )
+        return state
+
+    loop = asyncio.get_running_loop()
+    pool: Optional[Executor] = ProcessPoolExecutor(workers) if workers != 0 else None
+    chunks = read_chunks(path, chunk_size, skip=state["rows"])
+    in_flight: deque = deque()
+    next_row = state["rows"] + 1
+    start, started_at = state["rows"], time.perf_counter()
+
+    def submit() -> bool:
+        nonlocal next_row
+        rows = next(chunks, None)
+        if rows is None:
+            return False
+        if pool is None:
+            future = loop.create_future()
+            future.set_result(validate_chunk(kind, rows, next_row))
+        else:
+            future = loop.run_in_executor(pool, validate_chunk, kind, rows, next_row)
+        in_flight.append((len(rows), future))
+        next_row += len(rows)
+        return True
+
+    try:
+        # Los bloques se validan en paralelo pero se escriben en orden, así el
+        # checkpoint siempre marca un prefijo del fichero ya importado
+        while (
+            len(in_flight) < max(2, 2 * (workers or os.cpu_count() or 1)) and submit()
+        ):
+            pass
+        while in_flight:
+            count, future = in_flight.popleft()
+            documents, rejected = await future
+            submit()
+
+            inserted = await insert_missing(kind, documents) if documents else 0
+            if documents:
+                await advance_sequence(kind, max(d["_id"] for d in documents))
+            if rejected:
+                _write_rejected(path + ".rejected.csv", rejected)
+
+            state["rows"] += count
+            state["inserted"] += inserted
+            state["existing"] += len(documents) - inserted
+            state["rejected"] += len(rejected)
+            checkpoint.save()
+
+            elapsed = time.perf_counter() - started_at
+            rate = (state["rows"] - start) / elapsed if elapsed else 0
+            report(
+                f"{state['rows']:,} filas ({rate:,.0f} filas/s), "
+                f"{state['rejected']:,} rechazadas"
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    state["done"] = True
+    checkpoint.save()
+    if kind == "damages" and embedded.is_enabled():
+        report(
+            "Daños importados en la colección damages: "
+            "python -m app.migrate damages-layout embedded"
+        )
+    return state
+
+
+async def _run(coro, tenant: Optional[str]):
+    await connect_to_mongo()
+    try:
+        with tenant_scope(tenant):
+            return await coro
+    finally:
+        await close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("path", help="fichero .csv o .parquet")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument(
+        "--workers", type=int, help="procesos de validación (por defecto, uno por CPU)"
+    )
+    parser.add_argument("--checkpoint", help="por defecto <fichero>.checkpoint")
+    parser.add_argument("--tenant", help="aseguradora (con MULTI_TENANT)")
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    state = asyncio.run(
+        _run(
+            import_file(
+                args.kind, args.path, args.chunk_size, args.workers, args.checkpoint
+            ),
+            args.tenant,
+        )
+    )
+    print(
+        f"Importadas {state['inserted']:,} filas ({state['existing']:,} ya existían, "
+        f"{state['rejected']:,} rechazadas) en {time.perf_counter() - started_at:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
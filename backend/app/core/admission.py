@@ -0,0 +1,232 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Per-client buckets kept in memory; the least recently seen are dropped beyond this
+_MAX_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst; each request takes one"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """0 when a token was taken, otherwise seconds until the next one"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class ConcurrencyLimiter:
+    """
+    At most limit requests in progress; the rest queue in arrival order.
+    Slots are handed over directly on release, so queued requests are not
+    overtaken by newcomers.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for a slot, False if none was free"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot arrived just as the client went away
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+    def release(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class Budget:
+    """Rate limit per client plus a concurrency limit shared by every client"""
+
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.limiter = ConcurrencyLimiter(concurrency)
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    def take(self, client: str) -> float:
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst)
+            if len(self.buckets) > _MAX_BUCKETS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+        return bucket.take()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "in_flight": self.limiter.active,
+            "queued": self.limiter.queued,
+        }
+
+
+def route_matches(method: str, path: str, routes: Iterable[str]) -> bool:
+    """Route entries are "METHOD /path", a trailing * matches a prefix"""
+    path = path.rstrip("/") or "/"
+    for route in routes:
+        route_method, _, route_path = route.partition(" ")
+        if route_method != method:
+            continue
+        if route_path.endswith("*") and path.startswith(route_path[:-1]):
+            return True
+        if path == route_path.rstrip("/"):
+            return True
+    return False
+
+
+class AdmissionController:
+    """
+    Back-pressure for the API: a token bucket per client (429 when empty) and
+    a concurrency limit per budget with queue-time shedding (503 after
+    ADMISSION_QUEUE_TIMEOUT). Expensive routes also hold a slot of their own,
+    smaller budget, so a burst of listings cannot take every Mongo connection.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Fresh budgets from the current settings (counters and buckets cleared)"""
+        self.default = Budget(
+            "default", settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST,
+            settings.MAX_CONCURRENT_REQUESTS,
+        )
+        self.expensive = Budget(
+            "expensive",
+            settings.RATE_LIMIT_EXPENSIVE_PER_SECOND,
+            settings.RATE_LIMIT_EXPENSIVE_BURST,
+            settings.MAX_CONCURRENT_EXPENSIVE,
+        )
+
+    def budgets(self, method: str, path: str) -> List[Budget]:
+        """Budgets a request must pass, most specific first"""
+        if route_matches(method, path, settings.EXPENSIVE_ROUTES):
+            return [self.expensive, self.default]
+        return [self.default]
+
+    async def admit(
+        self, client: str, budgets: List[Budget]
+    ) -> Tuple[Optional[int], Optional[float], List[Budget]]:
+        """
+        (None, None, acquired) when admitted, (status, retry_after, []) otherwise.
+        acquired must be passed to release() once the response is sent.
+        """
+        rate_budget = budgets[0]
+        wait = rate_budget.take(client)
+        if wait:
+            rate_budget.rate_limited += 1
+            return 429, wait, []
+
+        acquired = []
+        for budget in budgets:
+            if not await budget.limiter.acquire(settings.ADMISSION_QUEUE_TIMEOUT):
+                budget.shed += 1
+                self.release(acquired)
+                return 503, settings.ADMISSION_RETRY_AFTER, []
+            acquired.append(budget)
+
+        rate_budget.admitted += 1
+        return None, None, acquired
+
+    def release(self, acquired: List[Budget]):
+        for budget in acquired:
+            budget.limiter.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"default": self.default.stats(), "expensive": self.expensive.stats()}
+
+
+class AdmissionMiddleware:
+    """Applies an AdmissionController to every request under the API prefix"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, prefix: str = ""):
+        self.app = app
+        self.controller = controller
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        budgets = self.controller.budgets(scope["method"], scope["path"])
+        status, retry_after, acquired = await self.controller.admit(client, budgets)
+        if status is not None:
+            await _reject(send, status, retry_after)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(acquired)
+
+
+async def _reject(send: Send, status: int, retry_after: float):
+    detail = "Too many requests" if status == 429 else "Server busy, retry later"
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(min(retry_after, 3600)))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+admission = AdmissionController()
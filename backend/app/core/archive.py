@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.db import (
+    delete_many, delete_one, find_many, find_one, replace_many, upsert_one
+)
+from app.core.documents import (
+    claim_from_document, damage_from_document, is_live, live_damages
+)
+from app.core.jobs import job_handler, job_queue
+from app.core.tenancy import all_tenants, tenant_scope
+from app.schemas.models import Claim
+
+TERMINAL_STATUSES = ["FINALIZED", "CANCELED"]
+
+# Batch being moved out of the hot collections; a run that died half-way finishes it
+# first
+_STATE_ID = "batch"
+
+
+def _eligible(cutoff: datetime) -> Dict[str, Any]:
+    # Claims written before status_changed_at existed never match until
+    # `python -m app.migrate status-changed-at` dates them
+    return {"status": {"$in": TERMINAL_STATUSES}, "status_changed_at": {"$lt": cutoff}}
+
+
+async def archive_claims(
+    older_than_days: Optional[int] = None, batch_size: Optional[int] = None
+) -> int:
+    """
+    Move FINALIZED/CANCELED claims whose status has not changed for
+    older_than_days (ARCHIVE_AFTER_DAYS), with their damages, to claims_archive
+    and damages_archive. Works in batches of batch_size and can be stopped at
+    any point: the next run picks up where it left off. Returns the claims moved.
+    """
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+
+    moved = 0
+    state = await find_one("archive_state", {"_id": _STATE_ID})
+    if state:
+        moved += await _remove_batch(state["claim_ids"], state["cutoff"])
+
+    while True:
+        claims = await find_many(
+            "claims", _eligible(cutoff), limit=size, sort=[("_id", 1)]
+        )
+        if not claims:
+            return moved
+        moved += await _archive_batch(claims, cutoff)
+        if len(claims) < size:
+            return moved
+
+
+async def _archive_batch(claims: List[Dict[str, Any]], cutoff: datetime) -> int:
+    ids = [c["_id"] for c in claims]
+
+    # 1) Copy (upserts by _id, so copying a batch again is harmless). The damages
+    #    collection also holds the damages spilled over from embedded claims; deleted
+    #    ones are left to expire there.
+    damages = await find_many("damages", live_damages({"claim_id": {"$in": ids}}))
+    if damages:
+        await replace_many("damages_archive", damages)
+    await replace_many("claims_archive", claims)
+
+    # 2) Remove from the hot collections
+    await upsert_one(
+        "archive_state", {"_id": _STATE_ID}, {"claim_ids": ids, "cutoff": cutoff}
+    )
+    return await _remove_batch(ids, cutoff)
+
+
+async def _remove_batch(ids: List[int], cutoff: datetime) -> int:
+    # Claims reopened since they were copied stay in place, and their copy is dropped
+    await delete_many("claims", {"_id": {"$in": ids}, **_eligible(cutoff)})
+    kept = {
+        d["_id"]
+        for d in await find_many("claims", {"_id": {"$in": ids}}, projection={"_id": 1})
+    }
+    moved = [i for i in ids if i not in kept]
+
+    if moved:
+        await delete_many("damages", live_damages({"claim_id": {"$in": moved}}))
+    if kept:
+        await delete_many("claims_archive", {"_id": {"$in": list(kept)}})
+        await delete_many("damages_archive", {"claim_id": {"$in": list(kept)}})
+    await delete_one("archive_state", {"_id": _STATE_ID})
+    return len(moved)
+
+
+async def load_archived_claims(ids: List[int]) -> Dict[int, Claim]:
+    """Archived claims among ids, with their damages (cold path: two queries)"""
+    if not ids:
+        return {}
+    docs = await find_many("claims_archive", {"_id": {"$in": ids}})
+    if not docs:
+        return {}
+
+    damages: Dict[int, list] = {
+        doc["_id"]: [
+            damage_from_document(d, doc["_id"])
+            for d in doc.get("damages", [])
+            if is_live(d)
+        ]
+        for doc in docs
+    }
+    for damage_doc in await find_many(
+        "damages_archive", {"claim_id": {"$in": list(damages)}}
+    ):
+        damages[damage_doc["claim_id"]].append(damage_from_document(damage_doc))
+    return {doc["_id"]: claim_from_document(doc, damages[doc["_id"]]) for doc in docs}
+
+
+async def load_archived_claim(claim_id: int) -> Optional[Claim]:
+    """An archived claim, None if it was never archived"""
+    return (await load_archived_claims([claim_id])).get(claim_id)
+
+
+async def start_archival():
+    """Schedule archival for every tenant (or the single database)"""
+    for tenant in all_tenants():
+        with tenant_scope(tenant):
+            await job_queue.enqueue_periodic(
+                "archive_claims", settings.ARCHIVE_INTERVAL_SECONDS
+            )
+
+
+@job_handler("archive_claims")
+async def run_archival(payload: Dict[str, Any]):
+    # The next run is queued first so a failing run does not stop the schedule
+    await job_queue.enqueue_periodic(
+        "archive_claims", settings.ARCHIVE_INTERVAL_SECONDS, next_period=True
+    )
+    moved = await archive_claims()
+    print(f"🗄️ Archived {moved} claims")
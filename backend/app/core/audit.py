@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.db import insert_many
+from app.core.tenancy import current_tenant, tenant_scope
+
+
+class AuditWriter:
+    """
+    Append-only writer for claim_events.
+    Events are buffered in memory and written with insert_many every
+    AUDIT_BATCH_SIZE events or AUDIT_FLUSH_MS milliseconds, whichever comes first.
+    Each event keeps the tenant it was recorded for, since flushes run outside requests.
+    """
+
+    def __init__(self):
+        self.buffer: List[Tuple[Optional[str], Dict[str, Any]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+
+    def record(
+        self,
+        claim_id: int,
+        from_status: Optional[str],
+        to_status: str,
+        actor: Optional[str] = None,
+    ):
+        """Buffer a status transition; never waits on the database"""
+        self.buffer.append((current_tenant(), {
+            "claim_id": claim_id,
+            "from_status": from_status,
+            "to_status": to_status,
+            "actor": actor,
+            "at": datetime.now(timezone.utc),
+        }))
+        if self._full and len(self.buffer) >= settings.AUDIT_BATCH_SIZE:
+            self._full.set()
+
+    def pending(self, claim_id: int) -> List[Dict[str, Any]]:
+        """Buffered events of a claim that are not written yet"""
+        tenant = current_tenant()
+        return [e for t, e in self.buffer if t == tenant and e["claim_id"] == claim_id]
+
+    async def flush(self) -> int:
+        async with self._lock:
+            batch, self.buffer = self.buffer, []
+            if not batch:
+                return 0
+            # One insert_many per run of events of the same tenant, in order
+            written = 0
+            try:
+                for tenant, events in groupby(batch, key=lambda item: item[0]):
+                    documents = [event for _, event in events]
+                    with tenant_scope(tenant):
+                        await insert_many("claim_events", documents)
+                    written += len(documents)
+            except Exception:
+                # Keep the unwritten events (in order) for the next flush
+                self.buffer = batch[written:] + self.buffer
+                raise
+            return len(batch)
+
+    async def start(self):
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._full = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._full.wait(), settings.AUDIT_FLUSH_MS / 1000
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"⚠️ Audit flush failed, will retry: {exc}")
+
+
+audit_writer = AuditWriter()
@@ -0,0 +1,171 @@
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core import money
+from app.core.money import Money
+from app.schemas.models import Claim, ClaimStatus, Damage, DamageSeverity
+
+# Compact in-memory claims and damages for batch jobs that hold many of them:
+# slotted objects (no per-instance __dict__), prices as integer cents and
+# severities/statuses as small ints instead of Decimal and enum members.
+SEVERITIES = tuple(s.value for s in DamageSeverity)
+STATUSES = tuple(s.value for s in ClaimStatus)
+_SEVERITY_CODES = {name: code for code, name in enumerate(SEVERITIES)}
+_STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+
+
+def severity_code(severity: Any) -> int:
+    """Small int of a severity (enum or string); unknown ones map to LOW"""
+    return _SEVERITY_CODES.get(getattr(severity, "value", severity), 0)
+
+
+def status_code(status: Any) -> int:
+    """Small int of a claim status (enum or string); unknown ones map to PENDING"""
+    return _STATUS_CODES.get(getattr(status, "value", status), 0)
+
+
+def document_cents(doc: Dict[str, Any]) -> int:
+    """Integer cents of the stored price of a damage document (0 without price)"""
+    price = doc.get("price")
+    return money.from_document(price).cents if price is not None else 0
+
+
+@dataclass(slots=True)
+class CompactDamage:
+    id: int
+    claim_id: int
+    part: str
+    severity: int
+    image_url: str
+    price_cents: int
+    score: int
+
+    @property
+    def price(self) -> Money:
+        return Money(self.price_cents)
+
+    @classmethod
+    def from_document(
+        cls, doc: Dict[str, Any], claim_id: Optional[int] = None
+    ) -> "CompactDamage":
+        """From a document of the damages collection or an embedded item"""
+        return cls(
+            id=doc["id"] if "id" in doc else doc["_id"],
+            claim_id=doc.get("claim_id", claim_id),
+            part=sys.intern(
+                doc.get("part", "")
+            ),  # parts repeat: share one string per name
+            severity=severity_code(doc.get("severity")),
+            image_url=str(doc.get("image_url", "")),
+            price_cents=document_cents(doc),
+            score=doc.get("score") or 0,
+        )
+
+    @classmethod
+    def from_model(cls, damage: Damage) -> "CompactDamage":
+        return cls(
+            id=damage.id, claim_id=damage.claim_id, part=sys.intern(damage.part),
+            severity=severity_code(damage.severity), image_url=str(damage.image_url),
+            price_cents=damage.price.cents, score=damage.score,
+        )
+
+    def to_model(self) -> Damage:
+        return Damage(
+            id=self.id,
+            claim_id=self.claim_id,
+            part=self.part,
+            severity=SEVERITIES[self.severity],
+            image_url=self.image_url,
+            price=self.price,
+            score=self.score,
+        )
+
+
+@dataclass(slots=True)
+class CompactClaim:
+    id: int
+    title: str
+    description: Optional[str]
+    status: int
+    damages: List[CompactDamage] = field(default_factory=list)
+
+    @property
+    def total_cents(self) -> int:
+        return sum(d.price_cents for d in self.damages)
+
+    @classmethod
+    def from_document(
+        cls, doc: Dict[str, Any], damages: Optional[List[CompactDamage]] = None
+    ) -> "CompactClaim":
+        """From a claims document (damages loaded separately, as in documents.py)"""
+        return cls(
+            id=doc["_id"],
+            title=doc.get("title", ""),
+            description=doc.get("description"),
+            status=status_code(doc.get("status")),
+            damages=damages or [],
+        )
+
+    @classmethod
+    def from_model(cls, claim: Claim) -> "CompactClaim":
+        return cls(
+            id=claim.id,
+            title=claim.title,
+            description=claim.description,
+            status=status_code(claim.status),
+            damages=[CompactDamage.from_model(d) for d in claim.damages],
+        )
+
+    def to_model(self) -> Claim:
+        return Claim(
+            id=self.id,
+            title=self.title,
+            description=self.description,
+            status=STATUSES[self.status],
+            damages=[d.to_model() for d in self.damages],
+        )
+
+
+class DamageTable:
+    """
+    Damages as a struct of typed arrays (8 bytes per id/cents, 1 per severity and
+    score) for jobs that only scan them; rows come back out as CompactDamage.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.claim_ids = array("q")
+        self.severities = array("b")
+        self.scores = array("b")
+        self.price_cents = array("q")
+        self.parts: List[str] = []
+        self.image_urls: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, damage: CompactDamage):
+        self.ids.append(damage.id)
+        self.claim_ids.append(damage.claim_id)
+        self.severities.append(damage.severity)
+        self.scores.append(damage.score)
+        self.price_cents.append(damage.price_cents)
+        self.parts.append(damage.part)
+        self.image_urls.append(damage.image_url)
+
+    def add_document(self, doc: Dict[str, Any], claim_id: Optional[int] = None):
+        self.append(CompactDamage.from_document(doc, claim_id))
+
+    def __getitem__(self, i: int) -> CompactDamage:
+        return CompactDamage(
+            self.ids[i], self.claim_ids[i], self.parts[i], self.severities[i],
+            self.image_urls[i], self.price_cents[i], self.scores[i],
+        )
+
+    def __iter__(self) -> Iterator[CompactDamage]:
+        return (self[i] for i in range(len(self)))
+
+    def to_models(self) -> List[Damage]:
+        return [d.to_model() for d in self]
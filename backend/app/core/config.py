@@ -2,29 +2,185 @@ from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 import hvac
 import os
-from typing import Optional
+from typing import Dict, List, Literal, Optional
+
+ReadPreferenceName = Literal[
+    "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+]
 
 
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Claims Manager"
-    
+
     # Security
     SECRET_KEY: Optional[str] = None
-    
+
     # Vault Configuration
     VAULT_URL: str = "http://localhost:8200"
     VAULT_TOKEN: Optional[str] = None
     VAULT_SECRET_PATH: str = "secret/data/fastapi"
-    
+
     # Database
     MONGO_URI: str = "mongodb://127.0.0.1:27017/claims_manager"
-    
+    # Connection budget for the whole deployment, split across server workers
+    MONGO_MAX_POOL_SIZE: int = 100
+    # "memory" runs against an in-process stand-in (app/core/memory.py) instead of a
+    # MongoDB server: for tests and benchmarks only, nothing is persisted or shared
+    MONGO_BACKEND: Literal["motor", "memory"] = "motor"
+
+    # Reads that tolerate replication lag (listings, stats, exports) are named by
+    # method and use their READ_PREFERENCES entry, else SECONDARY_READ_PREFERENCE;
+    # everything else reads from the primary. Methods: claims.list, damages.list,
+    # claims.export, claims.triage, claims.duplicates. Set e.g. secondaryPreferred
+    # on a replica set. Max staleness must be >= 90 seconds, -1 = no bound.
+    SECONDARY_READ_PREFERENCE: ReadPreferenceName = "primary"
+    READ_PREFERENCES: Dict[str, ReadPreferenceName] = {}
+    SECONDARY_MAX_STALENESS_SECONDS: int = -1
+
+    # Multi-tenancy: with MULTI_TENANT on, every API request names one of TENANTS
+    # in TENANT_HEADER and only touches that tenant's collections ("<tenant>.claims")
+    MULTI_TENANT: bool = False
+    TENANT_HEADER: str = "X-Tenant-ID"
+    TENANTS: List[str] = []
+
+    # Production server (python -m app); 0 workers = one per CPU core
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+
+    # Response compression (gzip, or Brotli when installed and accepted)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_CONTENT_TYPES: List[str] = [
+        "application/json",
+        "application/x-ndjson",
+        "text/",
+    ]
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Admission control: token bucket per client (429) and concurrency limits
+    # with queue-time shedding (503). EXPENSIVE_ROUTES ("METHOD /path", * = prefix)
+    # also need a slot of the smaller expensive budget.
+    ADMISSION_ENABLED: bool = True
+    RATE_LIMIT_PER_SECOND: float = 20.0
+    RATE_LIMIT_BURST: int = 40
+    RATE_LIMIT_EXPENSIVE_PER_SECOND: float = 2.0
+    RATE_LIMIT_EXPENSIVE_BURST: int = 10
+    MAX_CONCURRENT_REQUESTS: int = 64
+    MAX_CONCURRENT_EXPENSIVE: int = 8
+    ADMISSION_QUEUE_TIMEOUT: float = 0.5
+    ADMISSION_RETRY_AFTER: int = 1
+    EXPENSIVE_ROUTES: List[str] = [
+        "GET /api/v1/claims",
+        "GET /api/v1/damages",
+        "POST /api/v1/claims:batchGet",
+        "POST /api/v1/claims:batchUpdateStatus",
+        "GET /api/v1/exports/*",
+        "GET /api/v1/claims:triage",
+    ]
+
+    # Request deadlines in seconds, applied to every database operation as
+    # maxTimeMS and an asyncio timeout (504 when exceeded). ROUTE_TIMEOUTS keys
+    # use the EXPENSIVE_ROUTES format.
+    REQUEST_TIMEOUT: float = 10.0
+    ROUTE_TIMEOUTS: Dict[str, float] = {
+        "GET /api/v1/claims": 30.0,
+        "GET /api/v1/damages": 30.0,
+        "POST /api/v1/claims:batchGet": 30.0,
+        "POST /api/v1/claims:batchUpdateStatus": 30.0,
+        "GET /api/v1/claims:triage": 30.0,
+    }
+
+    # Columnar exports (GET /exports/{table}, python -m app.export): claims are read
+    # EXPORT_BATCH_SIZE at a time, one record batch each; compression of the files.
+    # A streamed export has no overall deadline: each batch gets EXPORT_BATCH_TIMEOUT
+    EXPORT_BATCH_SIZE: int = 10000
+    EXPORT_BATCH_TIMEOUT: float = 60.0
+    EXPORT_COMPRESSION: Literal["zstd", "lz4", "none"] = "zstd"
+
+    # Triage of PENDING claims (GET /claims:triage): each live damage scores
+    # severity weight + SCORE_WEIGHT * score + PRICE_WEIGHT * ln(1 + price), and a
+    # claim's priority is the sum over its damages
+    TRIAGE_SEVERITY_WEIGHTS: Dict[str, float] = {"LOW": 1.0, "MEDIUM": 3.0, "HIGH": 8.0}
+    TRIAGE_SCORE_WEIGHT: float = 0.5
+    TRIAGE_PRICE_WEIGHT: float = 1.0
+    TRIAGE_MAX_K: int = 1000
+
+    # Duplicate detection (GET /claims/{id}/duplicates): MinHash signatures of
+    # BANDS * ROWS values; candidates sharing a band are kept at MIN_SIMILARITY
+    DUPLICATES_MINHASH_BANDS: int = 8
+    DUPLICATES_MINHASH_ROWS: int = 4
+    DUPLICATES_MIN_SIMILARITY: float = 0.5
+    DUPLICATES_MAX_RESULTS: int = 50
+    # Candidates read per lookup (claims sharing a band with very common damages)
+    DUPLICATES_MAX_CANDIDATES: int = 1000
+    # Fingerprints are refreshed by a background job, at most once per claim per period
+    DUPLICATES_REFRESH_SECONDS: float = 5.0
+
+    # Maximum IDs per POST /claims:batchGet
+    CLAIMS_BATCH_MAX: int = 200
+
+    # Coalesce identical concurrent reads into a single query
+    SINGLE_FLIGHT_READS: bool = True
+
+    # Damages storage layout: "separate" (own collection) or "embedded" (array in claim)
+    DAMAGES_STORAGE: str = "separate"
+    # Embedded claims stay below MongoDB's 16MB document limit; extra damages spill over
+    EMBEDDED_DAMAGES_MAX_BYTES: int = 15 * 1024 * 1024
+
+    # Archival of FINALIZED/CANCELED claims (and their damages) into claims_archive /
+    # damages_archive, by a background job every ARCHIVE_INTERVAL_SECONDS
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_INTERVAL_SECONDS: int = 24 * 60 * 60
+
+    # Deleted damages are kept (deleted_at) this long so they can be restored, then
+    # purged
+    DAMAGES_PURGE_AFTER_DAYS: int = 30
+    DAMAGES_PURGE_BATCH_SIZE: int = 500
+    DAMAGES_PURGE_INTERVAL_SECONDS: int = 60 * 60
+
+    # Background job queue (jobs collection)
+    JOB_WORKERS: int = 2
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_BACKOFF_SECONDS: float = 2.0
+    JOB_BACKOFF_MAX_SECONDS: float = 300.0
+    JOB_LEASE_SECONDS: float = 300.0
+    # Finished (done/failed) jobs are purged this long after finished_at
+    JOB_RETENTION_SECONDS: int = 7 * 24 * 60 * 60
+
+    # Claim audit trail (claim_events, buffered bulk inserts)
+    AUDIT_BATCH_SIZE: int = 100
+    AUDIT_FLUSH_MS: int = 500
+
+    # Idempotency-Key support for POST endpoints
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_CACHE_SECONDS: float = 60.0
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    # A key pending for longer is taken as abandoned (its worker died) and run again
+    IDEMPOTENCY_PENDING_LEASE_SECONDS: float = 120.0
+
+    # Damage images (checked and thumbnailed by background jobs)
+    IMAGE_FETCH_TIMEOUT: float = 10.0
+    IMAGE_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGE_MAX_REDIRECTS: int = 5
+    # image_url comes from users: only public addresses are fetched (checked on
+    # every redirect), or, when set, only these hosts (e.g. an internal image store)
+    IMAGE_ALLOWED_HOSTS: List[str] = []
+    THUMBNAILS_DIR: str = "thumbnails"
+    THUMBNAIL_SIZE: int = 256
+
     def get_secret_key(self) -> str:
         """Retrieve SECRET_KEY from Vault or fallback to environment variable"""
         if self.SECRET_KEY:
             return self.SECRET_KEY
-            
+
         try:
             client = hvac.Client(url=self.VAULT_URL, token=self.VAULT_TOKEN)
             if client.is_authenticated():
@@ -32,11 +188,11 @@ class Settings(BaseSettings):
                 return response['data']['data']['SECRET_KEY']
         except Exception:
             pass
-            
+
         # Fallback to environment variable
         return os.getenv("SECRET_KEY", "fallback-secret-key-change-in-production")
-    
+
     model_config = ConfigDict(env_file=".env")
-    
 
-settings = Settings()
\ No newline at end of file
+
+settings = Settings()
@@ -1,7 +1,19 @@
+import functools
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+)
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from typing import Optional, List, Dict, Any
+from app.core import tenancy
+from app.core.deadline import bounded
+from app.core.documents import LIVE_DAMAGE
+from app.core.memory import MemoryClient
+from app.core.singleflight import reads, normalise
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 
 
 class MongoDB:
@@ -17,18 +29,123 @@ def get_database():
     return mongodb.db
 
 
-def get_collection(collection_name: str):
-    """Get collection instance"""
-    return mongodb.db[collection_name]
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(read_method: Optional[str] = None):
+    """
+    Read preference of a lag-tolerant read method (listings, stats, exports):
+    its READ_PREFERENCES entry, else SECONDARY_READ_PREFERENCE. Unnamed reads
+    use the primary.
+    """
+    if read_method is None:
+        return Primary()
+    mode = _READ_PREFERENCES[
+        settings.READ_PREFERENCES.get(read_method, settings.SECONDARY_READ_PREFERENCE)
+    ]
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=settings.SECONDARY_MAX_STALENESS_SECONDS)
+
+
+def get_collection(collection_name: str, read_method: Optional[str] = None):
+    """
+    Get collection instance of the current tenant.
+    read_method names a lag-tolerant read, routed by read_preference.
+    """
+    coll = mongodb.db[tenancy.collection_name(collection_name)]
+    preference = read_preference(read_method)
+    if not isinstance(preference, Primary):
+        return coll.with_options(read_preference=preference)
+    return coll
+
+
+def pool_size_per_worker() -> int:
+    """Share MONGO_MAX_POOL_SIZE between the server worker processes"""
+    return max(1, settings.MONGO_MAX_POOL_SIZE // max(1, settings.SERVER_WORKERS))
 
 
 async def connect_to_mongo():
-    """Connect to MongoDB"""
-    mongodb.client = AsyncIOMotorClient(settings.MONGO_URI)
+    """Connect to MongoDB (or the in-memory backend, by MONGO_BACKEND)"""
+    if settings.MONGO_BACKEND == "memory":
+        mongodb.client = MemoryClient(settings.MONGO_URI)
+        mongodb.db = mongodb.client.get_default_database()
+        print("✅ Using the in-memory database")
+        return
+    mongodb.client = AsyncIOMotorClient(
+        settings.MONGO_URI, maxPoolSize=pool_size_per_worker()
+    )
     mongodb.db = mongodb.client.get_default_database()
     print("✅ Connected to MongoDB")
 
 
+# Server error of create_index when an index exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+
+
+async def _ensure_ttl_index(collection: str, field: str, seconds: int, **kwargs):
+    """
+    Create a TTL index on field. If it exists with another expireAfterSeconds
+    (the setting changed), create_index fails with IndexOptionsConflict, so the
+    index is changed in place with collMod instead.
+    """
+    try:
+        await get_collection(collection).create_index(
+            field, expireAfterSeconds=seconds, **kwargs
+        )
+    except OperationFailure as exc:
+        if exc.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        await mongodb.db.command(
+            "collMod", tenancy.collection_name(collection),
+            index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds},
+        )
+
+
+async def ensure_indexes():
+    """Create the indexes the API relies on"""
+    # Live queries only ever read live damages, so the claim_id index skips deleted
+    # ones;
+    # deleted ones are purged by a TTL index that covers nothing else
+    await get_collection("damages").create_index(
+        "claim_id", name="claim_id_live", partialFilterExpression=LIVE_DAMAGE
+    )
+    await _ensure_ttl_index(
+        "damages", "deleted_at", settings.DAMAGES_PURGE_AFTER_DAYS * 24 * 60 * 60,
+        partialFilterExpression={"deleted_at": {"$type": "date"}},
+    )
+    await get_collection("claims").create_index("damages.id", sparse=True)
+    await get_collection("claims").create_index(
+        "damages.deleted_at",
+        partialFilterExpression={"damages.deleted_at": {"$type": "date"}},
+    )
+    await get_collection("claims").create_index(
+        [("status", 1), ("status_changed_at", 1)]
+    )
+    # Duplicate detection looks candidates up by exact fingerprint or shared LSH band
+    await get_collection("claims").create_index(
+        "fingerprint", partialFilterExpression={"fingerprint": {"$type": "string"}}
+    )
+    await get_collection("claims").create_index("minhash_bands")
+    await get_collection("damages_archive").create_index("claim_id")
+    await get_collection("jobs").create_index([("status", 1), ("run_at", 1)])
+    # Finished jobs are purged; pending and running ones never carry finished_at
+    await _ensure_ttl_index(
+        "jobs", "finished_at", settings.JOB_RETENTION_SECONDS,
+        partialFilterExpression={"status": {"$in": ["done", "failed"]}},
+    )
+    await get_collection("claim_events").create_index([("claim_id", 1), ("at", 1)])
+    await _ensure_ttl_index(
+        "idempotency_keys", "created_at", settings.IDEMPOTENCY_TTL_SECONDS
+    )
+
+
 async def close_mongo_connection():
     """Close MongoDB connection"""
     if mongodb.client:
@@ -36,21 +153,43 @@ async def close_mongo_connection():
         print("🛑 MongoDB connection closed")
 
 
+def _invalidates_reads(func):
+    """Detach coalesced in-flight reads of a collection once a write to it finishes"""
+    @functools.wraps(func)
+    async def wrapper(collection: str, *args, **kwargs):
+        try:
+            return await func(collection, *args, **kwargs)
+        finally:
+            reads.forget(collection)
+    return wrapper
+
+
+def _bounded(func):
+    """Run a helper within the current request deadline (maxTimeMS + asyncio timeout)"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await bounded(func(*args, **kwargs))
+    return wrapper
+
+
 # Legacy compatibility functions
-async def execute_query(collection: str, filter_query: Dict[str, Any] = None) -> List[Dict]:
+async def execute_query(
+    collection: str,
+    filter_query: Dict[str, Any] = None,
+    read_method: Optional[str] = None,
+) -> List[Dict]:
     """Execute a find query and return results"""
-    coll = get_collection(collection)
-    cursor = coll.find(filter_query or {})
-    return await cursor.to_list(length=None)
+    return await find_many(collection, filter_query, read_method=read_method)
 
 
 async def execute_one(collection: str, filter_query: Dict[str, Any]) -> Optional[Dict]:
     """Execute a find_one query and return single result"""
-    coll = get_collection(collection)
-    return await coll.find_one(filter_query)
+    return await find_one(collection, filter_query)
 
 
 # MongoDB-oriented API
+@_invalidates_reads
+@_bounded
 async def insert_one(collection: str, document: Dict[str, Any]) -> str:
     """Insert a document and return its ID"""
     coll = get_collection(collection)
@@ -58,6 +197,8 @@ async def insert_one(collection: str, document: Dict[str, Any]) -> str:
     return str(result.inserted_id)
 
 
+@_invalidates_reads
+@_bounded
 async def insert_many(collection: str, documents: List[Dict[str, Any]]) -> List[str]:
     """Insert multiple documents and return their IDs"""
     coll = get_collection(collection)
@@ -65,28 +206,119 @@ async def insert_many(collection: str, documents: List[Dict[str, Any]]) -> List[
     return [str(id) for id in result.inserted_ids]
 
 
+@_bounded
 async def find_one(collection: str, filter_query: Dict[str, Any]) -> Optional[Dict]:
-    """Find a single document"""
+    """Find a single document (identical concurrent lookups share one query)"""
     coll = get_collection(collection)
-    return await coll.find_one(filter_query)
+    key = (collection, "find_one", normalise(filter_query))
+    return await reads.do(key, lambda: coll.find_one(filter_query), tags=(collection,))
+
+
+@_bounded
+async def find_many(
+    collection: str,
+    filter_query: Dict[str, Any] = None,
+    limit: int = 0,
+    sort: Optional[List] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    read_method: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Find multiple documents (identical concurrent queries share one cursor).
+    read_method names a lag-tolerant read (e.g. "claims.list"), which may run
+    on a secondary by READ_PREFERENCES; leave it out for reads that must see
+    the caller's own writes.
+    """
+    coll = get_collection(collection, read_method)
+
+    async def query():
+        if projection:
+            cursor = coll.find(filter_query or {}, projection)
+        else:
+            cursor = coll.find(filter_query or {})
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit > 0:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    key = (
+        collection,
+        "find",
+        normalise(filter_query),
+        limit,
+        normalise(sort),
+        normalise(projection),
+        str(read_preference(read_method)),
+    )
+    return await reads.do(key, query, tags=(collection,))
+
+
+async def find_batches(
+    collection: str,
+    filter_query: Dict[str, Any] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    batch_size: int = 1000,
+    read_method: Optional[str] = None,
+) -> AsyncIterator[List[Dict]]:
+    """
+    Stream a query in _id order as lists of up to batch_size documents, so
+    only one batch is held in memory (exports, bulk jobs). Each batch is
+    fetched within the request deadline.
+    """
+    coll = get_collection(collection, read_method)
+    cursor = (
+        coll.find(filter_query or {}, projection)
+        if projection
+        else coll.find(filter_query or {})
+    )
+    cursor = cursor.sort("_id", 1).batch_size(batch_size)
+
+    # Motor starts the fetch as soon as to_list is called, so call it inside
+    # bounded, where the timeout is set and sent as maxTimeMS
+    async def next_batch():
+        return await cursor.to_list(length=batch_size)
+
+    try:
+        while batch := await bounded(next_batch()):
+            yield batch
+    finally:
+        await cursor.close()
+
+
+@_invalidates_reads
+@_bounded
+async def update_one(collection: str, filter_query: Dict[str, Any], update_data: Dict[str, Any]) -> int:
+    """Update a single document"""
+    coll = get_collection(collection)
+    result = await coll.update_one(filter_query, {"$set": update_data})
+    return result.modified_count
 
 
-async def find_many(collection: str, filter_query: Dict[str, Any] = None, limit: int = 0) -> List[Dict]:
-    """Find multiple documents"""
+@_invalidates_reads
+@_bounded
+async def upsert_one(
+    collection: str, filter_query: Dict[str, Any], update_data: Dict[str, Any]
+) -> int:
+    """Update a single document, creating it if it does not exist"""
     coll = get_collection(collection)
-    cursor = coll.find(filter_query or {})
-    if limit > 0:
-        cursor = cursor.limit(limit)
-    return await cursor.to_list(length=None)
+    result = await coll.update_one(filter_query, {"$set": update_data}, upsert=True)
+    return result.modified_count or int(result.upserted_id is not None)
 
 
-async def update_one(collection: str, filter_query: Dict[str, Any], update_data: Dict[str, Any]) -> int:
-    """Update a single document"""
+@_invalidates_reads
+@_bounded
+async def update_one_matched(
+    collection: str, filter_query: Dict[str, Any], update_data: Dict[str, Any]
+) -> int:
+    """Update a single document and return how many matched (idempotent writes)"""
     coll = get_collection(collection)
     result = await coll.update_one(filter_query, {"$set": update_data})
-    return result.modified_count
+    return result.matched_count
 
 
+@_invalidates_reads
+@_bounded
 async def update_many(collection: str, filter_query: Dict[str, Any], update_data: Dict[str, Any]) -> int:
     """Update multiple documents"""
     coll = get_collection(collection)
@@ -94,6 +326,142 @@ async def update_many(collection: str, filter_query: Dict[str, Any], update_data
     return result.modified_count
 
 
+@_invalidates_reads
+@_bounded
+async def bulk_update(
+    collection: str, updates: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+) -> int:
+    """Apply (filter, $set) updates in one unordered bulk_write; returns matched"""
+    coll = get_collection(collection)
+    result = await coll.bulk_write(
+        [
+            UpdateOne(filter_query, {"$set": update_data})
+            for filter_query, update_data in updates
+        ],
+        ordered=False,
+    )
+    return result.matched_count
+
+
+@_invalidates_reads
+@_bounded
+async def insert_missing(collection: str, documents: List[Dict[str, Any]]) -> int:
+    """
+    Insert documents in one unordered insert_many, skipping those whose _id
+    already exists (safe to repeat). Returns the number inserted.
+    """
+    coll = get_collection(collection)
+    try:
+        result = await coll.insert_many(documents, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as exc:
+        if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+            raise
+        return exc.details["nInserted"]
+
+
+@_invalidates_reads
+@_bounded
+async def replace_many(collection: str, documents: List[Dict[str, Any]]) -> int:
+    """Insert or replace documents by _id in one unordered bulk_write (repeatable)"""
+    coll = get_collection(collection)
+    result = await coll.bulk_write(
+        [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in documents],
+        ordered=False
+    )
+    return result.upserted_count + result.matched_count
+
+
+@_invalidates_reads
+@_bounded
+async def push_one(
+    collection: str, filter_query: Dict[str, Any], field: str, value: Any
+) -> int:
+    """Append a value to an array field of a single document"""
+    coll = get_collection(collection)
+    result = await coll.update_one(filter_query, {"$push": {field: value}})
+    return result.modified_count
+
+
+@_invalidates_reads
+@_bounded
+async def pull_one(
+    collection: str, filter_query: Dict[str, Any], field: str, condition: Any
+) -> int:
+    """Remove matching values from an array field of a single document"""
+    coll = get_collection(collection)
+    result = await coll.update_one(filter_query, {"$pull": {field: condition}})
+    return result.modified_count
+
+
+@_invalidates_reads
+@_bounded
+async def pull_many(
+    collection: str, filter_query: Dict[str, Any], field: str, condition: Any
+) -> int:
+    """Remove matching values from an array field of every matching document"""
+    coll = get_collection(collection)
+    result = await coll.update_many(filter_query, {"$pull": {field: condition}})
+    return result.modified_count
+
+
+@_invalidates_reads
+@_bounded
+async def unset_one(
+    collection: str, filter_query: Dict[str, Any], fields: List[str]
+) -> int:
+    """Remove fields from a single document"""
+    coll = get_collection(collection)
+    result = await coll.update_one(filter_query, {"$unset": {f: "" for f in fields}})
+    return result.modified_count
+
+
+@_invalidates_reads
+@_bounded
+async def find_one_and_update(
+    collection: str,
+    filter_query: Dict[str, Any],
+    update: Dict[str, Any],
+    sort: Optional[List] = None,
+) -> Optional[Dict]:
+    """Atomically update a single document and return it after the update"""
+    coll = get_collection(collection)
+    return await coll.find_one_and_update(
+        filter_query, update, sort=sort, return_document=ReturnDocument.AFTER
+    )
+
+
+@_bounded
+async def next_sequence(name: str) -> int:
+    """Return the next value of a named counter (stable integer IDs)"""
+    coll = get_collection("counters")
+    doc = await coll.find_one_and_update(
+        {"_id": name}, {"$inc": {"seq": 1}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc["seq"]
+
+
+@_bounded
+async def reserve_sequence(name: str, count: int) -> int:
+    """Reserve count consecutive values of a named counter and return the first"""
+    coll = get_collection("counters")
+    doc = await coll.find_one_and_update(
+        {"_id": name}, {"$inc": {"seq": count}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc["seq"] - count + 1
+
+
+@_bounded
+async def advance_sequence(name: str, value: int):
+    """Move a named counter forward to at least value (after loading IDs)"""
+    coll = get_collection("counters")
+    await coll.update_one({"_id": name}, {"$max": {"seq": value}}, upsert=True)
+
+
+@_invalidates_reads
+@_bounded
 async def delete_one(collection: str, filter_query: Dict[str, Any]) -> int:
     """Delete a single document"""
     coll = get_collection(collection)
@@ -101,8 +469,10 @@ async def delete_one(collection: str, filter_query: Dict[str, Any]) -> int:
     return result.deleted_count
 
 
+@_invalidates_reads
+@_bounded
 async def delete_many(collection: str, filter_query: Dict[str, Any]) -> int:
     """Delete multiple documents"""
     coll = get_collection(collection)
     result = await coll.delete_many(filter_query)
-    return result.deleted_count
\ No newline at end of file
+    return result.deleted_count
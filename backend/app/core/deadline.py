@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Optional
+
+import pymongo
+from pymongo.errors import PyMongoError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.admission import route_matches
+from app.core.config import settings
+
+# Monotonic time by which the current request must be done (None outside requests)
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+stats: Dict[str, int] = {"timed_out": 0, "client_disconnects": 0}
+
+# Only these are cancelled when the client goes away: a write may already be
+# applied, so the rest of its handler (response, follow-up jobs) must run
+CANCELLABLE_METHODS = ("GET", "HEAD")
+
+
+class DeadlineExceeded(Exception):
+    """A database operation ran past the request deadline"""
+
+
+def timeout_for(method: str, path: str) -> float:
+    """Deadline in seconds of a route: its ROUTE_TIMEOUTS entry or REQUEST_TIMEOUT"""
+    for route, seconds in settings.ROUTE_TIMEOUTS.items():
+        if route_matches(method, path, [route]):
+            return seconds
+    return settings.REQUEST_TIMEOUT
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, None without one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def set_deadline(seconds: float):
+    """Start a deadline in the current context; returns a token for reset_deadline"""
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def unbounded():
+    """Run the enclosed operations without the request deadline"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def own_deadline(seconds: Optional[float]):
+    """Run the enclosed operations within their own deadline instead of the request's"""
+    if seconds is None:
+        yield
+        return
+    token = set_deadline(seconds)
+    try:
+        yield
+    finally:
+        reset_deadline(token)
+
+
+async def bounded(operation: Awaitable[Any]) -> Any:
+    """
+    Await a database operation within the remaining request time: pymongo.timeout
+    sends it as maxTimeMS so the server stops the query, and an asyncio timeout
+    stops waiting for it.
+    """
+    left = remaining()
+    if left is None:
+        return await operation
+
+    if left <= 0:
+        operation.close()
+        stats["timed_out"] += 1
+        raise DeadlineExceeded()
+
+    with pymongo.timeout(left):
+        try:
+            return await asyncio.wait_for(operation, left)
+        except asyncio.TimeoutError:
+            stats["timed_out"] += 1
+            raise DeadlineExceeded() from None
+        except PyMongoError as exc:
+            if exc.timeout:
+                stats["timed_out"] += 1
+                raise DeadlineExceeded() from exc
+            raise
+
+
+class DeadlineMiddleware:
+    """
+    Gives each request under prefix a deadline (see timeout_for) and cancels
+    the handler of a read (CANCELLABLE_METHODS), with any database work it
+    awaits, if the client disconnects before the response is complete.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = ""):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        messages: "asyncio.Queue[Message]" = asyncio.Queue()
+        response_complete = False
+        disconnected = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                response_complete = True
+            await send(message)
+
+        token = set_deadline(timeout_for(scope["method"], scope["path"]))
+        try:
+            # The task copies the context, deadline included
+            handler = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+        finally:
+            reset_deadline(token)
+
+        async def listen():
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if scope["method"] not in CANCELLABLE_METHODS:
+                        return
+                    if not response_complete and not handler.done():
+                        disconnected = True
+                        stats["client_disconnects"] += 1
+                        handler.cancel()
+                    return
+
+        listener = asyncio.ensure_future(listen())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+        finally:
+            listener.cancel()
@@ -0,0 +1,103 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core import money
+from app.schemas.models import Claim, ClaimBase, Damage, DamageBase
+
+
+def damage_to_document(damage: DamageBase) -> Dict[str, Any]:
+    """Serialize a damage payload into its MongoDB shape (price as Int64 cents)"""
+    return {
+        "part": damage.part,
+        "severity": (
+            damage.severity.value
+            if hasattr(damage.severity, "value")
+            else damage.severity
+        ),
+        "image_url": str(damage.image_url),
+        "price": money.to_document(damage.price),
+        "score": damage.score,
+    }
+
+
+def claim_to_document(claim: ClaimBase) -> Dict[str, Any]:
+    """Serialize a claim payload into its MongoDB shape"""
+    return {
+        "title": claim.title,
+        "description": claim.description,
+        "status": (
+            claim.status.value if hasattr(claim.status, "value") else claim.status
+        ),
+    }
+
+
+# API field -> document path, used to project sparse fieldsets
+CLAIM_PATHS = {
+    "id": "_id",
+    "title": "title",
+    "description": "description",
+    "status": "status",
+    "damages": "damages",
+}
+DAMAGE_PATHS = {
+    "id": "_id", "claim_id": "claim_id", "part": "part", "severity": "severity",
+    "image_url": "image_url", "price": "price", "score": "score",
+}
+
+
+# Live (not soft-deleted) damages. Damages are written with deleted_at: null, so
+# this is also the partial filter of the damages indexes used by live queries.
+LIVE_DAMAGE: Dict[str, Any] = {"deleted_at": {"$type": "null"}}
+
+
+def live_damages(filter_query: Dict[str, Any]) -> Dict[str, Any]:
+    """Damages filter restricted to live damages"""
+    return {**filter_query, **LIVE_DAMAGE}
+
+
+def is_live(item: Dict[str, Any]) -> bool:
+    """Whether a damage document or embedded item is not soft-deleted"""
+    return item.get("deleted_at") is None
+
+
+def projection(
+    fields: Iterable[str], paths: Dict[str, str], prefix: str = ""
+) -> Dict[str, int]:
+    """MongoDB projection that reads only the given API fields"""
+    return {prefix + paths[f]: 1 for f in fields if paths.get(f)}
+
+
+def damage_values(
+    doc: Dict[str, Any], claim_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """Damage attributes of a (possibly projected) document or embedded item"""
+    values = {
+        "id": doc["id"] if "id" in doc else doc.get("_id"),
+        "claim_id": doc.get("claim_id", claim_id),
+    }
+    for field in ("part", "severity", "image_url", "score"):
+        if field in doc:
+            values[field] = doc[field]
+    if "price" in doc:
+        values["price"] = money.from_document(doc["price"])
+    return values
+
+
+def claim_values(doc: Dict[str, Any], damages: List[Damage]) -> Dict[str, Any]:
+    """Claim attributes of a (possibly projected) document"""
+    values = {"id": doc["_id"], "damages": damages}
+    for field in ("title", "description", "status"):
+        if field in doc:
+            values[field] = doc[field]
+    return values
+
+
+def damage_from_document(doc: Dict[str, Any], claim_id: Optional[int] = None) -> Damage:
+    """Build a Damage from a document of the damages collection or an embedded item"""
+    return Damage(**damage_values(doc, claim_id))
+
+
+def claim_from_document(doc: Dict[str, Any], damages: List[Damage]) -> Claim:
+    """Build a Claim from a document of the claims collection"""
+    values = claim_values(doc, damages)
+    values.setdefault("description", None)
+    return Claim(**values)
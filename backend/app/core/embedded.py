@@ -0,0 +1,207 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import bson
+
+from app.core.config import settings
+from app.core.db import (
+    find_one, find_many, insert_one, update_one, update_one_matched, push_one, pull_many
+)
+from app.core.documents import (
+    DAMAGE_PATHS, LIVE_DAMAGE, damage_from_document, damage_values, is_live,
+    live_damages, projection
+)
+from app.core.jobs import job_handler, job_queue
+from app.core.tenancy import all_tenants, tenant_scope
+from app.schemas.models import Damage
+
+
+def is_enabled() -> bool:
+    """Whether damages are stored embedded inside their claim document"""
+    return settings.DAMAGES_STORAGE == "embedded"
+
+
+def fits(claim_doc: Dict[str, Any], item: Dict[str, Any]) -> bool:
+    """Check that appending item keeps the claim under the document size guard"""
+    size = len(bson.encode(claim_doc)) + len(bson.encode(item))
+    return size <= settings.EMBEDDED_DAMAGES_MAX_BYTES
+
+
+async def load_damages(
+    claim_doc: Dict[str, Any], read_method: Optional[str] = None
+) -> List[Damage]:
+    """Damages of a claim: embedded items plus any spilled to the damages collection"""
+    damages = [
+        damage_from_document(d, claim_doc["_id"])
+        for d in claim_doc.get("damages", [])
+        if is_live(d)
+    ]
+    if claim_doc.get("damages_spilled"):
+        spilled = await find_many(
+            "damages",
+            live_damages({"claim_id": claim_doc["_id"]}),
+            read_method=read_method,
+        )
+        damages.extend(damage_from_document(d) for d in spilled)
+    return damages
+
+
+# Embedded items keep their ID in "id" and take claim_id from the parent claim
+_ITEM_PATHS = {**DAMAGE_PATHS, "id": "id", "claim_id": None}
+
+
+async def all_damages(read_method: Optional[str] = None) -> List[Damage]:
+    """Every damage across all claims"""
+    return [
+        Damage(**values) for values in await all_damage_values(read_method=read_method)
+    ]
+
+
+async def all_damage_values(
+    fields: Optional[Sequence[str]] = None, read_method: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Attributes of every damage across all claims, reading only fields when given"""
+    claims_projection = damages_projection = None
+    if fields:
+        wanted = {"id", *fields}  # id is always needed to order the result
+        claims_projection = projection(wanted, _ITEM_PATHS, prefix="damages.")
+        claims_projection["damages.deleted_at"] = 1
+        damages_projection = projection(wanted, DAMAGE_PATHS)
+
+    values = []
+    for claim_doc in await find_many(
+        "claims", {}, projection=claims_projection, read_method=read_method
+    ):
+        values.extend(
+            damage_values(d, claim_doc["_id"])
+            for d in claim_doc.get("damages", [])
+            if is_live(d)
+        )
+    spilled = await find_many(
+        "damages", LIVE_DAMAGE, projection=damages_projection, read_method=read_method
+    )
+    values.extend(damage_values(d) for d in spilled)
+    return sorted(values, key=lambda v: v["id"])
+
+
+async def find_damage(
+    damage_id: int, deleted: bool = False
+) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], bool]]:
+    """
+    Locate a live damage by ID (with deleted=True, a soft-deleted one), in
+    either storage mode. Returns (claim document, damage document, embedded) or None.
+    """
+    claim_doc = (
+        await find_one("claims", {"damages.id": damage_id}) if is_enabled() else None
+    )
+    if claim_doc:
+        item = next(d for d in claim_doc["damages"] if d["id"] == damage_id)
+        return (claim_doc, item, True) if is_live(item) != deleted else None
+
+    damage_doc = await find_one("damages", {"_id": damage_id})
+    if not damage_doc or is_live(damage_doc) == deleted:
+        return None
+    claim_doc = await find_one("claims", {"_id": damage_doc["claim_id"]})
+    if not claim_doc:
+        return None
+    return claim_doc, damage_doc, False
+
+
+async def add_damage(
+    claim_doc: Dict[str, Any], damage_id: int, document: Dict[str, Any]
+) -> int:
+    """Append a damage to a claim, spilling to the damages collection past the guard"""
+    item = {"id": damage_id, **document}
+    if fits(claim_doc, item):
+        return await push_one("claims", {"_id": claim_doc["_id"]}, "damages", item)
+
+    result = await insert_one(
+        "damages", {"_id": damage_id, "claim_id": claim_doc["_id"], **document}
+    )
+    if not claim_doc.get("damages_spilled"):
+        await update_one("claims", {"_id": claim_doc["_id"]}, {"damages_spilled": True})
+    return 1 if result else 0
+
+
+async def replace_damage(
+    claim_id: int, damage_id: int, document: Dict[str, Any], embedded: bool
+) -> int:
+    """Overwrite a damage in place (positional operator when embedded)"""
+    if embedded:
+        return await update_one_matched(
+            "claims", {"_id": claim_id, "damages.id": damage_id},
+            {"damages.$": {"id": damage_id, **document}}
+        )
+    return await update_one_matched("damages", {"_id": damage_id}, document)
+
+
+async def remove_damage(claim_id: int, damage_id: int, embedded: bool) -> int:
+    """Soft-delete a damage of its claim: it can be restored until it is purged"""
+    return await _set_deleted_at(
+        claim_id, damage_id, embedded, datetime.now(timezone.utc)
+    )
+
+
+async def restore_damage(claim_id: int, damage_id: int, embedded: bool) -> int:
+    """Undo remove_damage"""
+    return await _set_deleted_at(claim_id, damage_id, embedded, None)
+
+
+async def _set_deleted_at(
+    claim_id: int, damage_id: int, embedded: bool, deleted_at: Optional[datetime]
+) -> int:
+    if embedded:
+        return await update_one_matched(
+            "claims",
+            {"_id": claim_id, "damages.id": damage_id},
+            {"damages.$.deleted_at": deleted_at},
+        )
+    return await update_one_matched(
+        "damages", {"_id": damage_id}, {"deleted_at": deleted_at}
+    )
+
+
+async def purge_deleted_damages(batch_size: Optional[int] = None) -> int:
+    """
+    Drop embedded damages deleted more than DAMAGES_PURGE_AFTER_DAYS ago, a batch
+    of claims at a time; returns the claims cleaned. Deleted damages in the damages
+    collection expire through its TTL index instead.
+    """
+    size = batch_size or settings.DAMAGES_PURGE_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        days=settings.DAMAGES_PURGE_AFTER_DAYS
+    )
+
+    purged = 0
+    while True:
+        claims = await find_many(
+            "claims",
+            {"damages.deleted_at": {"$type": "date", "$lt": cutoff}},
+            limit=size,
+            projection={"_id": 1},
+        )
+        if not claims:
+            return purged
+        purged += await pull_many(
+            "claims", {"_id": {"$in": [c["_id"] for c in claims]}},
+            "damages", {"deleted_at": {"$lt": cutoff}}
+        )
+        if len(claims) < size:
+            return purged
+
+
+async def start_damage_purge():
+    """Schedule the purge of deleted embedded damages for every tenant"""
+    for tenant in all_tenants():
+        with tenant_scope(tenant):
+            await job_queue.enqueue_periodic(
+                "purge_damages", settings.DAMAGES_PURGE_INTERVAL_SECONDS
+            )
+
+
+@job_handler("purge_damages")
+async def run_damage_purge(payload: Dict[str, Any]):
+    await job_queue.enqueue_periodic(
+        "purge_damages", settings.DAMAGES_PURGE_INTERVAL_SECONDS, next_period=True
+    )
+    await purge_deleted_damages()
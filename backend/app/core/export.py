@@ -0,0 +1,262 @@
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core import embedded, money
+from app.core.config import settings
+from app.core.db import find_batches, find_many
+from app.core.deadline import own_deadline
+from app.core.documents import is_live, live_damages
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional: exports are unavailable without it
+    pa = ipc = pq = None
+
+TABLES = ("claims", "damages")
+
+# format -> (file extension, media type)
+FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+# Partition value of claims without status_changed_at (Hive's null partition)
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def available() -> bool:
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+
+def schema(table: str) -> "pa.Schema":
+    """Arrow schema of an export table (prices as fixed-point decimals)"""
+    changed_at = pa.timestamp("ms", tz="UTC")
+    if table == "claims":
+        return pa.schema([
+            ("id", pa.int64()), ("title", pa.string()), ("description", pa.string()),
+            ("status", pa.string()), ("status_changed_at", changed_at),
+            ("damage_count", pa.int32()), ("total_price", pa.decimal128(18, 2)),
+        ])
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("claim_id", pa.int64()),
+            ("part", pa.string()),
+            ("severity", pa.string()),
+            ("image_url", pa.string()),
+            ("price", pa.decimal128(10, 2)),
+            ("score", pa.int8()),
+            ("claim_status", pa.string()),
+            ("claim_status_changed_at", changed_at),
+        ]
+    )
+
+
+def _price(value: Any) -> Optional[Decimal]:
+    return money.from_document(value).to_decimal() if value is not None else None
+
+
+async def _damages_of(claims: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    """Live damage documents of a batch of claims, by claim (one $in query)"""
+    damages: Dict[int, List[Dict[str, Any]]] = {doc["_id"]: [] for doc in claims}
+    if embedded.is_enabled():
+        for doc in claims:
+            damages[doc["_id"]] = [
+                {"_id": d["id"], **d} for d in doc.get("damages", []) if is_live(d)
+            ]
+        pending = [doc["_id"] for doc in claims if doc.get("damages_spilled")]
+    else:
+        pending = list(damages)
+
+    if pending:
+        spilled = await find_many(
+            "damages",
+            live_damages({"claim_id": {"$in": pending}}),
+            read_method="claims.export",
+        )
+        for doc in spilled:
+            damages[doc["claim_id"]].append(doc)
+    return damages
+
+
+def _record_batch(
+    table: str, claims: List[Dict[str, Any]], damages: Dict[int, List[Dict[str, Any]]]
+) -> "pa.RecordBatch":
+    if table == "claims":
+        columns: Dict[str, list] = {name: [] for name in schema("claims").names}
+        for doc in claims:
+            items = damages[doc["_id"]]
+            columns["id"].append(doc["_id"])
+            columns["title"].append(doc.get("title"))
+            columns["description"].append(doc.get("description"))
+            columns["status"].append(doc.get("status"))
+            columns["status_changed_at"].append(doc.get("status_changed_at"))
+            columns["damage_count"].append(len(items))
+            total = sum(
+                (
+                    money.from_document(d["price"])
+                    for d in items
+                    if d.get("price") is not None
+                ),
+                money.Money(),
+            )
+            columns["total_price"].append(total.to_decimal())
+    else:
+        columns = {name: [] for name in schema("damages").names}
+        for doc in claims:
+            for d in damages[doc["_id"]]:
+                columns["id"].append(d["_id"])
+                columns["claim_id"].append(doc["_id"])
+                for field in ("part", "severity", "image_url", "score"):
+                    columns[field].append(d.get(field))
+                columns["price"].append(_price(d.get("price")))
+                columns["claim_status"].append(doc.get("status"))
+                columns["claim_status_changed_at"].append(doc.get("status_changed_at"))
+    return pa.record_batch(list(columns.values()), schema=schema(table))
+
+
+def partition_key(claim_doc: Dict[str, Any]) -> Tuple[str, str]:
+    """(status, YYYY-MM of status_changed_at) partition of a claim and its damages"""
+    changed_at = claim_doc.get("status_changed_at")
+    month = (
+        changed_at.strftime("%Y-%m")
+        if isinstance(changed_at, datetime)
+        else NULL_PARTITION
+    )
+    return claim_doc.get("status") or NULL_PARTITION, month
+
+
+async def record_batches(
+    table: str,
+    batch_size: Optional[int] = None,
+    partitioned: bool = False,
+    batch_timeout: Optional[float] = None,
+) -> AsyncIterator[Tuple[Optional[Tuple[str, str]], "pa.RecordBatch"]]:
+    """
+    Stream an export table as (partition key, record batch) pairs, reading the
+    claims from a cursor batch_size at a time (secondaries allowed). The key is
+    None unless partitioned. With batch_timeout, reading each batch (claims and
+    their damages) has that deadline instead of the request's.
+    """
+    size = batch_size or settings.EXPORT_BATCH_SIZE
+    batches = find_batches("claims", batch_size=size, read_method="claims.export")
+    try:
+        while True:
+            with own_deadline(batch_timeout):
+                claims = await anext(batches, None)
+                if claims is None:
+                    return
+                damages = await _damages_of(claims)
+            if not partitioned:
+                yield None, _record_batch(table, claims, damages)
+                continue
+            groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+            for doc in claims:
+                groups.setdefault(partition_key(doc), []).append(doc)
+            for key, group in groups.items():
+                yield key, _record_batch(table, group, damages)
+    finally:
+        await batches.aclose()
+
+
+class _Sink:
+    """Write-only file object that hands the written bytes back in pieces"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _open_writer(fmt: str, sink: Any, table: str):
+    compression = (
+        None if settings.EXPORT_COMPRESSION == "none" else settings.EXPORT_COMPRESSION
+    )
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema(table), compression=compression or "none")
+    return ipc.new_file(
+        sink, schema(table), options=ipc.IpcWriteOptions(compression=compression)
+    )
+
+
+async def stream_export(
+    table: str, fmt: str, batch_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """An export file as a stream of byte chunks, one per record batch"""
+    sink = _Sink()
+    writer = _open_writer(fmt, sink, table)
+    try:
+        # No deadline for the whole download: a large export takes as long as it
+        # takes, but each batch read is bounded
+        async for _, batch in record_batches(
+            table, batch_size, batch_timeout=settings.EXPORT_BATCH_TIMEOUT
+        ):
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+async def write_export(
+    table: str,
+    fmt: str,
+    path: str,
+    partitioned: bool = False,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Write an export to path, or with partitioned to a Hive-style directory tree
+    (path/status=.../month=.../part-0.parquet). Returns the rows written.
+    """
+    extension = FORMATS[fmt][0]
+    writers: Dict[Optional[Tuple[str, str]], Any] = {}
+    rows = 0
+    try:
+        async for key, batch in record_batches(table, batch_size, partitioned):
+            if key not in writers:
+                target = path
+                if key is not None:
+                    directory = os.path.join(
+                        path, f"status={key[0]}", f"month={key[1]}"
+                    )
+                    os.makedirs(directory, exist_ok=True)
+                    target = os.path.join(directory, "part-0" + extension)
+                writers[key] = _open_writer(fmt, target, table)
+            writers[key].write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    if not writers and not partitioned:
+        _open_writer(fmt, path, table).close()  # empty table, same schema
+    return rows
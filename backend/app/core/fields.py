@@ -0,0 +1,60 @@
+import functools
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, create_model, field_validator
+
+
+def parse_fields(
+    fields: Optional[str], model: Type[BaseModel]
+) -> Optional[Tuple[str, ...]]:
+    """
+    Field names of a ?fields=a,b,c sparse fieldset, None when not requested.
+    Unknown names are a 400 so typos do not silently return empty objects.
+    """
+    if not fields:
+        return None
+
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in model.model_fields]
+    if not names or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Unknown fields: {', '.join(unknown)}"
+                if unknown
+                else "fields is empty"
+            ),
+        )
+    return names
+
+
+@functools.lru_cache(maxsize=256)
+def partial_model(model: Type[BaseModel], names: Tuple[str, ...]) -> Type[BaseModel]:
+    """Model with only the given fields of model (same types and constraints)"""
+    definitions = {
+        n: (model.model_fields[n].annotation, model.model_fields[n]) for n in names
+    }
+    # Field validators (e.g. price normalisation) apply to the trimmed model too
+    validators = {
+        name: field_validator(*d.info.fields, mode=d.info.mode, check_fields=False)(
+            d.func.__func__
+        )
+        for name, d in model.__pydantic_decorators__.field_validators.items()
+        if set(d.info.fields) & set(names)
+    }
+    return create_model(
+        f"{model.__name__}Fields", __validators__=validators, **definitions
+    )
+
+
+def sparse_response(
+    model: Type[BaseModel], names: Tuple[str, ...], rows: Iterable[Dict[str, Any]]
+) -> JSONResponse:
+    """Validate rows against the trimmed model and serialize only the fields asked"""
+    trimmed = partial_model(model, names)
+    content: List[Dict[str, Any]] = [
+        trimmed(**{n: row[n] for n in names}).model_dump(mode="json") for row in rows
+    ]
+    return JSONResponse(content=content)
@@ -0,0 +1,219 @@
+import hashlib
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core import embedded, money
+from app.core.config import settings
+from app.core.db import bulk_update, execute_one, find_batches, find_many, update_one
+from app.core.documents import is_live, live_damages
+from app.core.jobs import job_handler, job_queue
+
+# MinHash over the damage tokens of a claim, split into LSH bands: two claims
+# whose token sets have Jaccard similarity s share at least one band with
+# probability 1 - (1 - s^rows)^bands, so near-duplicates are found through an
+# index on the bands instead of comparing every pair of claims.
+_PRIME = (1 << 61) - 1
+_rng = random.Random(
+    20240601
+)  # fixed: signatures must be comparable across processes and releases
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(settings.DUPLICATES_MINHASH_BANDS * settings.DUPLICATES_MINHASH_ROWS)
+]
+
+_FIELDS = ("part", "severity", "price", "deleted_at")
+
+
+def _normalise(damage: Dict[str, Any]) -> Tuple[str, str, str]:
+    price = damage.get("price")
+    price = money.from_document(price) if price is not None else ""
+    return (
+        " ".join(str(damage.get("part", "")).casefold().split()),
+        str(damage.get("severity", "")),
+        str(price),
+    )
+
+
+def tokens(damages: Iterable[Dict[str, Any]]) -> Set[str]:
+    """Near-duplicate tokens: each (part, severity, price) and (part, severity)"""
+    result = set()
+    for part, severity, price in map(_normalise, damages):
+        result.add(f"{part}|{severity}|{price}")
+        result.add(f"{part}|{severity}")
+    return result
+
+
+def exact_fingerprint(damages: Iterable[Dict[str, Any]]) -> Optional[str]:
+    """Hash of the sorted (part, severity, price) tuples, None without damages"""
+    rows = sorted("|".join(t) for t in map(_normalise, damages))
+    if not rows:
+        return None
+    return hashlib.sha256("\n".join(rows).encode()).hexdigest()[:32]
+
+
+def _hash(token: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(token.encode(), digest_size=8).digest(), "big"
+    )
+
+
+def minhash(token_set: Set[str]) -> List[int]:
+    """MinHash signature of a token set"""
+    hashes = [_hash(t) for t in token_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def bands(signature: List[int]) -> List[str]:
+    """LSH band keys of a signature ("<band>:<hash>"), indexed for candidate lookups"""
+    rows = settings.DUPLICATES_MINHASH_ROWS
+    keys = []
+    for band in range(settings.DUPLICATES_MINHASH_BANDS):
+        chunk = ",".join(map(str, signature[band * rows:(band + 1) * rows]))
+        keys.append(
+            f"{band}:{hashlib.blake2b(chunk.encode(), digest_size=8).hexdigest()}"
+        )
+    return keys
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Jaccard similarity estimated from two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / len(a) if a and len(a) == len(b) else 0.0
+
+
+def fingerprint_fields(damages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fingerprint fields of a claim document for its live damages"""
+    live = [d for d in damages if is_live(d)]
+    if not live:
+        return {"fingerprint": None, "minhash": None, "minhash_bands": []}
+    signature = minhash(tokens(live))
+    return {
+        "fingerprint": exact_fingerprint(live),
+        "minhash": signature,
+        "minhash_bands": bands(signature),
+    }
+
+
+async def _live_damages(claim_doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    damages = list(claim_doc.get("damages", [])) if embedded.is_enabled() else []
+    if not embedded.is_enabled() or claim_doc.get("damages_spilled"):
+        damages += await find_many(
+            "damages",
+            live_damages({"claim_id": claim_doc["_id"]}),
+            projection={f: 1 for f in _FIELDS},
+        )
+    return damages
+
+
+async def refresh_fingerprint(
+    claim_id: int, as_of: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Recompute and store the fingerprint of a claim after its damages change.
+    With as_of (queued refreshes), an older refresh never overwrites a newer one.
+    """
+    claim_doc = await execute_one("claims", {"_id": claim_id})
+    if not claim_doc:
+        return None
+    fields = fingerprint_fields(await _live_damages(claim_doc))
+    if as_of is None:
+        await update_one("claims", {"_id": claim_id}, fields)
+    else:
+        await update_one(
+            "claims", {"_id": claim_id, "fingerprint_as_of": {"$not": {"$gt": as_of}}},
+            {**fields, "fingerprint_as_of": as_of},
+        )
+    return fields
+
+
+async def schedule_refresh(claim_id: int) -> str:
+    """
+    Queue a refresh of a claim's fingerprint, off the request path. The job is
+    keyed by claim and DUPLICATES_REFRESH_SECONDS-long period and runs when the
+    period ends, so a burst of damage writes costs one recomputation that sees
+    all of them.
+    """
+    interval = settings.DUPLICATES_REFRESH_SECONDS
+    now = time.time()
+    period = int(now // interval) + 1
+    return await job_queue.enqueue(
+        "refresh_fingerprint", {"claim_id": claim_id, "as_of": period * interval},
+        key=f"fingerprint:{claim_id}:{period}", delay=period * interval - now,
+    )
+
+
+@job_handler("refresh_fingerprint")
+async def run_refresh(payload: Dict[str, Any]):
+    await refresh_fingerprint(payload["claim_id"], payload["as_of"])
+
+
+async def backfill(batch_size: int = 1000) -> int:
+    """Fingerprint every claim (after imports or upgrades), batch_size per round trip"""
+    fields = (
+        {f"damages.{f}": 1 for f in _FIELDS} if embedded.is_enabled() else {"_id": 1}
+    )
+    updated = 0
+    async for claims in find_batches(
+        "claims", {}, {**fields, "damages_spilled": 1}, batch_size
+    ):
+        damages: Dict[int, List[Dict[str, Any]]] = {
+            doc["_id"]: list(doc.get("damages", [])) if embedded.is_enabled() else []
+            for doc in claims
+        }
+        pending = [
+            doc["_id"]
+            for doc in claims
+            if not embedded.is_enabled() or doc.get("damages_spilled")
+        ]
+        if pending:
+            docs = await find_many(
+                "damages", live_damages({"claim_id": {"$in": pending}}),
+                projection={"claim_id": 1, **{f: 1 for f in _FIELDS}},
+            )
+            for doc in docs:
+                damages[doc["claim_id"]].append(doc)
+        updated += await bulk_update(
+            "claims",
+            [
+                ({"_id": claim_id}, fingerprint_fields(items))
+                for claim_id, items in damages.items()
+            ],
+        )
+    return updated
+
+
+async def find_duplicates(
+    claim_id: int, limit: int
+) -> Optional[List[Tuple[int, bool, float]]]:
+    """
+    Claims that look like duplicates of claim_id, as (id, exact, similarity) with
+    the most similar first; None if the claim does not exist. Two indexed lookups
+    (exact fingerprint, shared LSH band) instead of a scan, reading at most
+    DUPLICATES_MAX_CANDIDATES candidates.
+    """
+    claim_doc = await execute_one("claims", {"_id": claim_id})
+    if not claim_doc:
+        return None
+    if not claim_doc.get("minhash"):
+        return []
+
+    candidates = await find_many(
+        "claims",
+        {"_id": {"$ne": claim_id}, "$or": [
+            {"fingerprint": claim_doc["fingerprint"]},
+            {"minhash_bands": {"$in": claim_doc["minhash_bands"]}},
+        ]},
+        projection={"fingerprint": 1, "minhash": 1},
+        limit=settings.DUPLICATES_MAX_CANDIDATES,
+        read_method="claims.duplicates",
+    )
+    results = []
+    for doc in candidates:
+        exact = doc.get("fingerprint") == claim_doc["fingerprint"]
+        score = (
+            1.0 if exact else similarity(claim_doc["minhash"], doc.get("minhash") or [])
+        )
+        if exact or score >= settings.DUPLICATES_MIN_SIMILARITY:
+            results.append((doc["_id"], exact, score))
+    results.sort(key=lambda r: (-r[2], r[0]))
+    return results[:limit]
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.db import (
+    insert_one, find_one, find_one_and_update, update_one, delete_one
+)
+from app.core.tenancy import current_tenant
+
+
+def _fingerprint(request_body: Any) -> str:
+    payload = json.dumps(request_body, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _to_body(result: Any) -> Any:
+    if isinstance(result, BaseModel):
+        return result.model_dump(mode="json")
+    return jsonable_encoder(result)
+
+
+class IdempotencyStore:
+    """
+    Replays the stored response of a request retried with the same Idempotency-Key.
+    Responses live in the TTL-indexed idempotency_keys collection, with a short
+    in-memory layer in front. Concurrent duplicates wait for the first request.
+    """
+
+    def __init__(self):
+        self._cache: Dict[Tuple[Optional[str], str], Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[Tuple[Optional[str], str], asyncio.Future] = {}
+
+    async def run(
+        self,
+        scope: str,
+        key: Optional[str],
+        request_body: Any,
+        operation: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """Run operation once per key. Returns (response body, replayed)"""
+        if not key:
+            return await operation(), False
+
+        doc_id = f"{scope}:{key}"
+        # The collection is per tenant; the in-memory layers are shared, so key them by
+        # tenant too
+        local_id = (current_tenant(), doc_id)
+        fingerprint = _fingerprint(request_body)
+
+        entry = self._cached(local_id)
+        if entry:
+            return self._replay(entry, fingerprint), True
+
+        inflight = self._inflight.get(local_id)
+        if inflight:
+            try:
+                entry = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled():
+                    # The first request went away without an answer; its write
+                    # may have been applied, so it is not run again
+                    raise self._in_progress() from None
+                raise
+            return self._replay(entry, fingerprint), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[local_id] = future
+        try:
+            entry, replayed = await self._execute(doc_id, fingerprint, operation)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody is waiting
+            raise
+        finally:
+            del self._inflight[local_id]
+
+        future.set_result(entry)
+        self._remember(local_id, entry)
+        if replayed:
+            return self._replay(entry, fingerprint), True
+        return entry["response"], False
+
+    async def _execute(
+        self, doc_id: str, fingerprint: str, operation: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        owner = await self._claim(doc_id, fingerprint)
+        if owner is None:
+            # Stored already, or being processed by another worker process
+            return await self._wait_stored(doc_id), True
+
+        # Writes are conditional on the owner: a marker taken over after its
+        # lease expired is no longer ours to complete or release
+        try:
+            body = _to_body(await operation())
+        except HTTPException as exc:
+            # Rejected requests (4xx, raised before writing) are not stored, so
+            # the client can retry them. After any other failure (5xx, deadline,
+            # cancellation) the write may have been applied: the marker stays
+            # pending and retries answer 409 until its lease expires
+            if exc.status_code < 500:
+                await delete_one("idempotency_keys", {"_id": doc_id, "owner": owner})
+            raise
+
+        await update_one(
+            "idempotency_keys",
+            {"_id": doc_id, "owner": owner},
+            {"status": "done", "response": body},
+        )
+        return {"fingerprint": fingerprint, "response": body}, False
+
+    async def _claim(self, doc_id: str, fingerprint: str) -> Optional[str]:
+        """
+        Write the pending marker of a key, or take over one whose lease expired
+        (its process died mid-request). Returns the owner token, None if the key
+        is stored or pending elsewhere.
+        """
+        owner = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        marker = {
+            "fingerprint": fingerprint,
+            "status": "pending",
+            "owner": owner,
+            "created_at": now,
+        }
+        try:
+            await insert_one("idempotency_keys", {"_id": doc_id, **marker})
+            return owner
+        except DuplicateKeyError:
+            pass
+        abandoned = now - timedelta(seconds=settings.IDEMPOTENCY_PENDING_LEASE_SECONDS)
+        taken = await find_one_and_update(
+            "idempotency_keys",
+            {"_id": doc_id, "status": "pending", "created_at": {"$lt": abandoned}},
+            {"$set": marker},
+        )
+        return owner if taken else None
+
+    async def _wait_stored(self, doc_id: str) -> Dict[str, Any]:
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            doc = await find_one("idempotency_keys", {"_id": doc_id})
+            if doc and doc["status"] == "done":
+                return doc
+            if not doc or time.monotonic() >= deadline:
+                raise self._in_progress()
+            await asyncio.sleep(0.05)
+
+    def _in_progress(self) -> HTTPException:
+        return HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is in progress, retry later"
+        )
+
+    def _replay(self, entry: Dict[str, Any], fingerprint: str) -> Any:
+        if entry["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        return entry["response"]
+
+    def _cached(self, local_id: Tuple[Optional[str], str]) -> Optional[Dict[str, Any]]:
+        cached = self._cache.get(local_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        self._cache.pop(local_id, None)
+        return None
+
+    def _remember(self, local_id: Tuple[Optional[str], str], entry: Dict[str, Any]):
+        if len(self._cache) >= settings.IDEMPOTENCY_CACHE_SIZE:
+            # Insertion ordered: drop the oldest entry
+            self._cache.pop(next(iter(self._cache)))
+        expires = time.monotonic() + settings.IDEMPOTENCY_CACHE_SECONDS
+        self._cache[local_id] = (
+            expires,
+            {"fingerprint": entry["fingerprint"], "response": entry["response"]},
+        )
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.db import upsert_one
+from app.core.embedded import find_damage
+from app.core.jobs import job_handler, job_queue
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional: size and content-type are still recorded
+    Image = None
+
+
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def thumbnail_path(name: str) -> str:
+    """Path of a cached thumbnail on local disk"""
+    return os.path.join(settings.THUMBNAILS_DIR, name)
+
+
+def make_thumbnail(content: bytes, path: str) -> bool:
+    """Write a JPEG thumbnail of content to path, False if it cannot be decoded"""
+    if Image is None:
+        return False
+    if os.path.exists(path):
+        return True
+
+    try:
+        with Image.open(io.BytesIO(content)) as img:
+            img = img.convert("RGB")
+            img.thumbnail((settings.THUMBNAIL_SIZE, settings.THUMBNAIL_SIZE))
+            directory = os.path.dirname(path) or "."
+            os.makedirs(directory, exist_ok=True)
+            # Unique temporary file: concurrent writers of the same thumbnail don't
+            # collide
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    img.save(out, "JPEG", quality=80, optimize=True)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+    except (OSError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+class BlockedURL(Exception):
+    """An image URL (or redirect target) the worker must not fetch"""
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_url(url: httpx.URL) -> Optional[str]:
+    """
+    Raise BlockedURL unless url may be fetched: http(s) to an IMAGE_ALLOWED_HOSTS
+    host, or, without an allowlist, to a host whose addresses are all public
+    (no loopback, private, link-local or reserved ranges such as cloud metadata).
+    Returns the checked address to connect to (None for allowlisted hosts).
+    """
+    if url.scheme not in ("http", "https") or not url.host:
+        raise BlockedURL("unsupported URL")
+    if settings.IMAGE_ALLOWED_HOSTS:
+        if url.host.lower() not in {h.lower() for h in settings.IMAGE_ALLOWED_HOSTS}:
+            raise BlockedURL("host not allowed")
+        return None
+
+    port = url.port or (443 if url.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            url.host, port, type=socket.SOCK_STREAM
+        )
+    except socket.gaierror:
+        raise BlockedURL("host not found")
+    if not infos or not all(_is_public(info[4][0]) for info in infos):
+        raise BlockedURL("address not allowed")
+    return infos[0][4][0].split("%")[0]
+
+
+def _pinned(request: httpx.Request, address: str) -> httpx.Request:
+    """
+    Send request to the address check_url approved instead of letting the
+    connection resolve the host again (DNS rebinding). Host header and TLS
+    (SNI and certificate) still use the host name.
+    """
+    host = request.url.host
+    request.url = request.url.copy_with(host=address)
+    request.extensions["sni_hostname"] = host
+    return request
+
+
+async def _send(
+    client: httpx.AsyncClient, method: str, url: str, stream: bool = False
+) -> httpx.Response:
+    """Send a request following redirects by hand, checking every hop"""
+    url = httpx.URL(url)
+    for _ in range(settings.IMAGE_MAX_REDIRECTS + 1):
+        address = await check_url(url)
+        request = client.build_request(method, url)
+        if address:
+            request = _pinned(request, address)
+        response = await client.send(request, stream=stream, follow_redirects=False)
+        if not response.is_redirect:
+            return response
+        await response.aclose()
+        # Relative to the URL as requested, not to the pinned address
+        url = url.join(response.headers["location"])
+    raise httpx.TooManyRedirects("too many redirects", request=request)
+
+
+def _content_type(response: httpx.Response) -> Optional[str]:
+    value = response.headers.get("content-type")
+    return value.split(";")[0].strip().lower() if value else None
+
+
+async def _download(
+    client: httpx.AsyncClient, image_url: str, meta: Dict[str, Any]
+) -> Optional[bytes]:
+    response = await _send(client, "GET", image_url, stream=True)
+    try:
+        if response.status_code >= 400:
+            meta["error"] = f"HTTP {response.status_code}"
+            return None
+        meta["content_type"] = meta["content_type"] or _content_type(response)
+
+        chunks, size = [], 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > settings.IMAGE_MAX_BYTES:
+                meta["error"] = "image too large"
+                return None
+            chunks.append(chunk)
+    finally:
+        await response.aclose()
+
+    meta["size"] = size
+    return b"".join(chunks)
+
+
+async def inspect_image(client: httpx.AsyncClient, image_url: str) -> Dict[str, Any]:
+    """
+    HEAD-check an image URL, then fetch it to build a thumbnail.
+    Servers that reject HEAD are fetched directly. URLs (and redirects) to
+    non-public addresses are refused (check_url).
+    """
+    meta = {
+        "url": image_url,
+        "content_type": None,
+        "size": None,
+        "thumbnail": None,
+        "error": None,
+        "checked_at": datetime.now(timezone.utc),
+    }
+
+    try:
+        head = await _send(client, "HEAD", image_url)
+        if head.status_code < 400:
+            meta["content_type"] = _content_type(head)
+            length = head.headers.get("content-length")
+            meta["size"] = int(length) if length and length.isdigit() else None
+
+            if meta["content_type"] and not meta["content_type"].startswith("image/"):
+                meta["error"] = "not an image"
+                return meta
+            if meta["size"] and meta["size"] > settings.IMAGE_MAX_BYTES:
+                meta["error"] = "image too large"
+                return meta
+
+        content = await _download(client, image_url, meta)
+    except (httpx.HTTPError, BlockedURL) as exc:
+        meta["error"] = str(exc) or type(exc).__name__
+        return meta
+
+    if content is None:
+        return meta
+
+    # Thumbnails are content-addressed, so they can be cached forever
+    name = f"{hashlib.sha256(content).hexdigest()}.jpg"
+    if await asyncio.to_thread(make_thumbnail, content, thumbnail_path(name)):
+        meta["thumbnail"] = name
+    elif Image is not None:
+        meta["error"] = "unsupported image"
+    return meta
+
+
+async def schedule_image_check(damage_id: int, image_url: str) -> str:
+    """Queue a background check of a damage image"""
+    return await job_queue.enqueue(
+        "damage_image", {"damage_id": damage_id, "image_url": image_url}
+    )
+
+
+@job_handler("damage_image")
+async def check_damage_image(payload: Dict[str, Any]):
+    damage_id, image_url = payload["damage_id"], payload["image_url"]
+
+    # Skip checks superseded by a later edit (or a deleted damage), in either storage
+    # mode
+    found = await find_damage(damage_id)
+    if not found or found[1]["image_url"] != image_url:
+        return
+
+    async with httpx.AsyncClient(timeout=settings.IMAGE_FETCH_TIMEOUT) as client:
+        meta = await inspect_image(client, image_url)
+    await upsert_one("damage_images", {"_id": damage_id}, meta)
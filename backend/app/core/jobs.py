@@ -0,0 +1,172 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.db import insert_one, find_one_and_update, update_one
+from app.core.tenancy import current_tenant, tenant_scope
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(job_type: str):
+    """Register a coroutine as the handler of a job type"""
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def backoff(attempts: int) -> float:
+    """Seconds to wait before retrying a job that has failed `attempts` times"""
+    delay = settings.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return min(delay, settings.JOB_BACKOFF_MAX_SECONDS)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """
+    Durable job queue backed by the jobs collection.
+    Jobs survive restarts: a job left running by a dead worker is picked up
+    again once its lease expires.
+    """
+
+    def __init__(self):
+        self.workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        key: Optional[str] = None,
+        delay: float = 0.0,
+    ) -> str:
+        """
+        Persist a job. With an idempotency key, enqueuing the same job twice is a no-op.
+        The job runs on behalf of the tenant that enqueued it.
+        """
+        now = _now()
+        tenant = current_tenant()
+        if key and tenant:
+            key = f"{tenant}:{key}"  # jobs is shared, so keys are scoped per tenant
+        document = {
+            "_id": key or ObjectId(),
+            "tenant": tenant,
+            "type": job_type,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "run_at": now + timedelta(seconds=delay),
+            "created_at": now,
+            "last_error": None,
+        }
+        try:
+            await insert_one("jobs", document)
+        except DuplicateKeyError:
+            pass
+
+        if self._wakeup:
+            self._wakeup.set()
+        return str(document["_id"])
+
+    async def enqueue_periodic(
+        self, job_type: str, interval: float, next_period: bool = False
+    ) -> str:
+        """
+        Queue the run of a periodic job for the current interval-long period, or
+        at the start of the next one. The key is the period, so every worker
+        process can call this safely.
+        """
+        now = time.time()
+        period = int(now // interval) + int(next_period)
+        delay = max(0.0, period * interval - now)
+        return await self.enqueue(job_type, {}, key=f"{job_type}:{period}", delay=delay)
+
+    async def start(self, workers: Optional[int] = None):
+        self._wakeup = asyncio.Event()
+        self.workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(workers or settings.JOB_WORKERS)
+        ]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self._wakeup = None
+
+    async def run_next(self) -> bool:
+        """Claim and run one due job, False when there is nothing to do"""
+        now = _now()
+        job = await find_one_and_update(
+            "jobs",
+            {
+                "$or": [
+                    {"status": "pending", "run_at": {"$lte": now}},
+                    {"status": "running", "locked_until": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "locked_until": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+        )
+        if not job:
+            return False
+
+        try:
+            handler = _handlers.get(job["type"])
+            if handler is None:
+                raise LookupError(f"No handler for job type '{job['type']}'")
+            with tenant_scope(job.get("tenant")):
+                await handler(job["payload"])
+        except Exception as exc:
+            await self._fail(job, exc)
+        else:
+            await update_one(
+                "jobs", {"_id": job["_id"]}, {"status": "done", "finished_at": _now()}
+            )
+        return True
+
+    async def _fail(self, job: Dict[str, Any], exc: Exception):
+        update = {"last_error": repr(exc)}
+        if job["attempts"] >= settings.JOB_MAX_ATTEMPTS:
+            update.update(status="failed", finished_at=_now())
+        else:
+            update.update(
+                status="pending",
+                run_at=_now() + timedelta(seconds=backoff(job["attempts"])),
+            )
+        await update_one("jobs", {"_id": job["_id"]}, update)
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                if await self.run_next():
+                    continue
+            except Exception as exc:
+                print(f"⚠️ Job worker error: {exc}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+job_queue = JobQueue()
@@ -0,0 +1,884 @@
+import copy
+import functools
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.operations import (
+    DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+)
+
+# In-process stand-in for Motor, selected with MONGO_BACKEND=memory. It covers the
+# query and update operators the app uses, with MongoDB semantics where they
+# matter (missing == null, array fields match any element, naive UTC datetimes on
+# read). Indexes are recorded but not used or enforced, TTL included.
+
+_MISSING = object()
+
+
+# ---------------------------------------------------------------------------
+# Values
+
+def _encode(value: Any) -> Any:
+    """Copy a value the way a BSON round trip would store it"""
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+
+def _bracket(value: Any) -> Tuple[int, Any]:
+    """(type order, comparable value) following MongoDB's cross-type ordering"""
+    if value is None or value is _MISSING:
+        return 1, 0
+    if isinstance(value, bool):
+        return 8, value
+    if isinstance(value, Decimal128):
+        return 2, value.to_decimal()
+    if isinstance(value, (int, float, Decimal)):
+        return 2, Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+    if isinstance(value, str):
+        return 3, value
+    if isinstance(value, dict):
+        return 4, tuple((k, _bracket(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return 5, tuple(_bracket(v) for v in value)
+    if isinstance(value, ObjectId):
+        return 7, value.binary
+    if isinstance(value, datetime):
+        return 9, value
+    return 10, repr(value)
+
+
+def _compare(a: Any, b: Any) -> int:
+    ka, kb = _bracket(a), _bracket(b)
+    return (ka > kb) - (ka < kb)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    if isinstance(b, datetime) or isinstance(a, datetime):
+        a, b = _encode(a), _encode(b)
+    return _bracket(a) == _bracket(b)
+
+
+# ---------------------------------------------------------------------------
+# Paths
+
+def _values(doc: Any, path: str) -> List[Any]:
+    """Values at a dotted path; arrays on the way are traversed element by element"""
+    current = [doc]
+    for part in path.split("."):
+        found = []
+        for value in current:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        found.append(value[int(part)])
+                else:
+                    found.extend(
+                        item[part]
+                        for item in value
+                        if isinstance(item, dict) and part in item
+                    )
+        current = found
+    return current
+
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+
+def _set(doc: Dict[str, Any], path: str, value: Any):
+    parts = path.split(".")
+    target: Any = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[int(part)]
+        else:
+            target = target.setdefault(part, {})
+    if isinstance(target, list):
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+
+def _unset(doc: Dict[str, Any], path: str):
+    parts = path.split(".")
+    target: Any = _get(doc, ".".join(parts[:-1])) if len(parts) > 1 else doc
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+    elif (
+        isinstance(target, list)
+        and parts[-1].isdigit()
+        and int(parts[-1]) < len(target)
+    ):
+        target[int(parts[-1])] = None
+
+
+# ---------------------------------------------------------------------------
+# Queries
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "null": lambda v: v is None,
+    "bool": lambda v: isinstance(v, bool),
+    "int": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "long": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "double": lambda v: isinstance(v, float),
+    "decimal": lambda v: isinstance(v, Decimal128),
+    "number": lambda v: isinstance(v, (int, float, Decimal128))
+    and not isinstance(v, bool),
+    "string": lambda v: isinstance(v, str),
+    "date": lambda v: isinstance(v, datetime),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "objectId": lambda v: isinstance(v, ObjectId),
+}
+
+
+def _flatten(values: List[Any]) -> List[Any]:
+    """Candidates of a comparison: each value and, for arrays, their elements"""
+    flat = []
+    for value in values:
+        flat.append(value)
+        if isinstance(value, list):
+            flat.extend(value)
+    return flat
+
+
+def _eq_any(values: List[Any], target: Any) -> bool:
+    if target is None and not values:
+        return True  # missing matches null
+    return any(_equal(v, target) for v in _flatten(values))
+
+
+def _is_operator_dict(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and bool(value)
+        and all(k.startswith("$") for k in value)
+    )
+
+
+def _match_condition(values: List[Any], condition: Any) -> bool:
+    if not _is_operator_dict(condition):
+        if isinstance(condition, re.Pattern):
+            return any(
+                isinstance(v, str) and condition.search(v) for v in _flatten(values)
+            )
+        return _eq_any(values, condition)
+
+    for op, arg in condition.items():
+        if op == "$eq":
+            ok = _eq_any(values, arg)
+        elif op == "$ne":
+            ok = not _eq_any(values, arg)
+        elif op == "$in":
+            if isinstance(arg, _ScalarSet):
+                ok = any(
+                    (
+                        v in arg.keys
+                        if type(v) in _HASHED
+                        else any(_equal(v, a) for a in arg)
+                    )
+                    for v in _flatten(values)
+                )
+            else:
+                ok = any(_match_condition(values, a) for a in arg)
+        elif op == "$nin":
+            ok = not any(_match_condition(values, a) for a in arg)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            wanted = _bracket(arg)[0]
+            test = {"$gt": lambda c: c > 0, "$gte": lambda c: c >= 0,
+                    "$lt": lambda c: c < 0, "$lte": lambda c: c <= 0}[op]
+            ok = any(
+                _bracket(v)[0] == wanted and test(_compare(v, arg))
+                for v in _flatten(values)
+            )
+        elif op == "$exists":
+            ok = bool(values) == bool(arg)
+        elif op == "$type":
+            names = arg if isinstance(arg, list) else [arg]
+            ok = any(_TYPES[n](v) for n in names for v in _flatten(values))
+        elif op == "$size":
+            ok = any(isinstance(v, list) and len(v) == arg for v in values)
+        elif op == "$all":
+            ok = all(_eq_any(values, a) for a in arg)
+        elif op == "$elemMatch":
+            ok = any(
+                isinstance(v, list) and any(_match_element(item, arg) for item in v)
+                for v in values
+            )
+        elif op == "$regex":
+            pattern = re.compile(arg, _regex_flags(condition.get("$options", "")))
+            ok = any(isinstance(v, str) and pattern.search(v) for v in _flatten(values))
+        elif op == "$options":
+            ok = True
+        elif op == "$not":
+            ok = not _match_condition(values, arg)
+        else:
+            raise OperationFailure(f"unknown operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def _regex_flags(options: str) -> int:
+    flags = 0
+    for option, flag in (
+        ("i", re.IGNORECASE),
+        ("m", re.MULTILINE),
+        ("s", re.DOTALL),
+        ("x", re.VERBOSE),
+    ):
+        if option in options:
+            flags |= flag
+    return flags
+
+
+def _match_element(item: Any, condition: Dict[str, Any]) -> bool:
+    if _is_operator_dict(condition):
+        return _match_condition([item], condition)
+    return isinstance(item, dict) and matches(item, condition)
+
+
+# Types whose equality matches MongoDB's for the hashed $in lookup
+_HASHED = (int, float, str)
+
+
+class _ScalarSet(list):
+    """$in list of plain ints/strings, with a set for O(1) lookups"""
+
+    def __init__(self, items: List[Any]):
+        super().__init__(items)
+        self.keys = frozenset(items)
+
+
+def prepare(filter_query: Any) -> Any:
+    """
+    Compile a filter once per query: $in lists of scalars become hashed sets and
+    datetimes are compared the way they are stored (naive UTC, milliseconds)
+    """
+    if isinstance(filter_query, list):
+        return [prepare(item) for item in filter_query]
+    if isinstance(filter_query, datetime):
+        return _encode(filter_query)
+    if not isinstance(filter_query, dict):
+        return filter_query
+    prepared = {}
+    for key, value in filter_query.items():
+        if (
+            key == "$in"
+            and isinstance(value, list)
+            and all(type(v) in (int, str) for v in value)
+        ):
+            prepared[key] = _ScalarSet(value)
+        else:
+            prepared[key] = prepare(value)
+    return prepared
+
+
+def matches(doc: Dict[str, Any], filter_query: Optional[Dict[str, Any]]) -> bool:
+    """Whether a document matches a MongoDB query filter"""
+    for key, condition in (filter_query or {}).items():
+        if key == "$and":
+            ok = all(matches(doc, c) for c in condition)
+        elif key == "$or":
+            ok = any(matches(doc, c) for c in condition)
+        elif key == "$nor":
+            ok = not any(matches(doc, c) for c in condition)
+        elif key.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {key}")
+        else:
+            ok = _match_condition(_values(doc, key), condition)
+        if not ok:
+            return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Projections and sorting
+
+def _path_tree(paths: Iterable[str]) -> Dict[str, Any]:
+    tree: Dict[str, Any] = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def _include(value: Any, tree: Dict[str, Any]) -> Any:
+    if isinstance(value, list):
+        return [_include(v, tree) for v in value if isinstance(v, (dict, list))]
+    result = {}
+    for key, sub in tree.items():
+        if key in value:
+            result[key] = value[key] if sub is True else _include(value[key], sub)
+    return result
+
+
+def _exclude(value: Any, tree: Dict[str, Any]):
+    if isinstance(value, list):
+        for v in value:
+            if isinstance(v, (dict, list)):
+                _exclude(v, tree)
+        return
+    for key, sub in tree.items():
+        if key not in value:
+            continue
+        if sub is True:
+            del value[key]
+        elif isinstance(value[key], (dict, list)):
+            _exclude(value[key], sub)
+
+
+def project(
+    doc: Dict[str, Any], projection: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Apply an inclusion or exclusion projection (_id kept unless excluded)"""
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+
+    include_id = bool(projection.get("_id", 1))
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(v for v in fields.values()):
+        result = _include(doc, _path_tree(fields))
+        if include_id and "_id" in doc:
+            result = {"_id": doc["_id"], **result}
+        return result
+
+    _exclude(doc, _path_tree(k for k, v in fields.items() if not v))
+    if not include_id:
+        doc.pop("_id", None)
+    return doc
+
+
+def _sort_spec(
+    key_or_list: Any, direction: Optional[int] = None
+) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+
+def _sort_value(doc: Dict[str, Any], key: str, direction: int) -> Any:
+    values = _values(doc, key)
+    if not values:
+        return None
+    value = values[0]
+    if isinstance(value, list) and value:
+        # Arrays sort by their smallest (ascending) or largest (descending) element
+        ordered = sorted(value, key=functools.cmp_to_key(_compare))
+        return ordered[0] if direction > 0 else ordered[-1]
+    return value
+
+
+def sort_documents(
+    docs: List[Dict[str, Any]], spec: List[Tuple[str, int]]
+) -> List[Dict[str, Any]]:
+    def compare(a, b):
+        for key, direction in spec:
+            result = _compare(
+                _sort_value(a, key, direction), _sort_value(b, key, direction)
+            )
+            if result:
+                return result * (1 if direction > 0 else -1)
+        return 0
+    return sorted(docs, key=functools.cmp_to_key(compare))
+
+
+# ---------------------------------------------------------------------------
+# Updates
+
+
+def _positional_index(
+    doc: Dict[str, Any], array_path: str, filter_query: Dict[str, Any]
+) -> int:
+    """Index of the array element matched by the query, for "field.$" updates"""
+    array = _get(doc, array_path)
+    if not isinstance(array, list):
+        raise OperationFailure(
+            "The positional operator did not find the match needed from the query."
+        )
+
+    prefix = array_path + "."
+    conditions = {
+        k[len(prefix) :]: v for k, v in filter_query.items() if k.startswith(prefix)
+    }
+    elem_match = filter_query.get(array_path, {})
+    for i, item in enumerate(array):
+        if all(
+            _match_condition(_values(item, path), c) for path, c in conditions.items()
+        ) and (
+            not _is_operator_dict(elem_match)
+            or "$elemMatch" not in elem_match
+            or _match_element(item, elem_match["$elemMatch"])
+        ):
+            return i
+    raise OperationFailure(
+        "The positional operator did not find the match needed from the query."
+    )
+
+
+def _resolve(doc: Dict[str, Any], path: str, filter_query: Dict[str, Any]) -> str:
+    if ".$." not in path and not path.endswith(".$"):
+        return path
+    array_path, _, rest = path.partition(".$")
+    index = _positional_index(doc, array_path, filter_query)
+    return f"{array_path}.{index}{rest}"
+
+
+def apply_update(
+    doc: Dict[str, Any],
+    update: Dict[str, Any],
+    filter_query: Dict[str, Any],
+    inserting: bool = False,
+):
+    """Apply update operators to doc in place"""
+    for op, fields in update.items():
+        if op == "$setOnInsert":
+            if not inserting:
+                continue
+            op = "$set"
+        for path, value in fields.items():
+            path = _resolve(doc, path, filter_query)
+            value = _encode(value)
+            current = _get(doc, path)
+            if op == "$set":
+                _set(doc, path, value)
+            elif op == "$unset":
+                _unset(doc, path)
+            elif op == "$inc":
+                _set(doc, path, (0 if current is _MISSING else current) + value)
+            elif op in ("$min", "$max"):
+                if current is _MISSING or (_compare(value, current) < 0) == (
+                    op == "$min"
+                ):
+                    _set(doc, path, value)
+            elif op == "$push":
+                items = (
+                    value["$each"]
+                    if isinstance(value, dict) and "$each" in value
+                    else [value]
+                )
+                _set(doc, path, ([] if current is _MISSING else current) + items)
+            elif op == "$addToSet":
+                items = (
+                    value["$each"]
+                    if isinstance(value, dict) and "$each" in value
+                    else [value]
+                )
+                array = [] if current is _MISSING else current
+                _set(
+                    doc,
+                    path,
+                    array + [i for i in items if not any(_equal(i, a) for a in array)],
+                )
+            elif op == "$pull":
+                if isinstance(current, list):
+                    _set(
+                        doc,
+                        path,
+                        [
+                            item
+                            for item in current
+                            if not (
+                                _match_element(item, value)
+                                if isinstance(value, dict)
+                                else _equal(item, value)
+                            )
+                        ],
+                    )
+            else:
+                raise OperationFailure(f"Unknown modifier: {op}")
+
+
+def _upsert_seed(filter_query: Dict[str, Any]) -> Dict[str, Any]:
+    """Document an upsert starts from: the equality conditions of the filter"""
+    seed: Dict[str, Any] = {}
+    for key, condition in filter_query.items():
+        if key.startswith("$"):
+            continue
+        if _is_operator_dict(condition):
+            if "$eq" in condition:
+                _set(seed, key, _encode(condition["$eq"]))
+        else:
+            _set(seed, key, _encode(condition))
+    return seed
+
+
+# ---------------------------------------------------------------------------
+# Motor-compatible API
+
+class MemoryCursor:
+    """find() cursor: sort, skip, limit, to_list and async iteration"""
+
+    def __init__(self, load: Callable[[], List[Dict[str, Any]]]):
+        self._load = load
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "MemoryCursor":
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def _documents(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            docs = self._load()
+            if self._sort:
+                docs = sort_documents(docs, self._sort)
+            docs = docs[self._skip:]
+            self._results = docs[:self._limit] if self._limit else docs
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = self._documents()
+        taken, self._results = (
+            (docs, []) if length is None else (docs[:length], docs[length:])
+        )
+        return taken
+
+    async def close(self):
+        self._results = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        docs = self._documents()
+        if not docs:
+            raise StopAsyncIteration
+        return docs.pop(0)
+
+
+_IMMUTABLE_ID = (
+    "Performing an update on the path '_id' would modify the immutable field '_id'"
+)
+
+
+class MemoryCollection:
+    def __init__(self, name: str, database: "MemoryDatabase"):
+        self.name = name
+        self.database = database
+        self.documents: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self.indexes: Dict[str, Dict[str, Any]] = {"_id_": {"key": [("_id", 1)]}}
+
+    def with_options(self, **kwargs) -> "MemoryCollection":
+        """Read preferences do not apply: there is a single copy of the data"""
+        return self
+
+    def _matching(self, filter_query: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if (
+            filter_query
+            and set(filter_query) == {"_id"}
+            and not isinstance(filter_query["_id"], dict)
+        ):
+            doc = self.documents.get(filter_query["_id"])
+            return [doc] if doc is not None else []
+        filter_query = prepare(filter_query)
+        return [d for d in self.documents.values() if matches(d, filter_query)]
+
+    def _store(self, document: Dict[str, Any]):
+        if document["_id"] in self.documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_ "
+                f"dup key: {{ _id: {document['_id']!r} }}",
+                11000,
+            )
+        self.documents[document["_id"]] = _encode(document)
+
+    # Writes
+
+    async def insert_one(self, document: Dict[str, Any]):
+        document.setdefault("_id", ObjectId())
+        self._store(document)
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True):
+        ids, errors = [], []
+        for index, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            try:
+                self._store(document)
+                ids.append(document["_id"])
+            except DuplicateKeyError as exc:
+                errors.append({"index": index, "code": exc.code, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(ids)})
+        return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def _update(
+        self, filter_query, update, upsert: bool, many: bool, replace: bool = False
+    ):
+        targets = self._matching(filter_query)
+        if not many:
+            targets = targets[:1]
+        modified = 0
+        for doc in targets:
+            # Updated on a copy, stored only once valid: a failed update leaves no trace
+            if replace:
+                updated = _encode(update)
+                updated["_id"] = doc["_id"]
+            else:
+                updated = copy.deepcopy(doc)
+                apply_update(updated, update, filter_query)
+            if updated.get("_id") != doc.get("_id"):
+                raise OperationFailure(_IMMUTABLE_ID)
+            if updated != doc:
+                self.documents[doc["_id"]] = updated
+                modified += 1
+
+        upserted_id = None
+        if not targets and upsert:
+            doc = _upsert_seed(filter_query)
+            if replace:
+                doc = {**doc, **_encode(update)}
+            else:
+                apply_update(doc, update, filter_query, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._store(doc)
+            upserted_id = doc["_id"]
+        return SimpleNamespace(
+            matched_count=len(targets),
+            modified_count=modified,
+            upserted_id=upserted_id,
+            acknowledged=True,
+        )
+
+    async def update_one(self, filter_query, update, upsert: bool = False):
+        return self._update(filter_query, update, upsert, many=False)
+
+    async def update_many(self, filter_query, update, upsert: bool = False):
+        return self._update(filter_query, update, upsert, many=True)
+
+    async def replace_one(self, filter_query, replacement, upsert: bool = False):
+        return self._update(filter_query, replacement, upsert, many=False, replace=True)
+
+    async def delete_one(self, filter_query):
+        targets = self._matching(filter_query)[:1]
+        for doc in targets:
+            del self.documents[doc["_id"]]
+        return SimpleNamespace(deleted_count=len(targets), acknowledged=True)
+
+    async def delete_many(self, filter_query):
+        targets = self._matching(filter_query)
+        for doc in targets:
+            del self.documents[doc["_id"]]
+        return SimpleNamespace(deleted_count=len(targets), acknowledged=True)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True):
+        counts = dict(
+            inserted_count=0,
+            matched_count=0,
+            modified_count=0,
+            deleted_count=0,
+            upserted_count=0,
+        )
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    await self.insert_one(request._doc)
+                    counts["inserted_count"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                    result = self._update(
+                        request._filter,
+                        request._doc,
+                        bool(request._upsert),
+                        many=isinstance(request, UpdateMany),
+                        replace=isinstance(request, ReplaceOne),
+                    )
+                    counts["matched_count"] += result.matched_count
+                    counts["modified_count"] += result.modified_count
+                    counts["upserted_count"] += result.upserted_id is not None
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    deleted = self._matching(request._filter)
+                    for doc in (
+                        deleted if isinstance(request, DeleteMany) else deleted[:1]
+                    ):
+                        del self.documents[doc["_id"]]
+                        counts["deleted_count"] += 1
+                else:
+                    raise TypeError(f"unsupported bulk operation {request!r}")
+            except DuplicateKeyError as exc:
+                errors.append({"index": index, "code": exc.code, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError(
+                {
+                    "writeErrors": errors,
+                    "nInserted": counts["inserted_count"],
+                    "nMatched": counts["matched_count"],
+                    "nModified": counts["modified_count"],
+                    "nRemoved": counts["deleted_count"],
+                    "nUpserted": counts["upserted_count"],
+                }
+            )
+        return SimpleNamespace(acknowledged=True, **counts)
+
+    async def find_one_and_update(
+        self, filter_query, update, projection=None, sort=None, upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+    ):
+        targets = self._matching(filter_query)
+        if sort:
+            targets = sort_documents(targets, _sort_spec(sort))
+        if targets:
+            doc = targets[0]
+            updated = copy.deepcopy(doc)
+            apply_update(updated, update, filter_query)
+            if updated.get("_id") != doc.get("_id"):
+                raise OperationFailure(_IMMUTABLE_ID)
+            self.documents[doc["_id"]] = updated
+            return project(
+                updated if return_document == ReturnDocument.AFTER else doc, projection
+            )
+        if not upsert:
+            return None
+        result = self._update(filter_query, update, upsert=True, many=False)
+        if return_document == ReturnDocument.AFTER:
+            return project(self.documents[result.upserted_id], projection)
+        return None
+
+    # Reads
+
+    async def find_one(self, filter_query=None, projection=None):
+        targets = self._matching(filter_query)
+        return project(targets[0], projection) if targets else None
+
+    def find(self, filter_query=None, projection=None) -> MemoryCursor:
+        return MemoryCursor(
+            lambda: [project(d, projection) for d in self._matching(filter_query)]
+        )
+
+    async def count_documents(self, filter_query) -> int:
+        return len(self._matching(filter_query))
+
+    async def distinct(self, key: str, filter_query=None) -> List[Any]:
+        values: List[Any] = []
+        for doc in self._matching(filter_query):
+            for value in _flatten(_values(doc, key)):
+                if not isinstance(value, list) and not any(
+                    _equal(value, v) for v in values
+                ):
+                    values.append(value)
+        return values
+
+    # Indexes
+
+    async def create_index(self, keys: Any, **kwargs) -> str:
+        spec = _sort_spec(keys, 1)
+        name = kwargs.get("name") or "_".join(f"{k}_{d}" for k, d in spec)
+        index = {"key": spec, **kwargs}
+        if name in self.indexes and self.indexes[name] != index:
+            raise OperationFailure(
+                f"Index already exists with different options: {name}", 85
+            )
+        self.indexes[name] = index
+        return name
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self.indexes)
+
+    async def drop(self):
+        self.database.collections.pop(self.name, None)
+
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self.collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name, self)
+        return self.collections[name]
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self.collections)
+
+    async def drop_collection(self, name: str):
+        self.collections.pop(name, None)
+
+    async def command(self, command: str, value: Any = 1, **kwargs) -> Dict[str, Any]:
+        """Only collMod of an index's expireAfterSeconds (found by keyPattern)"""
+        if command != "collMod" or "index" not in kwargs:
+            raise OperationFailure(f"unsupported command: {command}")
+        change = kwargs["index"]
+        key = _sort_spec(change["keyPattern"], 1)
+        for index in self[value].indexes.values():
+            if index["key"] == key:
+                index["expireAfterSeconds"] = change["expireAfterSeconds"]
+                return {"ok": 1.0}
+        raise OperationFailure("cannot find index", 27)
+
+
+class MemoryClient:
+    """AsyncIOMotorClient stand-in: one process-local copy of the data"""
+
+    def __init__(self, uri: str = "", **kwargs):
+        path = uri.split("://", 1)[-1].partition("/")[2].partition("?")[0]
+        self.default_database = path or "test"
+        self.databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self.databases:
+            self.databases[name] = MemoryDatabase(name)
+        return self.databases[name]
+
+    def get_default_database(self) -> MemoryDatabase:
+        return self[self.default_database]
+
+    def close(self):
+        pass
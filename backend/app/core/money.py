@@ -0,0 +1,105 @@
+import math
+from decimal import Decimal, InvalidOperation
+from functools import total_ordering
+from typing import Any
+
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+
+_CENT = Decimal("0.01")
+
+
+@total_ordering
+class Money:
+    """
+    An amount as integer cents. Sums and comparisons are integer operations;
+    str() gives the two-decimal amount the API serialises ("100.50").
+    """
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents: int = 0):
+        self.cents = int(cents)
+
+    @classmethod
+    def parse(cls, amount: Any) -> "Money":
+        """
+        From an amount in currency units (Money, Decimal, Decimal128, int, float
+        or str), rounded to cents. ValueError if it is not a finite amount.
+        """
+        if isinstance(amount, Money):
+            return amount
+        if isinstance(amount, Decimal128):
+            amount = amount.to_decimal()
+        if isinstance(amount, bool):
+            raise ValueError(f"invalid amount: {amount!r}")
+        try:
+            return cls(Decimal(str(amount)).quantize(_CENT).scaleb(2))
+        except (InvalidOperation, ValueError) as exc:
+            raise ValueError(f"invalid amount: {amount!r}") from exc
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(self.cents).scaleb(-2)
+
+    def __str__(self) -> str:
+        return str(self.to_decimal())
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
+
+    def __float__(self) -> float:
+        return self.cents / 100
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    def _other_cents(self, other: Any):
+        if isinstance(other, Money):
+            return other.cents
+        if isinstance(other, (int, Decimal)) and not isinstance(other, bool):
+            return Decimal(other).scaleb(2)
+        if isinstance(other, float) and math.isfinite(other):
+            # As written, not as stored in binary: Money("0.10") == 0.1. Equal
+            # floats may hash differently, so don't mix them as dict keys
+            return Decimal(repr(other)).scaleb(2)
+        return None
+
+    def __eq__(self, other: Any) -> bool:
+        cents = self._other_cents(other)
+        return NotImplemented if cents is None else self.cents == cents
+
+    def __lt__(self, other: Any) -> bool:
+        cents = self._other_cents(other)
+        return NotImplemented if cents is None else self.cents < cents
+
+    def __hash__(self) -> int:
+        return hash(self.to_decimal())  # equal Decimals hash alike
+
+    def __add__(self, other: Any) -> "Money":
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        if other == 0 and isinstance(other, int):  # sum() starts at 0
+            return self
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other: Any) -> "Money":
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+
+def to_document(money: Money) -> Int64:
+    """Stored form of an amount: Int64 cents"""
+    return Int64(money.cents)
+
+
+def from_document(value: Any) -> Money:
+    """
+    Amount of a stored price: integers are cents; Decimal128 (and other
+    non-integer values) are amounts written before the money migration
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return Money(value)
+    return Money.parse(value)
@@ -0,0 +1,73 @@
+import asyncio
+import copy
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Tuple
+
+from app.core.config import settings
+from app.core.tenancy import current_tenant
+
+
+def normalise(filter_query: Any) -> str:
+    """Canonical form of a query filter, independent of key order"""
+    return json.dumps(filter_query or {}, sort_keys=True, default=repr)
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent reads into one in-flight awaitable.
+    Every entry is tagged with the collections it reads; a write to one of
+    them detaches the entry so later readers start a fresh query.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[asyncio.Future, Tuple[str, ...]]] = {}
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]], tags: Iterable[str] = ()
+    ) -> Any:
+        if not settings.SINGLE_FLIGHT_READS:
+            return await fn()
+
+        # Same query, different tenant: different data
+        call_key = (current_tenant(), key)
+        entry = self._calls.get(call_key)
+        if entry:
+            try:
+                result = await asyncio.shield(entry[0])
+            except asyncio.CancelledError:
+                if entry[0].cancelled():
+                    # The leading request went away: run the query ourselves
+                    return await self.do(key, fn, tags)
+                raise
+            # Followers get their own copy so nobody mutates a shared document
+            return copy.deepcopy(result)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, tuple(tags))
+        self._calls[call_key] = entry
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody is waiting
+            raise
+        finally:
+            if self._calls.get(call_key) is entry:
+                del self._calls[call_key]
+
+        future.set_result(result)
+        return result
+
+    def forget(self, tag: str):
+        """Detach in-flight reads of a collection (called after writes)"""
+        for key in [k for k, (_, tags) in self._calls.items() if tag in tags]:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+reads = SingleFlight()
@@ -0,0 +1,91 @@
+import contextlib
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, List, Optional, Sequence, Set
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Collections shared by every tenant (their documents record the tenant themselves)
+SHARED_COLLECTIONS = {"jobs"}
+
+_tenant: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+
+
+def current_tenant() -> Optional[str]:
+    """Tenant of the current request or job, None in single-tenant mode"""
+    return _tenant.get()
+
+
+@contextlib.contextmanager
+def tenant_scope(tenant: Optional[str]) -> Iterator[None]:
+    """Run a block (e.g. a background job) on behalf of a tenant"""
+    token = _tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def all_tenants() -> List[Optional[str]]:
+    """Tenants to schedule background work for ([None] in single-tenant mode)"""
+    return list(settings.TENANTS) if settings.MULTI_TENANT else [None]
+
+
+def collection_name(name: str) -> str:
+    """Physical collection of a logical one: "<tenant>.<name>" inside a tenant scope"""
+    tenant = _tenant.get()
+    if tenant is None or name in SHARED_COLLECTIONS:
+        return name
+    return f"{tenant}.{name}"
+
+
+class TenantMiddleware:
+    """
+    Resolves the tenant of every API request from TENANT_HEADER and rejects
+    unknown ones. prepare (e.g. ensure_indexes) runs in the tenant's scope the
+    first time this process sees it. Paths starting with one of exempt serve
+    data shared by every tenant and need no header.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        prefix: str = "",
+        prepare: Optional[Callable[[], Awaitable[None]]] = None,
+        exempt: Sequence[str] = (),
+    ):
+        self.app = app
+        self.prefix = prefix
+        self.prepare = prepare
+        self.exempt = tuple(exempt)
+        self._ready: Set[str] = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.prefix)
+            or scope["path"].startswith(self.exempt)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        tenant = Headers(scope=scope).get(settings.TENANT_HEADER)
+        if not tenant:
+            response = JSONResponse(
+                {"detail": f"Missing {settings.TENANT_HEADER} header"}, status_code=400
+            )
+            await response(scope, receive, send)
+            return
+        if tenant not in settings.TENANTS:
+            response = JSONResponse({"detail": "Unknown tenant"}, status_code=403)
+            await response(scope, receive, send)
+            return
+
+        with tenant_scope(tenant):
+            if self.prepare and tenant not in self._ready:
+                await self.prepare()
+                self._ready.add(tenant)
+            await self.app(scope, receive, send)
@@ -0,0 +1,131 @@
+from typing import List, Optional, Tuple
+
+from app.core import embedded
+from app.core.compact import SEVERITIES, DamageTable
+from app.core.config import settings
+from app.core.db import find_batches, find_many
+from app.core.documents import is_live, live_damages
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: triage is unavailable without it
+    np = None
+
+# Damage fields triage reads
+_FIELDS = ("severity", "score", "price")
+
+
+def available() -> bool:
+    """Whether NumPy is installed"""
+    return np is not None
+
+
+def columns(
+    table: DamageTable,
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    NumPy arrays over a damage table (claim id, severity, score, price in
+    currency units); ids and severities are views, not copies
+    """
+    return (
+        np.frombuffer(table.claim_ids, dtype=np.int64),
+        np.frombuffer(table.severities, dtype=np.int8),
+        np.asarray(table.scores, dtype=np.float64),
+        np.frombuffer(table.price_cents, dtype=np.int64) / 100,
+    )
+
+
+def rank(
+    claim_ids: "np.ndarray",
+    severities: "np.ndarray",
+    scores: "np.ndarray",
+    prices: "np.ndarray",
+    k: int,
+) -> List[Tuple[int, float, int]]:
+    """
+    Top k claims by summed damage priority, as (claim id, priority, damage count)
+    with the highest first (ties by lower id). Vectorised over all damages.
+    """
+    if not len(claim_ids) or k <= 0:
+        return []
+    weights = np.asarray(
+        [settings.TRIAGE_SEVERITY_WEIGHTS.get(s, 0.0) for s in SEVERITIES]
+    )
+    priority = (
+        weights[severities]
+        + settings.TRIAGE_SCORE_WEIGHT * scores
+        + settings.TRIAGE_PRICE_WEIGHT * np.log1p(prices)
+    )
+
+    if claim_ids.min() >= 0 and claim_ids.max() <= 4 * len(claim_ids) + 1_000_000:
+        # IDs come from a counter, so they are dense: group with bincount on the ids
+        # themselves, linear time, instead of sorting them
+        totals = np.bincount(claim_ids, weights=priority)
+        counts = np.bincount(claim_ids)
+        claims = np.flatnonzero(counts)
+        totals, counts = totals[claims], counts[claims]
+    else:
+        claims, per_damage = np.unique(claim_ids, return_inverse=True)
+        totals = np.bincount(per_damage, weights=priority)
+        counts = np.bincount(per_damage)
+
+    # Partial selection first: only the k best are fully sorted
+    k = min(k, len(claims))
+    best = (
+        np.argpartition(-totals, k - 1)[:k]
+        if k < len(claims)
+        else np.arange(len(claims))
+    )
+    best = best[np.lexsort((claims[best], -totals[best]))]
+    return [(int(claims[i]), float(totals[i]), int(counts[i])) for i in best]
+
+
+async def load_pending_damages(batch_size: Optional[int] = None) -> DamageTable:
+    """Live damages of PENDING claims as a damage table, read in cursor batches"""
+    size = batch_size or settings.EXPORT_BATCH_SIZE
+    table = DamageTable()
+    pending = {"status": "PENDING"}
+
+    if embedded.is_enabled():
+        fields = {f"damages.{f}": 1 for f in (*_FIELDS, "id", "deleted_at")}
+        claims = find_batches(
+            "claims",
+            pending,
+            {**fields, "damages_spilled": 1},
+            size,
+            read_method="claims.triage",
+        )
+        async for batch in claims:
+            for doc in batch:
+                for item in doc.get("damages", []):
+                    if is_live(item):
+                        table.add_document(item, claim_id=doc["_id"])
+            await _add_collection_damages(
+                table, [doc["_id"] for doc in batch if doc.get("damages_spilled")]
+            )
+        return table
+
+    async for batch in find_batches(
+        "claims", pending, {"_id": 1}, size, read_method="claims.triage"
+    ):
+        await _add_collection_damages(table, [doc["_id"] for doc in batch])
+    return table
+
+
+async def _add_collection_damages(table: DamageTable, claim_ids: List[int]):
+    """Live damages of the damages collection belonging to claim_ids"""
+    if not claim_ids:
+        return
+    docs = await find_many(
+        "damages",
+        live_damages({"claim_id": {"$in": claim_ids}}),
+        projection={"claim_id": 1, **{f: 1 for f in _FIELDS}},
+        read_method="claims.triage",
+    )
+    for doc in docs:
+        table.add_document(doc)
+
+
+async def triage(k: int) -> List[Tuple[int, float, int]]:
+    """Top k PENDING claims by priority"""
+    return rank(*columns(await load_pending_damages()), k)
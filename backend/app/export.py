@@ -0,0 +1,61 @@
+"""
+Exportación columnar (Parquet o Arrow IPC) de reclamaciones y daños para análisis.
+
+    cd backend
+    python -m app.export claims claims.parquet
+    python -m app.export damages damages.arrow --format arrow
+    python -m app.export damages damages/ --partition
+
+Las reclamaciones se leen de un cursor por lotes de EXPORT_BATCH_SIZE y cada lote se
+escribe como un record batch, así que la memoria no depende del tamaño de la base de
+datos. Con --partition escribe un árbol status=<estado>/month=<AAAA-MM>/ (mes del último
+cambio de estado de la reclamación) que las herramientas de análisis leen como dataset.
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from app.core import export
+from app.core.db import close_mongo_connection, connect_to_mongo
+from app.core.tenancy import tenant_scope
+
+
+async def _run(coro, tenant: Optional[str]):
+    await connect_to_mongo()
+    try:
+        with tenant_scope(tenant):
+            return await coro
+    finally:
+        await close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("table", choices=export.TABLES)
+    parser.add_argument("path", help="fichero (o directorio con --partition)")
+    parser.add_argument("--format", choices=list(export.FORMATS), default="parquet")
+    parser.add_argument(
+        "--partition", action="store_true", help="particionar por estado y mes"
+    )
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--tenant", help="aseguradora (con MULTI_TENANT)")
+    args = parser.parse_args()
+
+    if not export.available():
+        parser.error("exports require pyarrow (pip install -e \".[parquet]\")")
+    started_at = time.perf_counter()
+    rows = asyncio.run(
+        _run(
+            export.write_export(
+                args.table, args.format, args.path, args.partition, args.batch_size
+            ),
+            args.tenant,
+        )
+    )
+    elapsed = time.perf_counter() - started_at
+    print(f"Exportadas {rows:,} filas a {args.path} en {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,37 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from app.api.routes import claims, damages
+from app.api.routes import claims, damages, exports
 from app.core.config import settings
-from app.core.db import connect_to_mongo, close_mongo_connection
+from app.core.db import connect_to_mongo, close_mongo_connection, ensure_indexes
+from app.core.admission import AdmissionMiddleware, admission
+from app.core.archive import start_archival
+from app.core.audit import audit_writer
+from app.core.compression import CompressionMiddleware
+from app.core.deadline import (
+    DeadlineExceeded, DeadlineMiddleware, stats as deadline_stats
+)
+from app.core.embedded import start_damage_purge
+from app.core.jobs import job_queue
+from app.core.tenancy import TenantMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    await ensure_indexes()
+    await job_queue.start()
+    await start_damage_purge()
+    if settings.ARCHIVE_ENABLED:
+        await start_archival()
+    await audit_writer.start()
     yield
     # Shutdown
+    await audit_writer.stop()
+    await job_queue.stop()
     await close_mongo_connection()
 
 
@@ -24,6 +43,26 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Request deadlines and cancellation on client disconnect (innermost, so the
+# deadline starts once the request is admitted)
+app.add_middleware(DeadlineMiddleware, prefix=settings.API_V1_STR)
+
+# Tenant of each request (X-Tenant-ID); its collections get their indexes on first use.
+# Thumbnails are content-addressed files shared by every tenant (<img> tags send no
+# header)
+if settings.MULTI_TENANT:
+    app.add_middleware(
+        TenantMiddleware, prefix=settings.API_V1_STR, prepare=ensure_indexes,
+        exempt=[f"{settings.API_V1_STR}/damages/thumbnails/"],
+    )
+
+# Admission control (rate limits and load shedding); added before CORS so
+# 429/503 responses still carry the CORS headers
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware, controller=admission, prefix=settings.API_V1_STR
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -33,9 +72,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression (large lists and streamed exports)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        content_types=settings.COMPRESSION_CONTENT_TYPES,
+    )
+
 # Include routers
 app.include_router(claims.router, prefix=f"{settings.API_V1_STR}/claims", tags=["claims"])
+app.include_router(claims.collection_router, prefix=settings.API_V1_STR)
 app.include_router(damages.router, prefix=f"{settings.API_V1_STR}/damages", tags=["damages"])
+app.include_router(
+    exports.router, prefix=f"{settings.API_V1_STR}/exports", tags=["exports"]
+)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(
+        status_code=504, content={"detail": "Request deadline exceeded"}
+    )
 
 
 @app.get("/")
@@ -45,4 +103,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return {"admission": admission.stats(), "deadlines": dict(deadline_stats)}
@@ -1,4 +1,15 @@
-from app.core.db import execute_query
+import asyncio
+import sys
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, List, Optional
+
+from app.core import embedded, fingerprints, money
+from app.core.archive import archive_claims
+from app.core.db import (
+    execute_query, find_batches, find_many, insert_missing, update_one, update_many,
+    unset_one, delete_many, bulk_update, connect_to_mongo, close_mongo_connection
+)
+from app.core.tenancy import all_tenants, tenant_scope
 
 
 def create_tables():
@@ -32,5 +43,217 @@ def create_tables():
     print("Tablas creadas exitosamente")
 
 
+async def migrate_damages_layout(target: str):
+    """
+    Convierte los daños entre colección propia ("separate") y
+    array embebido en la reclamación ("embedded").
+    """
+    if target not in ("separate", "embedded"):
+        raise ValueError("target must be 'separate' or 'embedded'")
+
+    moved = 0
+    for claim_doc in await find_many("claims", {}):
+        items = claim_doc.get("damages", [])
+
+        if target == "embedded":
+            # Los que ya estén embebidos se conservan (re-ejecución tras un fallo)
+            claim_doc = {**claim_doc, "damages": list(items)}
+            known = {d["id"] for d in items}
+            spilled = False
+            moved_ids = []
+            for d in await find_many("damages", {"claim_id": claim_doc["_id"]}):
+                item = {
+                    "id": d["_id"],
+                    **{k: v for k, v in d.items() if k not in ("_id", "claim_id")},
+                }
+                if item["id"] in known:
+                    moved_ids.append(item["id"])
+                elif embedded.fits(claim_doc, item):
+                    claim_doc["damages"].append(item)
+                    moved_ids.append(item["id"])
+                else:
+                    spilled = True
+            await update_one(
+                "claims", {"_id": claim_doc["_id"]},
+                {"damages": claim_doc["damages"], "damages_spilled": spilled}
+            )
+            if moved_ids:
+                await delete_many("damages", {"_id": {"$in": moved_ids}})
+            moved += len(moved_ids)
+        else:
+            docs = [
+                {
+                    "_id": d["id"], "claim_id": claim_doc["_id"], "deleted_at": None,
+                    **{k: v for k, v in d.items() if k != "id"}
+                }
+                for d in items
+            ]
+            if docs:
+                # Los ya copiados se saltan (re-ejecución tras un fallo antes del unset)
+                await insert_missing("damages", docs)
+            await unset_one(
+                "claims", {"_id": claim_doc["_id"]}, ["damages", "damages_spilled"]
+            )
+            moved += len(docs)
+
+    print(f"Daños migrados a '{target}': {moved}")
+    return moved
+
+
+async def migrate_soft_delete():
+    """Marca como vivos (deleted_at: null) los daños anteriores al borrado lógico"""
+    updated = await update_many(
+        "damages", {"deleted_at": {"$exists": False}}, {"deleted_at": None}
+    )
+    print(f"Daños marcados como vivos: {updated}")
+    return updated
+
+
+def _cents(item: dict) -> dict:
+    if "price" not in item:
+        return item
+    return {**item, "price": money.to_document(money.from_document(item["price"]))}
+
+
+async def migrate_money(batch_size: int = 1000):
+    """
+    Guarda los precios como céntimos enteros (Int64) en lugar de Decimal128, en las
+    colecciones de daños y en los daños embebidos (también en el archivo). Solo toca
+    los documentos que aún tienen algún Decimal128, así que se puede repetir.
+    """
+    converted = 0
+    for collection in ("damages", "damages_archive"):
+        legacy = {"price": {"$type": "decimal"}}
+        async for batch in find_batches(collection, legacy, {"price": 1}, batch_size):
+            converted += await bulk_update(
+                collection, [({"_id": d["_id"]}, _cents(d)) for d in batch]
+            )
+    for collection in ("claims", "claims_archive"):
+        legacy = {"damages.price": {"$type": "decimal"}}
+        async for batch in find_batches(collection, legacy, {"damages": 1}, batch_size):
+            converted += await bulk_update(
+                collection,
+                [
+                    (
+                        {"_id": doc["_id"]},
+                        {"damages": [_cents(d) for d in doc["damages"]]},
+                    )
+                    for doc in batch
+                ],
+            )
+    print(f"Documentos con precios en céntimos: {converted}")
+    return converted
+
+
+async def migrate_fingerprints():
+    """Calcula la huella de daños de cada reclamación (detección de duplicados)"""
+    updated = await fingerprints.backfill()
+    print(f"Reclamaciones con huella: {updated}")
+    return updated
+
+
+async def migrate_status_changed_at(batch_size: int = 1000):
+    """
+    Fecha de último cambio de estado (status_changed_at) para las reclamaciones
+    anteriores a ella, que el archivado no vería nunca: la del último evento de
+    claim_events, o la de la migración si no tiene eventos (se archivarán
+    ARCHIVE_AFTER_DAYS después). Solo toca las que aún no la tienen.
+    """
+    now = datetime.now(timezone.utc)
+    legacy = {"status_changed_at": {"$exists": False}}
+    updated = 0
+    async for batch in find_batches("claims", legacy, {"_id": 1}, batch_size):
+        ids = [doc["_id"] for doc in batch]
+        changed_at = dict.fromkeys(ids, now)
+        last_event = {}
+        for event in await find_many(
+            "claim_events",
+            {"claim_id": {"$in": ids}},
+            projection={"claim_id": 1, "at": 1},
+        ):
+            if (
+                event["claim_id"] not in last_event
+                or event["at"] > last_event[event["claim_id"]]
+            ):
+                last_event[event["claim_id"]] = event["at"]
+        changed_at.update(last_event)
+        # Condicional: un cambio de estado durante la migración no se pisa
+        updated += await bulk_update(
+            "claims",
+            [
+                ({"_id": claim_id, **legacy}, {"status_changed_at": at})
+                for claim_id, at in changed_at.items()
+            ],
+        )
+    print(f"Reclamaciones con fecha de cambio de estado: {updated}")
+    return updated
+
+
+async def for_tenants(
+    migration: Callable[[], Awaitable[Any]], tenant: Optional[str] = None
+) -> List[Any]:
+    """
+    Ejecuta la migración en la aseguradora indicada o, sin ella, en cada una de
+    all_tenants() (sus colecciones "<tenant>.claims", ...). Devuelve el
+    resultado de cada aseguradora.
+    """
+    if tenant is not None and tenant not in all_tenants():
+        raise ValueError(f"Aseguradora desconocida: {tenant}")
+
+    results = []
+    for name in [tenant] if tenant is not None else all_tenants():
+        with tenant_scope(name):
+            if name is not None:
+                print(f"Aseguradora: {name}")
+            results.append(await migration())
+    return results
+
+
+async def _run(coro):
+    await connect_to_mongo()
+    try:
+        return await coro
+    finally:
+        await close_mongo_connection()
+
+
+def _tenant_option(args: List[str]) -> Optional[str]:
+    """Quita "--tenant <aseguradora>" de args y devuelve la aseguradora"""
+    if "--tenant" not in args:
+        return None
+    i = args.index("--tenant")
+    if i + 1 >= len(args):
+        sys.exit("Uso: python -m app.migrate <comando> [--tenant <aseguradora>]")
+    tenant = args[i + 1]
+    del args[i:i + 2]
+    return tenant
+
+
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    # Cada comando se aplica a todas las aseguradoras, o solo a la de --tenant
+    args = sys.argv[1:]
+    tenant = _tenant_option(args)
+    if len(args) == 2 and args[0] == "damages-layout":
+        # python -m app.migrate damages-layout embedded|separate
+        asyncio.run(_run(for_tenants(lambda: migrate_damages_layout(args[1]), tenant)))
+    elif args == ["soft-delete"]:
+        # python -m app.migrate soft-delete (una vez, al actualizar)
+        asyncio.run(_run(for_tenants(migrate_soft_delete, tenant)))
+    elif args == ["money"]:
+        # python -m app.migrate money (una vez, al actualizar)
+        asyncio.run(_run(for_tenants(migrate_money, tenant)))
+    elif args == ["fingerprints"]:
+        # python -m app.migrate fingerprints (al actualizar o tras una importación
+        # masiva)
+        asyncio.run(_run(for_tenants(migrate_fingerprints, tenant)))
+    elif args == ["status-changed-at"]:
+        # python -m app.migrate status-changed-at (una vez, antes de activar el
+        # archivado)
+        asyncio.run(_run(for_tenants(migrate_status_changed_at, tenant)))
+    elif len(args) in (1, 2) and args[0] == "archive":
+        # python -m app.migrate archive [días]
+        days = int(args[1]) if len(args) == 2 else None
+        moved = asyncio.run(_run(for_tenants(lambda: archive_claims(days), tenant)))
+        print(f"Reclamaciones archivadas: {sum(moved)}")
+    else:
+        create_tables()
@@ -1,9 +1,15 @@
+from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import List, Literal, Optional
 from decimal import Decimal
 from typing import Annotated
 
-from pydantic import BaseModel, Field, AnyUrl, field_validator
+from pydantic import (
+    AfterValidator, BaseModel, BeforeValidator, Field, AnyUrl, PlainSerializer,
+    SerializationInfo
+)
+
+from app.core.money import Money
 
 
 class ClaimStatus(str, Enum):
@@ -19,9 +25,25 @@ class DamageSeverity(str, Enum):
     HIGH = "HIGH"
 
 
+def _serialize_money(value: Money, info: SerializationInfo):
+    return str(value) if info.mode_is_json() else value
+
+
+def _parse_price(value) -> Decimal:
+    # Acepta Money/int/float/str/Decimal redondeado a céntimos; ValueError (422) si no
+    # es un importe
+    return Money.parse(value).to_decimal()
+
+
+# Se normaliza con Money.parse, se valida como Decimal (restricciones y mensajes de
+# error) y se guarda como Money (céntimos enteros); en JSON sale como importe con
+# 2 decimales ("100.50")
 Price = Annotated[
     Decimal,
-    Field(ge=Decimal("0"), max_digits=10, decimal_places=2)
+    BeforeValidator(_parse_price),
+    Field(ge=0, max_digits=10, decimal_places=2),
+    AfterValidator(Money.parse),
+    PlainSerializer(_serialize_money),
 ]
 
 Score = Annotated[
@@ -37,18 +59,6 @@ class DamageBase(BaseModel):
     price: Price
     score: Score
 
-    @field_validator("price", mode="before")
-    @classmethod
-    def normalize_price(cls, v):
-        """
-        Acepta int/float/str y normaliza siempre a 2 decimales.
-        """
-        if isinstance(v, float):
-            v = Decimal(str(v))
-        if not isinstance(v, Decimal):
-            v = Decimal(v)
-        return v.quantize(Decimal("0.01"))
-
 
 class DamageCreate(DamageBase):
     pass
@@ -59,6 +69,15 @@ class Damage(DamageBase):
     claim_id: int
 
 
+class DamageImage(BaseModel):
+    url: str
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    error: Optional[str] = None
+    checked_at: datetime
+
+
 class ClaimBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -74,5 +93,37 @@ class Claim(ClaimBase):
     damages: List[Damage] = []
 
     @property
-    def total_amount(self) -> Decimal:
-        return sum((d.price for d in self.damages), Decimal("0.00"))
+    def total_amount(self) -> Money:
+        return sum((d.price for d in self.damages), Money())
+
+
+class ClaimBatchResult(BaseModel):
+    id: int
+    found: bool
+    claim: Optional[Claim] = None
+
+
+class ClaimStatusResult(BaseModel):
+    id: int
+    result: Literal["updated", "conflict", "not_found"]
+    detail: Optional[str] = None
+
+
+class ClaimPriority(BaseModel):
+    id: int
+    priority: float
+    damage_count: int
+
+
+class ClaimDuplicate(BaseModel):
+    id: int
+    exact: bool
+    similarity: float
+
+
+class ClaimEvent(BaseModel):
+    claim_id: int
+    from_status: Optional[ClaimStatus] = None
+    to_status: ClaimStatus
+    actor: Optional[str] = None
+    at: datetime
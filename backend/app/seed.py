@@ -0,0 +1,381 @@
+"""
+Generador de datos sintéticos (reclamaciones y daños) para probar con volúmenes reales.
+
+    cd backend
+    python -m app.seed generate 100000 --damages 0:1,1:4,2:3,3:2 --output fixture.jsonl
+    python -m app.seed load fixture.jsonl
+
+generate inserta en lotes de --batch-size con --concurrency inserciones en paralelo
+y, con --output, escribe además un fichero de fixtures (JSON extendido, una línea por
+documento) que load vuelve a cargar tal cual. Con --no-insert solo escribe el fichero
+(IDs desde 1). Los documentos siguen el formato de DAMAGES_STORAGE al generarlos.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+import bson
+from bson import json_util
+
+from app.core import embedded
+from app.core.config import settings
+from app.core.db import (
+    advance_sequence, close_mongo_connection, connect_to_mongo, insert_many,
+    reserve_sequence
+)
+from app.core.documents import claim_to_document, damage_to_document
+from app.core.money import Money
+from app.core.tenancy import tenant_scope
+from app.schemas.models import ClaimCreate, DamageCreate
+
+PARTS = [
+    "Puerta delantera",
+    "Puerta trasera",
+    "Capó",
+    "Parachoques delantero",
+    "Parachoques trasero",
+    "Retrovisor",
+    "Faro",
+    "Piloto trasero",
+    "Luna delantera",
+    "Aleta",
+    "Maletero",
+    "Techo",
+    "Llanta",
+]
+TITLES = [
+    "Golpe en aparcamiento", "Colisión trasera", "Daños por granizo", "Rotura de luna",
+    "Vandalismo", "Salida de vía", "Colisión lateral", "Caída de objeto",
+]
+
+# Puntuación de cada severidad: HIGH puntúa alto (sus precios, en Profile, son los más
+# caros)
+SEVERITY_SCORES = {"LOW": (1, 4), "MEDIUM": (4, 7), "HIGH": (7, 10)}
+
+
+def parse_weights(spec: str, cast: Callable[[str], Any] = str) -> Dict[Any, float]:
+    """"LOW:5,MEDIUM:3,HIGH:2" -> {"LOW": 5.0, "MEDIUM": 3.0, "HIGH": 2.0}"""
+    weights = {}
+    for part in spec.split(","):
+        value, _, weight = part.partition(":")
+        weights[cast(value.strip())] = float(weight or 1)
+    if not weights or any(w < 0 for w in weights.values()) or not sum(weights.values()):
+        raise ValueError(f"invalid weights: {spec!r}")
+    return weights
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[Money, Money]]:
+    """"LOW:20-400,HIGH:2000-15000.50" -> {"LOW": (Money 20, Money 400), ...} (euros)"""
+    prices = {}
+    for part in spec.split(","):
+        name, _, bounds = part.partition(":")
+        low, _, high = bounds.partition("-")
+        try:
+            low, high = Money.parse(low.strip()), Money.parse(high.strip())
+        except ValueError:
+            raise ValueError(f"invalid prices: {spec!r}") from None
+        if low.cents < 0 or high < low:
+            raise ValueError(f"invalid prices: {spec!r}")
+        prices[name.strip()] = (low, high)
+    return prices
+
+
+class Profile:
+    """Distribuciones de la generación (todas con pesos relativos)"""
+
+    def __init__(
+        self,
+        damages: str = "0:1,1:4,2:3,3:2,5:1",
+        severity: str = "LOW:5,MEDIUM:3,HIGH:2",
+        status: str = "PENDING:4,IN_REVIEW:3,FINALIZED:2,CANCELED:1",
+        days: int = 365,
+        prices: str = "LOW:20-400,MEDIUM:300-2500,HIGH:2000-15000",
+    ):
+        self.damages = parse_weights(damages, int)
+        self.severity = parse_weights(severity)
+        self.status = parse_weights(status)
+        self.days = days
+        # Precio mínimo y máximo de cada severidad
+        self.prices = parse_prices(prices)
+        for name in {*self.severity, *self.prices}:
+            if name not in SEVERITY_SCORES:
+                raise ValueError(f"unknown severity: {name}")
+        for name in self.severity:
+            if name not in self.prices:
+                raise ValueError(f"no prices for severity: {name}")
+
+    @staticmethod
+    def pick(rng: random.Random, weights: Dict[Any, float]) -> Any:
+        return rng.choices(list(weights), list(weights.values()))[0]
+
+
+def _damage(rng: random.Random, profile: Profile, damage_id: int) -> Dict[str, Any]:
+    severity = profile.pick(rng, profile.severity)
+    low, high = profile.prices[severity]
+    # Pasa por DamageCreate para respetar las restricciones de Price y Score
+    damage = DamageCreate(
+        part=rng.choice(PARTS),
+        severity=severity,
+        image_url=f"https://images.example.com/damages/{damage_id}.jpg",
+        price=Money(rng.randint(low.cents, high.cents)),
+        score=rng.randint(*SEVERITY_SCORES[severity]),
+    )
+    return {**damage_to_document(damage), "deleted_at": None}
+
+
+def _description(rng: random.Random, status: str, title: str) -> Optional[str]:
+    # Las finalizadas llevan más de 100 caracteres (regla de los daños HIGH)
+    if status == "FINALIZED":
+        return (
+            f"{title}. Peritaje completado y daños valorados según baremo; el "
+            f"asegurado aporta fotografías y parte amistoso "
+            f"(expediente {rng.randint(10000, 99999)})."
+        )
+    return rng.choice([None, f"{title}. Pendiente de peritaje."])
+
+
+def build_batch(
+    rng: random.Random, profile: Profile, first_claim_id: int, counts: List[int],
+    first_damage_id: int, now: datetime,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Documentos de len(counts) reclamaciones con counts[i] daños cada una.
+    Devuelve (claims, damages); en modo embebido los daños van dentro de la
+    reclamación salvo los que no caben, que van a la colección damages.
+    """
+    claims, damages = [], []
+    damage_id = first_damage_id
+    for claim_id, count in enumerate(counts, start=first_claim_id):
+        status = profile.pick(rng, profile.status)
+        title = rng.choice(TITLES)
+        claim = ClaimCreate(
+            title=title, description=_description(rng, status, title), status=status
+        )
+        doc = {
+            "_id": claim_id,
+            **claim_to_document(claim),
+            "status_changed_at": now
+            - timedelta(seconds=rng.uniform(0, profile.days * 86400)),
+        }
+
+        if embedded.is_enabled():
+            doc["damages"] = []
+            size = len(bson.encode(doc))
+        for _ in range(count):
+            item = _damage(rng, profile, damage_id)
+            if embedded.is_enabled():
+                item = {"id": damage_id, **item}
+                size += len(bson.encode(item))
+                if size <= settings.EMBEDDED_DAMAGES_MAX_BYTES:
+                    doc["damages"].append(item)
+                else:
+                    damages.append(
+                        {
+                            "_id": damage_id,
+                            "claim_id": claim_id,
+                            **{k: v for k, v in item.items() if k != "id"},
+                        }
+                    )
+                    doc["damages_spilled"] = True
+            else:
+                damages.append({"_id": damage_id, "claim_id": claim_id, **item})
+            damage_id += 1
+        claims.append(doc)
+    return claims, damages
+
+
+def _write_fixture(out: IO[str], collection: str, documents: List[Dict[str, Any]]):
+    for doc in documents:
+        out.write(json_util.dumps({"collection": collection, "document": doc}) + "\n")
+
+
+async def generate(
+    count: int,
+    profile: Optional[Profile] = None,
+    batch_size: int = 1000,
+    concurrency: int = 4,
+    seed: Optional[int] = None,
+    output: Optional[IO[str]] = None,
+    insert: bool = True,
+) -> Tuple[int, int]:
+    """
+    Genera count reclamaciones con sus daños. Inserta (insert) con hasta
+    concurrency lotes en vuelo y/o escribe los documentos en output.
+    Devuelve (reclamaciones, daños).
+    """
+    profile = profile or Profile()
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    slots = asyncio.Semaphore(concurrency)
+    pending = set()
+    claim_id = damage_id = 1
+    total_damages = 0
+
+    async def write(claims, damages):
+        try:
+            await insert_many("claims", claims)
+            if damages:
+                await insert_many("damages", damages)
+        finally:
+            slots.release()
+
+    for start in range(0, count, batch_size):
+        counts = [
+            profile.pick(rng, profile.damages)
+            for _ in range(min(batch_size, count - start))
+        ]
+        if insert:
+            # Bloques de IDs reservados: conviven con las altas que haga la API a la vez
+            claim_id = await reserve_sequence("claims", len(counts))
+            damage_id = (
+                await reserve_sequence("damages", sum(counts))
+                if sum(counts)
+                else damage_id
+            )
+        claims, damages = build_batch(rng, profile, claim_id, counts, damage_id, now)
+        if not insert:
+            claim_id, damage_id = claim_id + len(counts), damage_id + sum(counts)
+        total_damages += sum(counts)
+
+        if output:
+            _write_fixture(output, "claims", claims)
+            _write_fixture(output, "damages", damages)
+        if insert:
+            await slots.acquire()
+            task = asyncio.create_task(write(claims, damages))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            # Un lote fallido detiene la generación
+            for done in [t for t in list(pending) if t.done()]:
+                done.result()
+
+    if pending:
+        await asyncio.gather(*pending)
+    return count, total_damages
+
+
+async def load(source: IO[str], batch_size: int = 1000) -> Dict[str, int]:
+    """Carga fixtures y adelanta los contadores. Devuelve documentos por colección"""
+    batches: Dict[str, List[Dict[str, Any]]] = {}
+    loaded: Dict[str, int] = {}
+    max_ids = {"claims": 0, "damages": 0}
+
+    async def flush(collection: str):
+        if batches.get(collection):
+            await insert_many(collection, batches[collection])
+            loaded[collection] = loaded.get(collection, 0) + len(batches[collection])
+            batches[collection] = []
+
+    for line in source:
+        if not line.strip():
+            continue
+        entry = json_util.loads(line)
+        collection, doc = entry["collection"], entry["document"]
+        if collection in max_ids:
+            max_ids[collection] = max(max_ids[collection], doc["_id"])
+        for item in doc.get("damages", []) if collection == "claims" else []:
+            max_ids["damages"] = max(max_ids["damages"], item["id"])
+        batches.setdefault(collection, []).append(doc)
+        if len(batches[collection]) >= batch_size:
+            await flush(collection)
+
+    for collection in list(batches):
+        await flush(collection)
+    for name, value in max_ids.items():
+        if value:
+            await advance_sequence(name, value)
+    return loaded
+
+
+async def _run(coro, tenant: Optional[str]):
+    await connect_to_mongo()
+    try:
+        with tenant_scope(tenant):
+            return await coro
+    finally:
+        await close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tenant", help="aseguradora (con MULTI_TENANT)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="generar e insertar reclamaciones")
+    gen.add_argument("count", type=int)
+    gen.add_argument(
+        "--damages", default="0:1,1:4,2:3,3:2,5:1", help="daños por reclamación:peso"
+    )
+    gen.add_argument(
+        "--severity", default="LOW:5,MEDIUM:3,HIGH:2", help="severidad:peso"
+    )
+    gen.add_argument(
+        "--status",
+        default="PENDING:4,IN_REVIEW:3,FINALIZED:2,CANCELED:1",
+        help="estado:peso",
+    )
+    gen.add_argument(
+        "--days",
+        type=int,
+        default=365,
+        help="antigüedad máxima del último cambio de estado",
+    )
+    gen.add_argument(
+        "--prices",
+        default="LOW:20-400,MEDIUM:300-2500,HIGH:2000-15000",
+        help="severidad:mínimo-máximo (euros)",
+    )
+    gen.add_argument("--batch-size", type=int, default=1000)
+    gen.add_argument("--concurrency", type=int, default=4)
+    gen.add_argument("--seed", type=int)
+    gen.add_argument("--output", help="fichero de fixtures a escribir")
+    gen.add_argument("--no-insert", action="store_true", help="solo escribir --output")
+
+    ld = commands.add_parser("load", help="cargar un fichero de fixtures")
+    ld.add_argument("path")
+    ld.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "generate":
+        if args.no_insert and not args.output:
+            parser.error("--no-insert requires --output")
+        profile = Profile(
+            args.damages, args.severity, args.status, args.days, args.prices
+        )
+        output = open(args.output, "w", encoding="utf-8") if args.output else None
+        try:
+            job = generate(
+                args.count,
+                profile,
+                args.batch_size,
+                args.concurrency,
+                args.seed,
+                output,
+                not args.no_insert,
+            )
+            claims, damages = (
+                asyncio.run(job)
+                if args.no_insert
+                else asyncio.run(_run(job, args.tenant))
+            )
+        finally:
+            if output:
+                output.close()
+        elapsed = time.perf_counter() - start
+        rate = (claims + damages) / elapsed * 60 if elapsed else 0
+        print(
+            f"Generadas {claims} reclamaciones y {damages} daños en {elapsed:.1f}s "
+            f"({rate:,.0f} documentos/min)"
+        )
+    else:
+        with open(args.path, encoding="utf-8") as source:
+            loaded = asyncio.run(_run(load(source, args.batch_size), args.tenant))
+        print(f"Documentos cargados: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import importlib.util
+import os
+from typing import List, Optional
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def resolve_workers(workers: int) -> int:
+    """Number of worker processes (0 = one per CPU core)"""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def best_loop() -> str:
+    """uvloop when installed, asyncio otherwise"""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def best_http() -> str:
+    """httptools when installed, h11 otherwise"""
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Production launcher: python -m app [--workers N] [--host H] [--port P]
+    SIGTERM/SIGINT drain in-flight requests and run the lifespan shutdown
+    (job queue, audit writer, close_mongo_connection) in every worker.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m app", description="Claims Manager API server"
+    )
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="worker processes, 0 = one per CPU core")
+    args = parser.parse_args(argv)
+
+    workers = resolve_workers(args.workers)
+    # Workers are separate processes: they read their share of the Mongo pool from the
+    # environment
+    os.environ["SERVER_WORKERS"] = str(workers)
+    settings.SERVER_WORKERS = workers
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=best_loop(),
+        http=best_http(),
+        lifespan="on",
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+    )
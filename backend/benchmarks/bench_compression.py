@@ -0,0 +1,88 @@
+"""
+Bytes saved and CPU cost of response compression on a get_claims-like payload.
+
+    cd backend
+    python -m benchmarks.bench_compression --claims 500 --damages 5
+
+"whole" compresses the body in one go (normal JSON responses); "streamed"
+compresses it in row-sized chunks with a flush after each one, which is what
+CompressionMiddleware does for streaming responses.
+"""
+import argparse
+import json
+import time
+
+from app.core import compression
+from app.core.config import settings
+
+
+def payload(claims: int, damages: int) -> bytes:
+    data = [
+        {
+            "id": c,
+            "title": f"Reclamación {c}",
+            "description": "Golpe lateral en aparcamiento, daños en puerta y aleta",
+            "status": ["PENDING", "IN_REVIEW", "FINALIZED", "CANCELED"][c % 4],
+            "total_amount": 1234.5,
+            "damages": [
+                {
+                    "id": c * damages + d,
+                    "claim_id": c,
+                    "part": ["Bumper", "Door", "Hood", "Mirror"][d % 4],
+                    "severity": ["LOW", "MEDIUM", "HIGH"][d % 3],
+                    "image_url": f"https://images.example.com/claims/{c}/damages/{d}.jpg",
+                    "price": 150.0 + d,
+                    "score": d % 10 + 1,
+                }
+                for d in range(damages)
+            ],
+        }
+        for c in range(claims)
+    ]
+    return json.dumps(data).encode()
+
+
+def measure(encoding: str, body: bytes, chunk_size: int, repeat: int):
+    best = None
+    for _ in range(repeat):
+        comp = compression.compressor(encoding)
+        start = time.thread_time()
+        if chunk_size:
+            out = b"".join(
+                comp.compress(body[i:i + chunk_size]) + comp.flush()
+                for i in range(0, len(body), chunk_size)
+            ) + comp.finish()
+        else:
+            out = comp.compress(body) + comp.finish()
+        elapsed = time.thread_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(out), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claims", type=int, default=500)
+    parser.add_argument("--damages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    body = payload(args.claims, args.damages)
+    row = len(body) // (args.claims or 1)
+    print(f"payload: {len(body):,} bytes ({args.claims} claims x {args.damages} damages)")
+    print(f"{'encoding':<12} {'mode':<9} {'bytes':>10} {'saved':>7} {'cpu ms':>8} {'MB/s':>8}")
+
+    variants = [("gzip", "GZIP_LEVEL", level) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        variants += [("br", "BROTLI_QUALITY", quality) for quality in (1, 4, 6, 11)]
+
+    for encoding, setting, value in variants:
+        setattr(settings, f"COMPRESSION_{setting}", value)
+        for mode, chunk_size in (("whole", 0), ("streamed", row)):
+            size, cpu = measure(encoding, body, chunk_size, args.repeat)
+            saved = 1 - size / len(body)
+            rate = len(body) / cpu / 1e6 if cpu else float("inf")
+            print(f"{encoding + '-' + str(value):<12} {mode:<9} {size:>10,} {saved:>6.1%} {cpu * 1000:>8.1f} {rate:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Memory of N claims held as API models, compact objects and a damage table.
+
+    cd backend
+    python -m benchmarks.bench_memory --claims 100000 --damages 3
+
+Synthetic claim and damage documents (app.seed) are converted the way a batch
+job would load them; tracemalloc reports the bytes each representation keeps
+alive (the documents themselves are not counted). The damage table holds the
+damages only, as a triage or reconciliation scan would.
+"""
+import argparse
+import random
+import tracemalloc
+from datetime import datetime, timezone
+
+from app import seed
+from app.core.compact import CompactClaim, CompactDamage, DamageTable
+from app.core.documents import claim_from_document, damage_from_document
+
+
+def measure(build):
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claims", type=int, default=100_000)
+    parser.add_argument("--damages", type=int, default=3)
+    args = parser.parse_args()
+
+    profile = seed.Profile(damages=f"{args.damages}:1")
+    claims, damages = seed.build_batch(
+        random.Random(0), profile, 1, [args.damages] * args.claims, 1, datetime.now(timezone.utc)
+    )
+    by_claim = {doc["_id"]: [] for doc in claims}
+    for doc in damages:
+        by_claim[doc["claim_id"]].append(doc)
+
+    def models():
+        return [claim_from_document(c, [damage_from_document(d) for d in by_claim[c["_id"]]]) for c in claims]
+
+    def compact():
+        return [
+            CompactClaim.from_document(c, [CompactDamage.from_document(d) for d in by_claim[c["_id"]]])
+            for c in claims
+        ]
+
+    def table():
+        result = DamageTable()
+        for doc in damages:
+            result.add_document(doc)
+        return result
+
+    baseline = measure(models)
+    print(f"{len(claims):,} claims, {len(damages):,} damages")
+    print(f"API models:   {baseline / 2**20:8.1f} MiB")
+    for name, build in (("compact:     ", compact), ("damage table:", table)):
+        size = measure(build)
+        print(f"{name} {size / 2**20:8.1f} MiB ({baseline / size:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Time of the vectorised triage ranking over N damages.
+
+    cd backend
+    python -m benchmarks.bench_triage --damages 1000000 --claims 300000
+
+Random damages (severity, score, price) spread over --claims claims. Only the
+ranking is timed; loading the damages from MongoDB is a cursor read like any
+other listing. The per-damage Python loop is timed on a sample for comparison.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from app.core import triage
+from app.core.config import settings
+
+
+def python_rank(claim_ids, severities, scores, prices, k):
+    weights = [settings.TRIAGE_SEVERITY_WEIGHTS[s] for s in triage.SEVERITIES]
+    totals = {}
+    for claim_id, severity, score, price in zip(claim_ids, severities, scores, prices):
+        priority = (
+            weights[severity] + settings.TRIAGE_SCORE_WEIGHT * score + settings.TRIAGE_PRICE_WEIGHT * math.log1p(price)
+        )
+        totals[claim_id] = totals.get(claim_id, 0.0) + priority
+    return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--damages", type=int, default=1_000_000)
+    parser.add_argument("--claims", type=int, default=300_000)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = (
+        rng.integers(1, args.claims + 1, args.damages),
+        rng.integers(0, len(triage.SEVERITIES), args.damages).astype(np.int8),
+        rng.integers(1, 11, args.damages).astype(np.float64),
+        rng.uniform(10, 15000, args.damages),
+    )
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        triage.rank(*columns, args.k)
+        timings.append(time.perf_counter() - start)
+    print(f"numpy:  {args.damages:,} damages in {min(timings) * 1000:.1f} ms (best of {args.repeat})")
+
+    sample = min(args.damages, 200_000)
+    start = time.perf_counter()
+    python_rank(*(c[:sample].tolist() for c in columns), args.k)
+    per_damage = (time.perf_counter() - start) / sample
+    print(f"python: {per_damage * args.damages * 1000:.1f} ms estimated for {args.damages:,} damages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Throughput of `python -m app` with 1..N worker processes.
+
+    cd backend
+    python -m benchmarks.bench_workers --max-workers 4 --requests 5000
+
+Needs MongoDB running (docker compose up -d), or MONGO_BACKEND=memory to
+run without it: every worker connects and creates indexes on startup. The
+load hits GET /health, which does not touch the database, so the numbers
+reflect the server itself; scaling flattens out once workers exceed the
+available CPU cores.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+async def _wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server not ready at {url}")
+
+
+async def _load(url: str, requests: int, concurrency: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                (await client.get(url)).raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return requests / (time.perf_counter() - start)
+
+
+def run(workers: int, port: int, requests: int, concurrency: int) -> float:
+    url = f"http://127.0.0.1:{port}/health"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(_wait_ready(url))
+        return asyncio.run(_load(url, requests, concurrency))
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    for workers in range(1, args.max_workers + 1):
+        rate = run(workers, args.port, args.requests, args.concurrency)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
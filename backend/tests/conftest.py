@@ -0,0 +1,25 @@
+import pytest
+
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.db import (
+    close_mongo_connection, connect_to_mongo, ensure_indexes, mongodb
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_admission():
+    """Every test starts with full rate-limit buckets (requests share one client IP)"""
+    admission.reset()
+    yield
+
+
+@pytest.fixture
+async def memory_db(monkeypatch):
+    """A fresh in-memory database behind app.core.db (MONGO_BACKEND=memory)"""
+    monkeypatch.setattr(settings, "MONGO_BACKEND", "memory")
+    await connect_to_mongo()
+    await ensure_indexes()
+    yield mongodb.db
+    await close_mongo_connection()
+    mongodb.client = mongodb.db = None
@@ -0,0 +1,155 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.admission import (
+    AdmissionController, AdmissionMiddleware, ConcurrencyLimiter, TokenBucket, admission
+)
+from app.core.config import settings
+from app.main import app
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 100)
+    monkeypatch.setattr(settings, "RATE_LIMIT_EXPENSIVE_BURST", 2)
+    monkeypatch.setattr(settings, "RATE_LIMIT_EXPENSIVE_PER_SECOND", 0.5)
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS", 1)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT", 0.05)
+    monkeypatch.setattr(
+        settings, "EXPENSIVE_ROUTES", ["GET /api/v1/claims", "GET /api/v1/exports/*"]
+    )
+    return AdmissionController()
+
+
+@pytest.fixture
+def client(controller):
+    test_app = FastAPI()
+    test_app.add_middleware(
+        AdmissionMiddleware, controller=controller, prefix="/api/v1"
+    )
+    release = asyncio.Event()
+
+    @test_app.get("/api/v1/claims/")
+    async def claims():
+        return []
+
+    @test_app.get("/api/v1/slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    @test_app.get("/health")
+    async def health():
+        return {}
+
+    transport = httpx.ASGITransport(app=test_app)
+    http = httpx.AsyncClient(transport=transport, base_url="http://test")
+    http.release = release
+    return http
+
+
+def test_token_bucket():
+    """Test the burst is served and then refilled at the configured rate"""
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    wait = bucket.take()
+    assert 0 < wait <= 0.1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_hands_over_in_order():
+    """Test queued requests get released slots in arrival order"""
+    limiter = ConcurrencyLimiter(1)
+    assert await limiter.acquire(0)
+
+    order = []
+
+    async def waiter(name):
+        assert await limiter.acquire(1)
+        order.append(name)
+
+    tasks = [asyncio.create_task(waiter(n)) for n in ("a", "b")]
+    await asyncio.sleep(0)
+    assert limiter.queued == 2
+
+    limiter.release()
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*tasks)
+    limiter.release()
+
+    assert order == ["a", "b"]
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_times_out():
+    """Test a request that cannot get a slot in time is refused"""
+    limiter = ConcurrencyLimiter(1)
+    await limiter.acquire(0)
+
+    assert not await limiter.acquire(0.01)
+    assert limiter.queued == 0
+    limiter.release()
+    assert limiter.active == 0
+
+
+def test_expensive_routes(controller):
+    """Test route matching for the expensive budget"""
+    assert controller.budgets("GET", "/api/v1/claims/") == [
+        controller.expensive,
+        controller.default,
+    ]
+    assert (
+        controller.budgets("GET", "/api/v1/exports/claims.parquet")[0]
+        is controller.expensive
+    )
+    assert controller.budgets("GET", "/api/v1/claims/1") == [controller.default]
+    assert controller.budgets("POST", "/api/v1/claims/") == [controller.default]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_with_retry_after(client, controller):
+    """Test a client over its expensive budget gets 429 with Retry-After"""
+    async with client:
+        statuses = [(await client.get("/api/v1/claims/")).status_code for _ in range(3)]
+        limited = await client.get("/api/v1/claims/")
+        health = await client.get("/health")
+
+    assert statuses == [200, 200, 429]
+    assert limited.headers["retry-after"] == "2"
+    assert health.status_code == 200  # outside the API prefix
+    assert controller.stats()["expensive"]["rate_limited"] == 2
+    assert controller.stats()["expensive"]["admitted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_shed_when_queue_wait_exceeded(client, controller):
+    """Test requests queued longer than ADMISSION_QUEUE_TIMEOUT are shed with 503"""
+    async with client:
+        busy = asyncio.create_task(client.get("/api/v1/slow"))
+        await asyncio.sleep(0.01)
+        shed = await client.get("/api/v1/slow")
+        client.release.set()
+        assert (await busy).status_code == 200
+
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == str(settings.ADMISSION_RETRY_AFTER)
+    assert controller.stats()["default"]["shed"] == 1
+    assert controller.stats()["default"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    """Test /metrics reports the admission counters"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/metrics")
+
+    assert r.status_code == 200
+    assert set(r.json()["admission"]) == {"default", "expensive"}
+    assert r.json()["admission"]["default"]["shed"] == admission.default.shed
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from app.main import app
+import app.core.archive as archive_module
+from app.migrate import migrate_status_changed_at
+
+OLD = datetime.now(timezone.utc) - timedelta(days=400)
+RECENT = datetime.now(timezone.utc) - timedelta(days=1)
+
+
+class Store:
+    """Documents of the in-memory collections the archiver touches"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def docs(self, name):
+        return self.db[name].documents
+
+
+@pytest.fixture
+async def store(memory_db):
+    await memory_db["claims"].insert_many(
+        [
+            {
+                "_id": 1,
+                "title": "Old",
+                "description": None,
+                "status": "FINALIZED",
+                "status_changed_at": OLD,
+            },
+            {
+                "_id": 2,
+                "title": "Recent",
+                "description": None,
+                "status": "CANCELED",
+                "status_changed_at": RECENT,
+            },
+            {
+                "_id": 3,
+                "title": "Open",
+                "description": None,
+                "status": "IN_REVIEW",
+                "status_changed_at": OLD,
+            },
+            {
+                "_id": 4,
+                "title": "Old 2",
+                "description": None,
+                "status": "CANCELED",
+                "status_changed_at": OLD,
+            },
+        ]
+    )
+    await memory_db["damages"].insert_one({
+        "_id": 10, "claim_id": 1, "part": "Door", "severity": "LOW",
+        "image_url": "http://img.jpg", "price": 1000, "score": 2, "deleted_at": None,
+    })
+    return Store(memory_db)
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_terminal_claims(store):
+    """Test only terminal claims past the cutoff move, with their damages, in batches"""
+    moved = await archive_module.archive_claims(older_than_days=90, batch_size=1)
+
+    assert moved == 2
+    assert sorted(store.docs("claims")) == [2, 3]
+    assert sorted(store.docs("claims_archive")) == [1, 4]
+    assert list(store.docs("damages_archive")) == [10]
+    assert store.docs("damages") == {}
+    assert store.docs("archive_state") == {}
+
+
+@pytest.mark.asyncio
+async def test_archive_resumes_interrupted_batch(store, monkeypatch):
+    """Test a run that died after copying a batch finishes removing it next time"""
+    delete_many = archive_module.delete_many
+
+    async def crash_on_damages(collection, filter_query):
+        if collection == "damages":
+            raise RuntimeError("crash")
+        return await delete_many(collection, filter_query)
+
+    monkeypatch.setattr(archive_module, "delete_many", crash_on_damages)
+    with pytest.raises(RuntimeError):
+        await archive_module.archive_claims(older_than_days=90)
+    assert 10 in store.docs("damages")
+    assert store.docs("archive_state")
+
+    monkeypatch.setattr(archive_module, "delete_many", delete_many)
+    await archive_module.archive_claims(older_than_days=90)
+
+    assert store.docs("damages") == {}
+    assert list(store.docs("damages_archive")) == [10]
+    assert store.docs("archive_state") == {}
+
+
+@pytest.mark.asyncio
+async def test_load_archived_claims(store):
+    """Test archived claims are rebuilt with their damages"""
+    await archive_module.archive_claims(older_than_days=90)
+
+    claims = await archive_module.load_archived_claims([1, 2, 4])
+
+    assert sorted(claims) == [1, 4]
+    assert claims[1].damages[0].id == 10
+
+
+@pytest.mark.asyncio
+async def test_get_claim_falls_through_to_archive(store, monkeypatch):
+    """Test GET /claims/{id} reads archived claims transparently"""
+    await archive_module.archive_claims(older_than_days=90)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        archived = await client.get("/api/v1/claims/1")
+        missing = await client.get("/api/v1/claims/99")
+
+    assert archived.status_code == 200
+    assert archived.json()["status"] == "FINALIZED"
+    assert archived.json()["damages"][0]["id"] == 10
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_legacy_claims_are_archived_after_migration(memory_db):
+    """Test undated claims are dated by the migration, then archived by age"""
+    await memory_db["claims"].insert_many(
+        [
+            {"_id": 1, "title": "Legacy closed", "status": "FINALIZED"},
+            {"_id": 2, "title": "Legacy, no events", "status": "CANCELED"},
+            {
+                "_id": 3,
+                "title": "Current",
+                "status": "FINALIZED",
+                "status_changed_at": RECENT,
+            },
+        ]
+    )
+    await memory_db["claim_events"].insert_many(
+        [
+            {
+                "claim_id": 1,
+                "from_status": None,
+                "to_status": "PENDING",
+                "at": OLD - timedelta(days=5),
+            },
+            {
+                "claim_id": 1,
+                "from_status": "PENDING",
+                "to_status": "FINALIZED",
+                "at": OLD,
+            },
+        ]
+    )
+    assert await archive_module.archive_claims(older_than_days=90) == 0
+
+    assert await migrate_status_changed_at(batch_size=1) == 2
+    assert await migrate_status_changed_at() == 0
+    moved = await archive_module.archive_claims(older_than_days=90)
+
+    assert moved == 1
+    assert sorted(memory_db["claims"].documents) == [2, 3]
+    assert memory_db["claims"].documents[2]["status_changed_at"] > OLD.replace(
+        tzinfo=None
+    )
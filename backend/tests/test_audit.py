@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+import httpx
+
+from app.main import app
+from app.core.config import settings
+import app.core.audit as audit_module
+import app.api.routes.claims as claims_module
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    batches = []
+
+    async def mock_insert_many(collection, documents):
+        assert collection == "claim_events"
+        batches.append(list(documents))
+        return [str(i) for i in range(len(documents))]
+
+    monkeypatch.setattr(audit_module, "insert_many", mock_insert_many)
+    return batches
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    writer = audit_module.AuditWriter()
+    monkeypatch.setattr(claims_module, "audit_writer", writer)
+    return writer
+
+
+def test_record_only_buffers(writer):
+    """Test recording an event does not touch the database"""
+    writer.record(1, "PENDING", "IN_REVIEW", "ana")
+
+    assert len(writer.buffer) == 1
+    assert writer.pending(1)[0]["to_status"] == "IN_REVIEW"
+    assert writer.pending(2) == []
+
+
+@pytest.mark.asyncio
+async def test_flush_uses_insert_many(writer, writes):
+    """Test buffered events are written in a single insert_many"""
+    for i in range(3):
+        writer.record(i, "PENDING", "IN_REVIEW")
+
+    assert await writer.flush() == 3
+    assert len(writes) == 1 and len(writes[0]) == 3
+    assert writer.buffer == []
+
+
+@pytest.mark.asyncio
+async def test_flush_failure_keeps_events(writer, monkeypatch):
+    """Test events survive a failed write for the next flush"""
+    async def failing_insert_many(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(audit_module, "insert_many", failing_insert_many)
+    writer.record(1, "PENDING", "IN_REVIEW")
+
+    with pytest.raises(RuntimeError):
+        await writer.flush()
+    assert len(writer.buffer) == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_when_batch_is_full(writer, writes, monkeypatch):
+    """Test reaching AUDIT_BATCH_SIZE triggers a flush before the timer"""
+    monkeypatch.setattr(settings, "AUDIT_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "AUDIT_FLUSH_MS", 60_000)
+
+    await writer.start()
+    try:
+        writer.record(1, "PENDING", "IN_REVIEW")
+        writer.record(2, "PENDING", "IN_REVIEW")
+        for _ in range(20):
+            await asyncio.sleep(0)
+        assert [len(b) for b in writes] == [2]
+    finally:
+        await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_flush_on_timer_and_stop(writer, writes, monkeypatch):
+    """Test partial batches are flushed every AUDIT_FLUSH_MS and on stop"""
+    monkeypatch.setattr(settings, "AUDIT_FLUSH_MS", 10)
+
+    await writer.start()
+    writer.record(1, "PENDING", "IN_REVIEW")
+    await asyncio.sleep(0.05)
+    assert len(writes) == 1
+
+    writer.record(1, "IN_REVIEW", "FINALIZED")
+    await writer.stop()
+    assert len(writes) == 2
+
+
+@pytest.mark.asyncio
+async def test_status_update_records_event(writer, monkeypatch):
+    """Test update_claim_status buffers the transition with the actor"""
+    async def mock_execute_one(collection, filter_query):
+        return {
+            "_id": 1,
+            "title": "Claim 1",
+            "description": "Desc",
+            "status": "PENDING",
+        }
+
+    async def mock_execute_query(*args, **kwargs):
+        return []
+
+    async def mock_update_one_matched(*args, **kwargs):
+        return 1
+
+    monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(claims_module, "execute_query", mock_execute_query)
+    monkeypatch.setattr(claims_module, "update_one_matched", mock_update_one_matched)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.patch("/api/v1/claims/1/status", json={"status": "IN_REVIEW"},
+                               headers={"X-User": "ana"})
+
+    assert r.status_code == 200
+    event = writer.pending(1)[0]
+    assert (event["from_status"], event["to_status"], event["actor"]) == (
+        "PENDING",
+        "IN_REVIEW",
+        "ana",
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_claim_history(writer, monkeypatch):
+    """Test history merges stored and still-buffered events in order"""
+    stored = {"claim_id": 1, "from_status": None, "to_status": "PENDING", "actor": None,
+              "at": "2024-01-01T00:00:00Z"}
+
+    async def mock_find_many(collection, filter_query, sort=None):
+        assert filter_query == {"claim_id": 1}
+        assert sort == [("at", 1)]
+        return [stored]
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    writer.record(1, "PENDING", "IN_REVIEW", "ana")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/claims/1/history")
+
+    assert r.status_code == 200
+    assert [e["to_status"] for e in r.json()] == ["PENDING", "IN_REVIEW"]
+
+
+@pytest.mark.asyncio
+async def test_get_claim_history_not_found(writer, monkeypatch):
+    """Test history of an unknown claim is a 404"""
+    async def mock_find_many(*args, **kwargs):
+        return []
+
+    async def mock_execute_one(*args, **kwargs):
+        return None
+
+    async def mock_load_archived_claim(claim_id):
+        return None
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(
+        claims_module.archive, "load_archived_claim", mock_load_archived_claim
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/claims/999/history")
+
+    assert r.status_code == 404
@@ -0,0 +1,152 @@
+import csv
+import json
+
+import pytest
+
+from app.core.db import next_sequence
+import app.bulk_import as bulk_import
+
+CLAIM_COLUMNS = ["id", "title", "description", "status", "status_changed_at"]
+DAMAGE_COLUMNS = ["id", "claim_id", "part", "severity", "image_url", "price", "score"]
+
+
+def _write_csv(path, columns, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def claims_csv(tmp_path):
+    rows = [
+        [i, f"Reclamación {i}", "", "PENDING", "2024-01-01T00:00:00"]
+        for i in range(1, 11)
+    ]
+    rows[3][3] = "LOST"
+    return _write_csv(tmp_path / "claims.csv", CLAIM_COLUMNS, rows)
+
+
+def test_validate_chunk():
+    """Test rows go through DamageCreate and invalid ones are rejected with a reason"""
+    rows = [
+        {
+            "id": "7",
+            "claim_id": "1",
+            "part": "Capó",
+            "severity": "LOW",
+            "image_url": "http://i.jpg",
+            "price": "10.5",
+            "score": "3",
+        },
+        {
+            "id": "8",
+            "claim_id": "1",
+            "part": "Capó",
+            "severity": "LOW",
+            "image_url": "http://i.jpg",
+            "price": "-1",
+            "score": "11",
+        },
+        {
+            "id": "9",
+            "part": "Capó",
+            "severity": "LOW",
+            "image_url": "http://i.jpg",
+            "price": "1",
+            "score": "1",
+        },
+    ]
+
+    documents, rejected = bulk_import.validate_chunk("damages", rows, first_row=40)
+
+    assert [d["_id"] for d in documents] == [7]
+    assert documents[0]["price"] == 1050
+    assert [(n, reason) for n, _, reason in rejected] == [
+        (41, "price: Input should be greater than or equal to 0; "
+             "score: Input should be less than or equal to 10"),
+        (42, "missing column 'claim_id'"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_import_csv(memory_db, claims_csv):
+    """Test a CSV import inserts valid rows, reports rejected ones, moves the counter"""
+    state = await bulk_import.import_file(
+        "claims", claims_csv, chunk_size=3, workers=0, report=lambda _: None
+    )
+
+    assert (state["rows"], state["inserted"], state["rejected"], state["done"]) == (
+        10,
+        9,
+        1,
+        True,
+    )
+    assert await memory_db["claims"].count_documents({}) == 9
+    assert (await memory_db["claims"].find_one({"_id": 1}))["description"] is None
+    assert await next_sequence("claims") == 11
+    with open(claims_csv + ".rejected.csv", encoding="utf-8") as f:
+        assert [row[0] for row in csv.reader(f)] == ["row", "4"]
+    with open(claims_csv + ".checkpoint", encoding="utf-8") as f:
+        assert json.load(f)["rows"] == 10
+
+
+@pytest.mark.asyncio
+async def test_import_resumes_from_checkpoint(memory_db, claims_csv, monkeypatch):
+    """Test an interrupted import resumes after the last written chunk, no duplicates"""
+    real_insert = bulk_import.insert_missing
+    calls = []
+
+    async def failing_insert(collection, documents):
+        calls.append(len(documents))
+        if len(calls) == 2:
+            await real_insert(
+                collection, documents[:1]
+            )  # half-written chunk, then a crash
+            raise RuntimeError("connection lost")
+        return await real_insert(collection, documents)
+
+    monkeypatch.setattr(bulk_import, "insert_missing", failing_insert)
+    with pytest.raises(RuntimeError):
+        await bulk_import.import_file(
+            "claims", claims_csv, chunk_size=3, workers=0, report=lambda _: None
+        )
+
+    monkeypatch.setattr(bulk_import, "insert_missing", real_insert)
+    state = await bulk_import.import_file(
+        "claims", claims_csv, chunk_size=3, workers=0, report=lambda _: None
+    )
+
+    assert (state["inserted"], state["existing"], state["rejected"]) == (8, 1, 1)
+    assert await memory_db["claims"].count_documents({}) == 9
+
+
+@pytest.mark.asyncio
+async def test_import_parquet_with_process_pool(memory_db, tmp_path):
+    """Test Parquet files are read in batches and validated in worker processes"""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "damages.parquet")
+    pq.write_table(
+        pa.table(
+            {
+                "id": list(range(1, 6)),
+                "claim_id": [1] * 5,
+                "part": ["Puerta"] * 5,
+                "severity": ["HIGH"] * 5,
+                "image_url": ["http://i.jpg"] * 5,
+                "price": [100.0] * 5,
+                "score": [9] * 5,
+            }
+        ),
+        path,
+    )
+
+    state = await bulk_import.import_file(
+        "damages", path, chunk_size=2, workers=2, report=lambda _: None
+    )
+
+    assert state["inserted"] == 5
+    damage = await memory_db["damages"].find_one({"_id": 5})
+    assert (damage["claim_id"], damage["deleted_at"]) == (1, None)
@@ -22,13 +22,23 @@ async def test_get_claims_empty(monkeypatch):
 @pytest.mark.asyncio
 async def test_get_claims_with_data(monkeypatch):
     call_count = [0]
-    
+
     async def mock_execute_query(*args, **kwargs):
         call_count[0] += 1
         if call_count[0] == 1:
             return [
-                (1, "Claim 1", "Desc", "PENDING"),
-                (2, "Claim 2", None, "IN_REVIEW"),
+                {
+                    "_id": 1,
+                    "title": "Claim 1",
+                    "description": "Desc",
+                    "status": "PENDING",
+                },
+                {
+                    "_id": 2,
+                    "title": "Claim 2",
+                    "description": None,
+                    "status": "IN_REVIEW",
+                },
             ]
         else:
             return []
@@ -43,10 +53,77 @@ async def test_get_claims_with_data(monkeypatch):
     assert len(r.json()) == 2
 
 
+@pytest.mark.asyncio
+async def test_get_claims_sparse_fields(monkeypatch):
+    calls = []
+
+    async def mock_find_many(
+        collection, filter_query, projection=None, read_method=None
+    ):
+        assert read_method == "claims.list"
+        calls.append((collection, projection))
+        return [{"_id": 1, "title": "Claim 1", "status": "PENDING"}]
+
+    async def mock_execute_query(*args, **kwargs):
+        raise AssertionError("damages should not be queried")
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(claims_module, "execute_query", mock_execute_query)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/claims/?fields=id,title,status")
+
+    assert r.status_code == 200
+    assert r.json() == [{"id": 1, "title": "Claim 1", "status": "PENDING"}]
+    assert calls == [("claims", {"_id": 1, "title": 1, "status": 1})]
+
+
+@pytest.mark.asyncio
+async def test_get_claims_sparse_fields_with_damages(monkeypatch):
+
+    async def mock_find_many(
+        collection, filter_query, projection=None, read_method=None
+    ):
+        assert projection == {"title": 1, "damages": 1, "damages_spilled": 1}
+        return [{"_id": 1, "title": "Claim 1"}]
+
+    async def mock_execute_query(collection, filter_query, read_method=None):
+        assert filter_query == {"claim_id": 1, "deleted_at": {"$type": "null"}}
+        assert read_method == "claims.list"
+        return [{"_id": 3, "claim_id": 1, "part": "Door", "severity": "LOW",
+                 "image_url": "http://img.jpg", "price": 10.0, "score": 2}]
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(claims_module, "execute_query", mock_execute_query)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/claims/?fields=title,damages")
+
+    assert r.status_code == 200
+    body = r.json()[0]
+    assert set(body) == {"title", "damages"}
+    assert body["damages"][0]["part"] == "Door"
+
+
+@pytest.mark.asyncio
+async def test_get_claims_unknown_field():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/claims/?fields=id,secret")
+
+    assert r.status_code == 400
+    assert "secret" in r.json()["detail"]
+
+
 @pytest.mark.asyncio
 async def test_create_claim(monkeypatch):
-    async def mock_execute_one(*args, **kwargs):
-        return (1,)
+    async def mock_next_sequence(*args, **kwargs):
+        return 1
+
+    async def mock_insert_one(*args, **kwargs):
+        return "1"
 
     payload = {
         "title": "New claim",
@@ -54,7 +131,8 @@ async def test_create_claim(monkeypatch):
         "status": "PENDING"
     }
 
-    monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(claims_module, "next_sequence", mock_next_sequence)
+    monkeypatch.setattr(claims_module, "insert_one", mock_insert_one)
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
@@ -62,28 +140,41 @@ async def test_create_claim(monkeypatch):
 
     assert r.status_code == 201
     assert r.json()["title"] == "New claim"
+    assert r.json()["id"] == 1
 
 
 @pytest.mark.asyncio
 async def test_update_claim_status(monkeypatch):
     call_count = [0]
-    
+
     async def mock_execute_one(*args, **kwargs):
         call_count[0] += 1
         if call_count[0] == 1:
-            return (1, "Claim 1", "Long description " * 20, "PENDING")
+            return {
+                "_id": 1,
+                "title": "Claim 1",
+                "description": "Long description " * 20,
+                "status": "PENDING",
+            }
         elif call_count[0] == 2:
             return None
-        elif call_count[0] == 3:
-            return (1,)
         else:
-            return (1, "Claim 1", "Long description " * 20, "FINALIZED")
-    
+            return {
+                "_id": 1,
+                "title": "Claim 1",
+                "description": "Long description " * 20,
+                "status": "FINALIZED",
+            }
+
     async def mock_execute_query(*args, **kwargs):
         return []
 
+    async def mock_update_one_matched(*args, **kwargs):
+        return 1
+
     monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
     monkeypatch.setattr(claims_module, "execute_query", mock_execute_query)
+    monkeypatch.setattr(claims_module, "update_one_matched", mock_update_one_matched)
 
     payload = {"status": "FINALIZED"}
 
@@ -92,6 +183,7 @@ async def test_update_claim_status(monkeypatch):
         r = await client.patch("/api/v1/claims/1/status", json=payload)
 
     assert r.status_code == 200
+    assert r.json()["status"] == "FINALIZED"
 
 
 @pytest.mark.asyncio
@@ -99,7 +191,13 @@ async def test_get_claim_not_found(monkeypatch):
     async def mock_execute_one(*args, **kwargs):
         return None
 
+    async def mock_load_archived_claim(claim_id):
+        return None
+
     monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(
+        claims_module.archive, "load_archived_claim", mock_load_archived_claim
+    )
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
@@ -125,7 +223,12 @@ async def test_update_claim_not_found(monkeypatch):
 @pytest.mark.asyncio
 async def test_cancel_non_pending_claim(monkeypatch):
     async def mock_execute_one(*args, **kwargs):
-        return (1, "Claim 1", "Desc", "IN_REVIEW")
+        return {
+            "_id": 1,
+            "title": "Claim 1",
+            "description": "Desc",
+            "status": "IN_REVIEW",
+        }
 
     monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
 
@@ -139,13 +242,18 @@ async def test_cancel_non_pending_claim(monkeypatch):
 @pytest.mark.asyncio
 async def test_finalize_high_damage_short_description(monkeypatch):
     call_count = [0]
-    
+
     async def mock_execute_one(*args, **kwargs):
         call_count[0] += 1
         if call_count[0] == 1:
-            return (1, "Claim 1", "Short", "PENDING")
+            return {
+                "_id": 1,
+                "title": "Claim 1",
+                "description": "Short",
+                "status": "PENDING",
+            }
         else:
-            return (1,)
+            return {"_id": 1, "claim_id": 1, "severity": "HIGH"}
 
     monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
 
@@ -154,3 +262,242 @@ async def test_finalize_high_damage_short_description(monkeypatch):
         r = await client.patch("/api/v1/claims/1/status", json={"status": "FINALIZED"})
 
     assert r.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_batch_get_claims(monkeypatch):
+    calls = []
+
+    async def mock_find_many(collection, filter_query):
+        calls.append((collection, filter_query))
+        if collection == "claims":
+            return [
+                {
+                    "_id": 2,
+                    "title": "Claim 2",
+                    "description": None,
+                    "status": "IN_REVIEW",
+                },
+                {
+                    "_id": 1,
+                    "title": "Claim 1",
+                    "description": "Desc",
+                    "status": "PENDING",
+                },
+            ]
+        return [{"_id": 5, "claim_id": 1, "part": "Door", "severity": "LOW",
+                 "image_url": "http://img.jpg", "price": 10.0, "score": 2}]
+
+    async def mock_load_archived_claims(ids):
+        calls.append(("archive", ids))
+        return {}
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(
+        claims_module.archive, "load_archived_claims", mock_load_archived_claims
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/claims:batchGet", json={"ids": [1, 99, 2, 1]})
+
+    assert r.status_code == 200
+    body = r.json()
+    assert [(item["id"], item["found"]) for item in body] == [
+        (1, True),
+        (99, False),
+        (2, True),
+        (1, True),
+    ]
+    assert body[1]["claim"] is None
+    assert body[0]["claim"]["damages"][0]["id"] == 5
+    assert body[2]["claim"]["damages"] == []
+    assert calls == [
+        ("claims", {"_id": {"$in": [1, 99, 2]}}),
+        ("damages", {"claim_id": {"$in": [2, 1]}, "deleted_at": {"$type": "null"}}),
+        ("archive", [99]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_get_claims_embedded(monkeypatch):
+    calls = []
+
+    async def mock_find_many(collection, filter_query):
+        calls.append(collection)
+        return [
+            {
+                "_id": 1,
+                "title": "Claim 1",
+                "status": "PENDING",
+                "damages": [
+                    {
+                        "id": 5,
+                        "part": "Door",
+                        "severity": "LOW",
+                        "image_url": "http://img.jpg",
+                        "price": 10.0,
+                        "score": 2,
+                    }
+                ],
+            }
+        ]
+
+    monkeypatch.setattr(claims_module.embedded.settings, "DAMAGES_STORAGE", "embedded")
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/claims:batchGet", json={"ids": [1]})
+
+    assert r.status_code == 200
+    assert r.json()[0]["claim"]["damages"][0]["claim_id"] == 1
+    assert calls == ["claims"]
+
+
+@pytest.mark.asyncio
+async def test_batch_get_claims_too_many(monkeypatch):
+    monkeypatch.setattr(claims_module.settings, "CLAIMS_BATCH_MAX", 2)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/claims:batchGet", json={"ids": [1, 2, 3]})
+
+    assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_update_claim_status(monkeypatch):
+    writes = []
+
+    async def mock_find_many(collection, filter_query, projection=None):
+        assert collection == "claims"
+        return [
+            {"_id": 1, "status": "PENDING", "description": "Desc"},
+            {"_id": 2, "status": "IN_REVIEW", "description": "Desc"},
+        ]
+
+    async def mock_bulk_update(collection, updates):
+        writes.append(updates)
+        return len(updates)
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(claims_module, "bulk_update", mock_bulk_update)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/claims:batchUpdateStatus",
+                              json={"ids": [1, 2, 3], "status": "CANCELED"})
+
+    assert r.status_code == 200
+    assert [(item["id"], item["result"]) for item in r.json()] == [
+        (1, "updated"), (2, "conflict"), (3, "not_found")
+    ]
+    assert r.json()[1]["detail"] == "Only PENDING claims can be CANCELED"
+    [[(filter_query, update)]] = writes
+    assert filter_query == {"_id": 1, "status": "PENDING"}
+    assert update["status"] == "CANCELED" and update["status_changed_at"]
+
+
+@pytest.mark.asyncio
+async def test_batch_update_claim_status_finalized_high(monkeypatch):
+    damage_queries = []
+
+    async def mock_find_many(collection, filter_query, projection=None):
+        if collection == "claims":
+            return [
+                {"_id": 1, "status": "IN_REVIEW", "description": "Short"},
+                {
+                    "_id": 2,
+                    "status": "IN_REVIEW",
+                    "description": "Long description " * 10,
+                },
+                {"_id": 3, "status": "IN_REVIEW", "description": "Short"},
+            ]
+        damage_queries.append(filter_query)
+        return [{"_id": 10, "claim_id": 1}, {"_id": 11, "claim_id": 2}]
+
+    async def mock_bulk_update(collection, updates):
+        return len(updates)
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(claims_module, "bulk_update", mock_bulk_update)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/claims:batchUpdateStatus",
+                              json={"ids": [1, 2, 3], "status": "FINALIZED"})
+
+    assert [item["result"] for item in r.json()] == ["conflict", "updated", "updated"]
+    assert damage_queries == [
+        {
+            "claim_id": {"$in": [1, 2, 3]},
+            "severity": "HIGH",
+            "deleted_at": {"$type": "null"},
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_update_claim_status_concurrent_change(monkeypatch):
+    reads = []
+
+    async def mock_find_many(collection, filter_query, projection=None):
+        reads.append(projection)
+        if len(reads) == 1:
+            return [{"_id": 1, "status": "PENDING"}, {"_id": 2, "status": "PENDING"}]
+        # Claim 2 was canceled between the precondition read and the write
+        return [{"_id": 1, "status": "IN_REVIEW"}, {"_id": 2, "status": "CANCELED"}]
+
+    async def mock_bulk_update(collection, updates):
+        return 1
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(claims_module, "bulk_update", mock_bulk_update)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/claims:batchUpdateStatus",
+                              json={"ids": [1, 2], "status": "IN_REVIEW"})
+
+    assert [item["result"] for item in r.json()] == ["updated", "conflict"]
+    assert r.json()[1]["detail"] == "Claim status changed concurrently"
+
+
+@pytest.mark.asyncio
+async def test_batch_update_claim_status_repeated_ids(monkeypatch):
+    """Test repeated ids get one entry each, matched by id after a concurrent change"""
+    reads, writes = [], []
+
+    async def mock_find_many(collection, filter_query, projection=None):
+        reads.append(filter_query)
+        if len(reads) == 1:
+            return [{"_id": 1, "status": "PENDING"}, {"_id": 2, "status": "PENDING"},
+                    {"_id": 3, "status": "PENDING"}]
+        # Claim 2 was canceled and claim 3 deleted after the precondition read
+        return [{"_id": 2, "status": "CANCELED"}, {"_id": 1, "status": "IN_REVIEW"}]
+
+    async def mock_bulk_update(collection, updates):
+        writes.append(updates)
+        return 1
+
+    monkeypatch.setattr(claims_module, "find_many", mock_find_many)
+    monkeypatch.setattr(claims_module, "bulk_update", mock_bulk_update)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/claims:batchUpdateStatus",
+                              json={"ids": [2, 1, 3, 2, 1], "status": "IN_REVIEW"})
+
+    assert [(item["id"], item["result"]) for item in r.json()] == [
+        (2, "conflict"),
+        (1, "updated"),
+        (3, "not_found"),
+        (2, "conflict"),
+        (1, "updated"),
+    ]
+    assert sorted(f["_id"] for f, _ in writes[0]) == [
+        1,
+        2,
+        3,
+    ]  # each claim written once
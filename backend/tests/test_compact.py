@@ -0,0 +1,92 @@
+import tracemalloc
+from decimal import Decimal
+
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+
+from app.core.compact import CompactClaim, CompactDamage, DamageTable, document_cents
+from app.core.documents import damage_from_document
+from app.schemas.models import Claim, Damage
+
+DAMAGE = Damage(
+    id=7,
+    claim_id=1,
+    part="Bumper",
+    severity="HIGH",
+    image_url="http://img.jpg",
+    price="100.5",
+    score=5,
+)
+
+
+def test_document_cents():
+    """Test stored prices (Int64 cents, or Decimal128 before migrating) load as cents"""
+    docs = [{"price": Int64(10050)}, {"price": Decimal128("0.07")}, {}]
+    assert [document_cents(d) for d in docs] == [10050, 7, 0]
+
+
+def test_round_trip_through_api_schemas():
+    """Test compact claims convert from and to the API models unchanged"""
+    claim = Claim(id=1, title="Claim", status="IN_REVIEW", damages=[DAMAGE])
+
+    compact = CompactClaim.from_model(claim)
+
+    assert (compact.status, compact.damages[0].severity, compact.total_cents) == (
+        1,
+        2,
+        10050,
+    )
+    assert compact.to_model() == claim
+    assert compact.to_model().total_amount == Decimal("100.50")
+
+
+def test_from_documents():
+    """Test collection or embedded documents (Decimal128 prices too) load compactly"""
+    doc = {"_id": 7, "claim_id": 1, "part": "Bumper", "severity": "HIGH",
+           "image_url": "http://img.jpg", "price": Decimal128("100.50"), "score": 5}
+    item = {"id": 7, **{k: v for k, v in doc.items() if k not in ("_id", "claim_id")}}
+
+    damage = CompactDamage.from_document(doc)
+    claim = CompactClaim.from_document(
+        {"_id": 1, "title": "Claim", "status": "IN_REVIEW"}, [damage]
+    )
+
+    assert damage == CompactDamage.from_document(item, claim_id=1)
+    assert damage.to_model() == DAMAGE
+    assert claim.to_model().damages == [DAMAGE]
+
+
+def test_damage_table():
+    """Test the struct-of-arrays table keeps rows in a fraction of the models' memory"""
+    count = 3_000
+    items = [
+        {
+            "id": i,
+            "part": "Bumper",
+            "severity": "MEDIUM",
+            "image_url": f"http://img/{i}.jpg",
+            "price": Decimal128("250.00"),
+            "score": 3,
+        }
+        for i in range(count)
+    ]
+
+    tracemalloc.start()
+    models = [
+        damage_from_document(item, claim_id=i // 3) for i, item in enumerate(items)
+    ]
+    models_size = tracemalloc.get_traced_memory()[0]
+    del models
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    table = DamageTable()
+    for i, item in enumerate(items):
+        table.add_document(item, claim_id=i // 3)
+    table_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(table) == count
+    assert table[5] == CompactDamage(5, 1, "Bumper", 1, "http://img/5.jpg", 25000, 3)
+    assert [d.id for d in table][-1] == count - 1
+    assert models_size > 5 * table_size
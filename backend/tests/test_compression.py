@@ -0,0 +1,141 @@
+import gzip
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.compression import CompressionMiddleware, choose_encoding, compressible
+import app.core.compression as compression_module
+
+
+needs_brotli = pytest.mark.skipif(
+    compression_module.brotli is None, reason="Brotli not installed"
+)
+
+BIG = [
+    {"part": "Bumper", "image_url": f"https://images.example.com/damages/{i}.jpg"}
+    for i in range(200)
+]
+
+
+@pytest.fixture
+def client():
+    test_app = FastAPI()
+    test_app.add_middleware(CompressionMiddleware, minimum_size=500,
+                            content_types=["application/json", "text/"])
+
+    @test_app.get("/big")
+    async def big():
+        return BIG
+
+    @test_app.get("/small")
+    async def small():
+        return {"status": "healthy"}
+
+    @test_app.get("/image")
+    async def image():
+        return Response(b"\xff\xd8" * 1000, media_type="image/jpeg")
+
+    @test_app.get("/stream")
+    async def stream():
+        async def rows():
+            for i in range(100):
+                yield f"{i},Bumper,https://images.example.com/damages/{i}.jpg\n"
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    transport = httpx.ASGITransport(app=test_app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@needs_brotli
+def test_choose_encoding():
+    """Test Brotli is preferred and q=0 disables an encoding"""
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("") is None
+
+
+def test_choose_encoding_without_brotli(monkeypatch):
+    """Test gzip is used when Brotli is not installed"""
+    monkeypatch.setattr(compression_module, "brotli", None)
+    assert choose_encoding("br, gzip") == "gzip"
+    assert choose_encoding("br") is None
+
+
+def test_compressible():
+    """Test the content-type allowlist"""
+    allowed = ["application/json", "text/"]
+    assert compressible("application/json", allowed)
+    assert compressible("text/csv; charset=utf-8", allowed)
+    assert not compressible("image/jpeg", allowed)
+    assert not compressible("application/jsonx", allowed)
+
+
+@pytest.mark.asyncio
+async def test_gzip_large_json(client):
+    """Test large JSON bodies are gzipped with a correct Content-Length"""
+    async with client:
+        r = await client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.json() == BIG  # httpx decodes transparently
+    assert int(r.headers["content-length"]) < len(json.dumps(BIG)) / 4
+
+
+@needs_brotli
+@pytest.mark.asyncio
+async def test_brotli_large_json(client):
+    """Test Brotli is used when the client accepts it"""
+    async with client:
+        r = await client.get("/big", headers={"Accept-Encoding": "br, gzip"})
+
+    assert r.headers["content-encoding"] == "br"
+    assert r.json() == BIG
+
+
+@pytest.mark.asyncio
+async def test_small_and_disallowed_not_compressed(client):
+    """Test bodies under the threshold and non-allowlisted types pass through"""
+    async with client:
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        image = await client.get("/image", headers={"Accept-Encoding": "gzip"})
+        plain = await client.get("/big", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in image.headers
+    assert len(image.content) == 2000
+    assert "content-encoding" not in plain.headers
+
+
+@pytest.mark.asyncio
+async def test_streaming_response(client):
+    """Test streamed bodies are compressed incrementally without Content-Length"""
+    async with client:
+        async with client.stream(
+            "GET", "/stream", headers={"Accept-Encoding": "gzip"}
+        ) as r:
+            raw = b"".join([chunk async for chunk in r.aiter_raw()])
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert len(lines) == 100 and lines[0].startswith("0,Bumper")
+
+
+@needs_brotli
+@pytest.mark.asyncio
+async def test_streaming_brotli(client):
+    """Test streamed bodies with Brotli decode to the full payload"""
+    async with client:
+        async with client.stream(
+            "GET", "/stream", headers={"Accept-Encoding": "br"}
+        ) as r:
+            raw = b"".join([chunk async for chunk in r.aiter_raw()])
+
+    assert r.headers["content-encoding"] == "br"
+    assert len(compression_module.brotli.decompress(raw).decode().splitlines()) == 100
@@ -3,11 +3,31 @@ import httpx
 
 from app.main import app
 import app.api.routes.damages as damages_module
+import app.core.deadline as deadline_module
+import app.core.embedded as embedded_module
+from app.core.deadline import DeadlineExceeded
+
+
+PENDING_CLAIM = {"_id": 1, "title": "Claim 1", "status": "PENDING"}
+DAMAGE_DOC = {"_id": 1, "claim_id": 1, "part": "Bumper", "severity": "LOW",
+              "image_url": "http://img.jpg", "price": 100.0, "score": 5}
+
+
+async def mock_next_sequence(*args, **kwargs):
+    return 1
+
+
+async def mock_schedule_image_check(*args, **kwargs):
+    return "job"
+
+
+async def mock_schedule_refresh(*args, **kwargs):
+    return "job"
 
 
 @pytest.mark.asyncio
 async def test_get_damages_empty(monkeypatch):
-    def mock_execute_query(*args, **kwargs):
+    async def mock_execute_query(*args, **kwargs):
         return []
 
     monkeypatch.setattr(damages_module, "execute_query", mock_execute_query)
@@ -22,10 +42,26 @@ async def test_get_damages_empty(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_get_damages_with_data(monkeypatch):
-    def mock_execute_query(*args, **kwargs):
+    async def mock_execute_query(*args, **kwargs):
         return [
-            (1, "Bumper", "LOW", "http://img.jpg", 100.0, 5, 1),
-            (2, "Door", "HIGH", "http://img2.jpg", 500.0, 9, 1),
+            {
+                "_id": 1,
+                "part": "Bumper",
+                "severity": "LOW",
+                "image_url": "http://img.jpg",
+                "price": 100.0,
+                "score": 5,
+                "claim_id": 1,
+            },
+            {
+                "_id": 2,
+                "part": "Door",
+                "severity": "HIGH",
+                "image_url": "http://img2.jpg",
+                "price": 500.0,
+                "score": 9,
+                "claim_id": 1,
+            },
         ]
 
     monkeypatch.setattr(damages_module, "execute_query", mock_execute_query)
@@ -38,17 +74,73 @@ async def test_get_damages_with_data(monkeypatch):
     assert len(r.json()) == 2
 
 
+@pytest.mark.asyncio
+async def test_get_damages_sparse_fields(monkeypatch):
+
+    async def mock_find_many(
+        collection, filter_query, projection=None, read_method=None
+    ):
+        assert collection == "damages"
+        assert read_method == "damages.list"
+        assert projection == {"part": 1, "price": 1}
+        return [{"_id": 1, "part": "Bumper", "price": 100.0}]
+
+    monkeypatch.setattr(damages_module, "find_many", mock_find_many)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/damages/?fields=part,price")
+
+    assert r.status_code == 200
+    assert r.json() == [{"part": "Bumper", "price": "100.00"}]
+
+
+@pytest.mark.asyncio
+async def test_get_damages_sparse_fields_embedded(monkeypatch):
+    calls = []
+
+    async def mock_find_many(
+        collection, filter_query, projection=None, read_method=None
+    ):
+        calls.append((collection, projection))
+        if collection == "claims":
+            return [{"_id": 1, "damages": [{"id": 2, "part": "Door"}]}]
+        return [{"_id": 1, "claim_id": 1, "part": "Bumper"}]
+
+    monkeypatch.setattr(embedded_module.settings, "DAMAGES_STORAGE", "embedded")
+    monkeypatch.setattr(embedded_module, "find_many", mock_find_many)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/damages/?fields=claim_id,part")
+
+    assert r.status_code == 200
+    assert r.json() == [
+        {"claim_id": 1, "part": "Bumper"},
+        {"claim_id": 1, "part": "Door"},
+    ]
+    assert calls[0] == (
+        "claims",
+        {"damages.id": 1, "damages.part": 1, "damages.deleted_at": 1},
+    )
+    assert calls[1][1] == {"_id": 1, "claim_id": 1, "part": 1}
+
+
 @pytest.mark.asyncio
 async def test_create_damage_success(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        query = args[0] if args else ""
-        if "SELECT id, status FROM claims" in query:
-            return (1, "PENDING")
-        elif "INSERT INTO damages" in query:
-            return (1,)
-        return None
+    async def mock_execute_one(collection, filter_query):
+        return {"_id": 1, "title": "Claim 1", "status": "PENDING"}
+
+    async def mock_insert_one(*args, **kwargs):
+        return "1"
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(damages_module, "next_sequence", mock_next_sequence)
+    monkeypatch.setattr(damages_module, "insert_one", mock_insert_one)
+    monkeypatch.setattr(
+        damages_module, "schedule_image_check", mock_schedule_image_check
+    )
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
 
     payload = {
         "part": "Bumper",
@@ -66,9 +158,28 @@ async def test_create_damage_success(monkeypatch):
     assert r.json()["part"] == "Bumper"
 
 
+@pytest.mark.asyncio
+async def test_create_damage_invalid_price():
+    """Test a price that is not an amount is a 422, not a server error"""
+    payload = {
+        "part": "Bumper",
+        "severity": "LOW",
+        "image_url": "http://img.jpg",
+        "price": "abc",
+        "score": 5,
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/damages/?claim_id=1", json=payload)
+
+    assert r.status_code == 422
+    assert r.json()["detail"][0]["loc"] == ["body", "price"]
+
+
 @pytest.mark.asyncio
 async def test_create_damage_claim_not_found(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
+    async def mock_execute_one(*args, **kwargs):
         return None
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
@@ -90,8 +201,8 @@ async def test_create_damage_claim_not_found(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_create_damage_claim_not_pending(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        return (1, "FINALIZED")
+    async def mock_execute_one(*args, **kwargs):
+        return {"_id": 1, "title": "Claim 1", "status": "FINALIZED"}
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
 
@@ -112,15 +223,18 @@ async def test_create_damage_claim_not_pending(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_update_damage_success(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        query = args[0] if args else ""
-        if "SELECT d.claim_id, c.status" in query:
-            return (1, "PENDING")
-        elif "UPDATE damages" in query:
-            return (1,)
-        return None
+    async def mock_execute_one(collection, filter_query):
+        return DAMAGE_DOC if collection == "damages" else PENDING_CLAIM
+
+    async def mock_update_one_matched(*args, **kwargs):
+        return 1
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(embedded_module, "update_one_matched", mock_update_one_matched)
+    monkeypatch.setattr(
+        damages_module, "schedule_image_check", mock_schedule_image_check
+    )
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
 
     payload = {
         "part": "Updated Bumper",
@@ -140,7 +254,7 @@ async def test_update_damage_success(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_update_damage_not_found(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
+    async def mock_execute_one(*args, **kwargs):
         return None
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
@@ -162,8 +276,12 @@ async def test_update_damage_not_found(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_update_damage_claim_not_pending(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        return (1, "IN_REVIEW")
+    async def mock_execute_one(*args, **kwargs):
+        return (
+            DAMAGE_DOC
+            if args[0] == "damages"
+            else {**PENDING_CLAIM, "status": "IN_REVIEW"}
+        )
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
 
@@ -184,15 +302,15 @@ async def test_update_damage_claim_not_pending(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_delete_damage_success(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        query = args[0] if args else ""
-        if "SELECT d.claim_id, c.status" in query:
-            return (1, "PENDING")
-        elif "DELETE FROM damages" in query:
-            return (1,)
-        return None
+    async def mock_execute_one(collection, filter_query):
+        return DAMAGE_DOC if collection == "damages" else PENDING_CLAIM
+
+    async def mock_update_one_matched(*args, **kwargs):
+        return 1
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(embedded_module, "update_one_matched", mock_update_one_matched)
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
@@ -201,9 +319,59 @@ async def test_delete_damage_success(monkeypatch):
     assert r.status_code == 204
 
 
+@pytest.mark.asyncio
+async def test_restore_damage(monkeypatch):
+    """Test a soft-deleted damage can be restored while its claim is PENDING"""
+    updates = []
+    refreshed = []
+
+    async def mock_execute_one(collection, filter_query):
+        return (
+            {**DAMAGE_DOC, "deleted_at": "2024-01-01"}
+            if collection == "damages"
+            else PENDING_CLAIM
+        )
+
+    async def mock_update_one_matched(collection, filter_query, update_data):
+        updates.append((collection, filter_query, update_data))
+        return 1
+
+    async def mock_refresh(claim_id):
+        refreshed.append(claim_id)
+        return "job"
+
+    monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(embedded_module, "update_one_matched", mock_update_one_matched)
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_refresh)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/damages/1/restore")
+
+    assert r.status_code == 200
+    assert r.json()["id"] == 1
+    assert updates == [("damages", {"_id": 1}, {"deleted_at": None})]
+    assert refreshed == [1]
+
+
+@pytest.mark.asyncio
+async def test_restore_live_damage_not_found(monkeypatch):
+    """Test a damage that is not deleted cannot be restored"""
+    async def mock_execute_one(collection, filter_query):
+        return DAMAGE_DOC if collection == "damages" else PENDING_CLAIM
+
+    monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/damages/1/restore")
+
+    assert r.status_code == 404
+
+
 @pytest.mark.asyncio
 async def test_delete_damage_not_found(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
+    async def mock_execute_one(*args, **kwargs):
         return None
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
@@ -217,8 +385,12 @@ async def test_delete_damage_not_found(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_delete_damage_claim_not_pending(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        return (1, "CANCELED")
+    async def mock_execute_one(*args, **kwargs):
+        return (
+            DAMAGE_DOC
+            if args[0] == "damages"
+            else {**PENDING_CLAIM, "status": "CANCELED"}
+        )
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
 
@@ -231,13 +403,19 @@ async def test_delete_damage_claim_not_pending(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_create_damage_error(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        query = args[0] if args else ""
-        if "SELECT id, status FROM claims" in query:
-            return (1, "PENDING")
+    async def mock_execute_one(collection, filter_query):
+        return PENDING_CLAIM
+
+    async def mock_insert_one(*args, **kwargs):
         return None
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(damages_module, "next_sequence", mock_next_sequence)
+    monkeypatch.setattr(damages_module, "insert_one", mock_insert_one)
+    monkeypatch.setattr(
+        damages_module, "schedule_image_check", mock_schedule_image_check
+    )
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
 
     payload = {
         "part": "Bumper",
@@ -256,13 +434,18 @@ async def test_create_damage_error(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_update_damage_error(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        query = args[0] if args else ""
-        if "SELECT d.claim_id, c.status" in query:
-            return (1, "PENDING")
-        return None
+    async def mock_execute_one(collection, filter_query):
+        return DAMAGE_DOC if collection == "damages" else PENDING_CLAIM
+
+    async def mock_update_one_matched(*args, **kwargs):
+        return 0
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(embedded_module, "update_one_matched", mock_update_one_matched)
+    monkeypatch.setattr(
+        damages_module, "schedule_image_check", mock_schedule_image_check
+    )
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
 
     payload = {
         "part": "Bumper",
@@ -281,16 +464,63 @@ async def test_update_damage_error(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_delete_damage_error(monkeypatch):
-    def mock_execute_one(*args, **kwargs):
-        query = args[0] if args else ""
-        if "SELECT d.claim_id, c.status" in query:
-            return (1, "PENDING")
-        return None
+    async def mock_execute_one(collection, filter_query):
+        return DAMAGE_DOC if collection == "damages" else PENDING_CLAIM
+
+    async def mock_update_one_matched(*args, **kwargs):
+        return 0
 
     monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(embedded_module, "update_one_matched", mock_update_one_matched)
+    monkeypatch.setattr(
+        damages_module, "schedule_image_check", mock_schedule_image_check
+    )
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
         r = await client.delete("/api/v1/damages/1")
 
     assert r.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_create_damage_deadline_still_schedules_jobs(monkeypatch):
+    """Test a write past the deadline (maybe applied) still queues its follow-up jobs"""
+    scheduled = []
+
+    async def mock_execute_one(collection, filter_query):
+        return PENDING_CLAIM
+
+    async def mock_insert_one(*args, **kwargs):
+        raise DeadlineExceeded()
+
+    async def mock_schedule_refresh(claim_id):
+        scheduled.append(("refresh", claim_id, deadline_module.remaining()))
+
+    async def mock_schedule_image_check(damage_id, image_url):
+        scheduled.append(("image", damage_id, deadline_module.remaining()))
+
+    monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(damages_module, "next_sequence", mock_next_sequence)
+    monkeypatch.setattr(damages_module, "insert_one", mock_insert_one)
+    monkeypatch.setattr(
+        damages_module, "schedule_image_check", mock_schedule_image_check
+    )
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
+
+    payload = {
+        "part": "Bumper",
+        "severity": "LOW",
+        "image_url": "http://img.jpg",
+        "price": 100.0,
+        "score": 5,
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/damages/?claim_id=1", json=payload)
+
+    assert r.status_code == 504
+    # Queued outside the request deadline
+    assert scheduled == [("refresh", 1, None), ("image", 1, None)]
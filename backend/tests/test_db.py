@@ -1,13 +1,15 @@
+import asyncio
+
 import pytest
+from pymongo.read_preferences import Primary, Secondary, SecondaryPreferred
 from unittest.mock import Mock, MagicMock, AsyncMock, patch
+from app.core.config import settings
 from app.core.db import (
-    MongoDB, mongodb, get_database, get_collection,
-    connect_to_mongo, close_mongo_connection,
-    execute_query, execute_one,
-    insert_one, insert_many,
-    find_one, find_many,
-    update_one, update_many,
-    delete_one, delete_many
+    MongoDB, mongodb, get_database, get_collection, read_preference, connect_to_mongo,
+    close_mongo_connection, ensure_indexes, execute_query, execute_one, insert_one,
+    insert_many, find_one, find_many, update_one, update_many, delete_one, delete_many,
+    update_one_matched, push_one, pull_one, unset_one, next_sequence, reserve_sequence,
+    bulk_update, replace_many
 )
 
 
@@ -37,6 +39,65 @@ def test_get_collection(mock_db):
     assert result == mock_collection
 
 
+def test_get_collection_lag_tolerant_read(mock_db, monkeypatch):
+    """Test lag-tolerant reads use SECONDARY_READ_PREFERENCE with bounded staleness"""
+    monkeypatch.setattr(settings, "SECONDARY_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(settings, "SECONDARY_MAX_STALENESS_SECONDS", 120)
+    mock_collection = Mock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    assert get_collection("claims") is mock_collection
+    get_collection("claims", "claims.list")
+
+    preference = mock_collection.with_options.call_args.kwargs["read_preference"]
+    assert preference == SecondaryPreferred(max_staleness=120)
+
+
+def test_get_collection_lag_tolerant_read_on_primary(mock_db):
+    """Test the default configuration keeps every read on the primary"""
+    mock_collection = Mock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    assert get_collection("claims", "claims.list") is mock_collection
+    mock_collection.with_options.assert_not_called()
+
+
+def test_read_preference_per_method(monkeypatch):
+    """Test READ_PREFERENCES overrides SECONDARY_READ_PREFERENCE for its methods"""
+    monkeypatch.setattr(settings, "SECONDARY_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(
+        settings,
+        "READ_PREFERENCES",
+        {"claims.export": "secondary", "claims.duplicates": "primary"},
+    )
+
+    assert read_preference("claims.export") == Secondary()
+    assert read_preference("claims.duplicates") == Primary()
+    assert read_preference("claims.list") == SecondaryPreferred()
+    assert read_preference() == Primary()
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_after_ttl_change(memory_db, monkeypatch):
+    """Test a changed TTL setting updates the index (collMod) instead of failing"""
+    monkeypatch.setattr(settings, "IDEMPOTENCY_TTL_SECONDS", 3600)
+    monkeypatch.setattr(settings, "JOB_RETENTION_SECONDS", 60)
+    monkeypatch.setattr(settings, "DAMAGES_PURGE_AFTER_DAYS", 7)
+
+    await ensure_indexes()
+
+    assert (await memory_db["idempotency_keys"].index_information())["created_at_1"][
+        "expireAfterSeconds"
+    ] == 3600
+    jobs_ttl = (await memory_db["jobs"].index_information())["finished_at_1"]
+    assert jobs_ttl["expireAfterSeconds"] == 60
+    assert jobs_ttl["partialFilterExpression"] == {
+        "status": {"$in": ["done", "failed"]}
+    }
+    damages_ttl = (await memory_db["damages"].index_information())["deleted_at_1"]
+    assert damages_ttl["expireAfterSeconds"] == 7 * 24 * 60 * 60
+
+
 @pytest.mark.asyncio
 async def test_connect_to_mongo(capsys):
     """Test MongoDB connection"""
@@ -207,6 +268,47 @@ async def test_find_many_no_filter(mock_db):
     assert result == []
 
 
+@pytest.mark.asyncio
+async def test_find_many_with_projection(mock_db):
+    """Test find_many passes the projection to the cursor"""
+    mock_collection = Mock()
+    mock_cursor = Mock()
+    mock_cursor.to_list = AsyncMock(return_value=[{"_id": 1, "title": "A"}])
+    mock_collection.find.return_value = mock_cursor
+    mock_db.__getitem__.return_value = mock_collection
+    
+    result = await find_many("claims", {}, projection={"title": 1})
+    
+    mock_collection.find.assert_called_once_with({}, {"title": 1})
+    assert result == [{"_id": 1, "title": "A"}]
+
+
+@pytest.mark.asyncio
+async def test_find_many_secondary_not_shared_with_primary(mock_db, monkeypatch):
+    """Test a primary read never reuses an in-flight secondary read"""
+    monkeypatch.setattr(settings, "SECONDARY_READ_PREFERENCE", "secondary")
+    primary, secondary = Mock(), Mock()
+    # The secondary still has the state from before the last write
+    replies = [
+        (primary, [{"_id": 1, "status": "IN_REVIEW"}]),
+        (secondary, [{"_id": 1, "status": "PENDING"}]),
+    ]
+    for coll, docs in replies:
+        cursor = Mock()
+        cursor.to_list = AsyncMock(return_value=docs)
+        coll.find.return_value = cursor
+    primary.with_options.return_value = secondary
+    mock_db.__getitem__.return_value = primary
+
+    stale, fresh = await asyncio.gather(
+        find_many("claims", {"_id": 1}, read_method="claims.list"),
+        find_many("claims", {"_id": 1}),
+    )
+
+    assert stale[0]["status"] == "PENDING"
+    assert fresh[0]["status"] == "IN_REVIEW"
+
+
 @pytest.mark.asyncio
 async def test_update_one(mock_db):
     """Test update_one returns modified count"""
@@ -265,3 +367,139 @@ async def test_delete_many(mock_db):
     
     mock_collection.delete_many.assert_called_once_with({"status": "inactive"})
     assert result == 5
+
+
+@pytest.mark.asyncio
+async def test_update_one_matched(mock_db):
+    """Test update_one_matched returns matched count"""
+    mock_collection = Mock()
+    mock_result = Mock()
+    mock_result.matched_count = 1
+    mock_collection.update_one = AsyncMock(return_value=mock_result)
+    mock_db.__getitem__.return_value = mock_collection
+
+    result = await update_one_matched("test_collection", {"id": 1}, {"name": "same"})
+
+    mock_collection.update_one.assert_called_once_with(
+        {"id": 1}, {"$set": {"name": "same"}}
+    )
+    assert result == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_update(mock_db):
+    """Test bulk_update sends every update in one unordered bulk_write"""
+    mock_collection = Mock()
+    mock_result = Mock()
+    mock_result.matched_count = 2
+    mock_collection.bulk_write = AsyncMock(return_value=mock_result)
+    mock_db.__getitem__.return_value = mock_collection
+
+    result = await bulk_update("claims", [
+        ({"_id": 1, "status": "PENDING"}, {"status": "IN_REVIEW"}),
+        ({"_id": 2, "status": "PENDING"}, {"status": "IN_REVIEW"}),
+    ])
+
+    operations = mock_collection.bulk_write.call_args.args[0]
+    assert [op._filter for op in operations] == [
+        {"_id": 1, "status": "PENDING"},
+        {"_id": 2, "status": "PENDING"},
+    ]
+    assert operations[0]._doc == {"$set": {"status": "IN_REVIEW"}}
+    assert mock_collection.bulk_write.call_args.kwargs == {"ordered": False}
+    assert result == 2
+
+
+@pytest.mark.asyncio
+async def test_replace_many(mock_db):
+    """Test replace_many upserts every document by _id in one bulk_write"""
+    mock_collection = Mock()
+    mock_result = Mock()
+    mock_result.upserted_count = 1
+    mock_result.matched_count = 1
+    mock_collection.bulk_write = AsyncMock(return_value=mock_result)
+    mock_db.__getitem__.return_value = mock_collection
+
+    result = await replace_many(
+        "claims_archive", [{"_id": 1, "title": "A"}, {"_id": 2, "title": "B"}]
+    )
+
+    operations = mock_collection.bulk_write.call_args.args[0]
+    assert [op._filter for op in operations] == [{"_id": 1}, {"_id": 2}]
+    assert all(op._upsert for op in operations)
+    assert result == 2
+
+
+@pytest.mark.asyncio
+async def test_push_and_pull_one(mock_db):
+    """Test push_one/pull_one use array operators"""
+    mock_collection = Mock()
+    mock_result = Mock()
+    mock_result.modified_count = 1
+    mock_collection.update_one = AsyncMock(return_value=mock_result)
+    mock_db.__getitem__.return_value = mock_collection
+
+    assert await push_one("claims", {"_id": 1}, "damages", {"id": 7}) == 1
+    assert await pull_one("claims", {"_id": 1}, "damages", {"id": 7}) == 1
+
+    assert mock_collection.update_one.call_args_list[0].args == (
+        {"_id": 1},
+        {"$push": {"damages": {"id": 7}}},
+    )
+    assert mock_collection.update_one.call_args_list[1].args == (
+        {"_id": 1},
+        {"$pull": {"damages": {"id": 7}}},
+    )
+
+
+@pytest.mark.asyncio
+async def test_unset_one(mock_db):
+    """Test unset_one removes fields"""
+    mock_collection = Mock()
+    mock_result = Mock()
+    mock_result.modified_count = 1
+    mock_collection.update_one = AsyncMock(return_value=mock_result)
+    mock_db.__getitem__.return_value = mock_collection
+
+    await unset_one("claims", {"_id": 1}, ["damages"])
+
+    mock_collection.update_one.assert_called_once_with(
+        {"_id": 1}, {"$unset": {"damages": ""}}
+    )
+
+
+@pytest.mark.asyncio
+async def test_next_sequence(mock_db):
+    """Test next_sequence increments a counter document"""
+    mock_collection = Mock()
+    mock_collection.find_one_and_update = AsyncMock(
+        return_value={"_id": "claims", "seq": 42}
+    )
+    mock_db.__getitem__.return_value = mock_collection
+
+    result = await next_sequence("claims")
+
+    mock_db.__getitem__.assert_called_with("counters")
+    assert mock_collection.find_one_and_update.call_args.args == (
+        {"_id": "claims"},
+        {"$inc": {"seq": 1}},
+    )
+    assert result == 42
+
+
+@pytest.mark.asyncio
+async def test_reserve_sequence(mock_db):
+    """Test reserve_sequence takes a block of IDs in one update and returns its first"""
+    mock_collection = Mock()
+    mock_collection.find_one_and_update = AsyncMock(
+        return_value={"_id": "claims", "seq": 1042}
+    )
+    mock_db.__getitem__.return_value = mock_collection
+
+    result = await reserve_sequence("claims", 1000)
+
+    assert mock_collection.find_one_and_update.call_args.args == (
+        {"_id": "claims"},
+        {"$inc": {"seq": 1000}},
+    )
+    assert result == 43
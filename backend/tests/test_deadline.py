@@ -0,0 +1,202 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, Mock
+
+import httpx
+import pytest
+from pymongo import _csot
+from pymongo.errors import ExecutionTimeout
+
+import app.api.routes.claims as claims_module
+import app.core.deadline as deadline_module
+from app.core.config import settings
+from app.core.db import find_batches, find_one, mongodb
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware, bounded, timeout_for
+from app.main import app
+
+
+def test_timeout_for(monkeypatch):
+    """Test per-route deadlines fall back to REQUEST_TIMEOUT"""
+    monkeypatch.setattr(settings, "REQUEST_TIMEOUT", 5.0)
+    monkeypatch.setattr(settings, "ROUTE_TIMEOUTS", {"GET /api/v1/exports/*": 300.0})
+
+    assert timeout_for("GET", "/api/v1/exports/claims.parquet") == 300.0
+    assert timeout_for("GET", "/api/v1/claims/1") == 5.0
+
+
+@pytest.mark.asyncio
+async def test_bounded_without_deadline():
+    """Test operations outside requests run unbounded"""
+    async def operation():
+        return _csot.get_timeout()
+
+    assert await bounded(operation()) is None
+
+
+@pytest.mark.asyncio
+async def test_bounded_sets_pymongo_timeout():
+    """Test the remaining time reaches pymongo (sent as maxTimeMS)"""
+    # Each test runs in its own task context, so the deadline does not leak
+    deadline_module.set_deadline(5)
+
+    async def operation():
+        return _csot.get_timeout()
+
+    assert 4 < await bounded(operation()) <= 5
+
+
+@pytest.mark.asyncio
+async def test_bounded_times_out():
+    """Test a slow operation is abandoned at the deadline"""
+    deadline_module.set_deadline(0.05)
+    before = deadline_module.stats["timed_out"]
+
+    with pytest.raises(DeadlineExceeded):
+        await bounded(asyncio.sleep(1))
+    assert deadline_module.stats["timed_out"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_bounded_server_timeout():
+    """Test a maxTimeMS error from MongoDB becomes DeadlineExceeded"""
+    deadline_module.set_deadline(5)
+
+    async def operation():
+        raise ExecutionTimeout("operation exceeded time limit", 50)
+
+    with pytest.raises(DeadlineExceeded):
+        await bounded(operation())
+
+
+@pytest.mark.asyncio
+async def test_db_helpers_are_bounded():
+    """Test db helpers stop waiting once the request deadline passes"""
+    async def slow_find_one(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    mongodb.db = MagicMock()
+    collection = Mock()
+    collection.find_one = slow_find_one
+    mongodb.db.__getitem__.return_value = collection
+    deadline_module.set_deadline(0.05)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await find_one("claims", {"_id": 1})
+    finally:
+        mongodb.db = None
+
+
+@pytest.mark.asyncio
+async def test_find_batches_is_bounded():
+    """Test each batch is fetched under the deadline; an expired one is not fetched"""
+    timeouts = []
+
+    def to_list(length):
+        # Motor returns a Future that is already running
+        timeouts.append(_csot.get_timeout())
+        future = asyncio.get_running_loop().create_future()
+        future.set_result([{"_id": 1}] if len(timeouts) == 1 else [])
+        return future
+
+    cursor = MagicMock()
+    cursor.sort.return_value.batch_size.return_value = cursor
+    cursor.to_list = to_list
+    cursor.close = AsyncMock()
+    mongodb.db = MagicMock()
+    mongodb.db.__getitem__.return_value.find.return_value = cursor
+    try:
+        deadline_module.set_deadline(5)
+        assert [batch async for batch in find_batches("claims", {}, batch_size=10)] == [
+            [{"_id": 1}]
+        ]
+        assert len(timeouts) == 2 and all(4 < t <= 5 for t in timeouts)
+
+        deadline_module.set_deadline(-1)
+        with pytest.raises(DeadlineExceeded):
+            [batch async for batch in find_batches("claims", {}, batch_size=10)]
+        assert len(timeouts) == 2
+        cursor.close.assert_awaited()
+    finally:
+        mongodb.db = None
+
+
+@pytest.mark.asyncio
+async def test_deadline_exceeded_is_504(monkeypatch):
+    """Test the API answers 504 when a query exceeds the deadline"""
+    async def mock_execute_one(*args, **kwargs):
+        raise DeadlineExceeded()
+
+    monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/claims/1")
+
+    assert r.status_code == 504
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_handler():
+    """Test a client disconnect cancels the in-flight handler"""
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        assert deadline_module.remaining() is not None
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def receive():
+        await started.wait()
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    before = deadline_module.stats["client_disconnects"]
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/claims/"}
+    await asyncio.wait_for(
+        DeadlineMiddleware(slow_app, prefix="/api/v1")(scope, receive, send), 1
+    )
+
+    assert cancelled.is_set()
+    assert sent == []
+    assert deadline_module.stats["client_disconnects"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_disconnect_lets_writes_finish():
+    """Test a client disconnect does not cancel a write, which may already be applied"""
+    started = asyncio.Event()
+    finished = asyncio.Event()
+
+    async def writing_app(scope, receive, send):
+        started.set()
+        await asyncio.sleep(0.05)
+        finished.set()
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        await started.wait()
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    before = deadline_module.stats["client_disconnects"]
+    scope = {"type": "http", "method": "POST", "path": "/api/v1/damages/"}
+    await asyncio.wait_for(
+        DeadlineMiddleware(writing_app, prefix="/api/v1")(scope, receive, send), 1
+    )
+
+    assert finished.is_set()
+    assert sent[0]["status"] == 201
+    assert deadline_module.stats["client_disconnects"] == before
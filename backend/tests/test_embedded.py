@@ -0,0 +1,266 @@
+from datetime import datetime
+
+import pytest
+import httpx
+
+from app.main import app
+from app.core.config import settings
+import app.core.embedded as embedded_module
+import app.api.routes.claims as claims_module
+import app.api.routes.damages as damages_module
+
+
+DAMAGE_ITEM = {
+    "id": 7,
+    "part": "Bumper",
+    "severity": "HIGH",
+    "image_url": "http://img.jpg",
+    "price": 100.0,
+    "score": 5,
+}
+
+
+async def mock_schedule_image_check(*args, **kwargs):
+    return "job"
+
+
+async def mock_schedule_refresh(*args, **kwargs):
+    return "job"
+
+
+@pytest.fixture
+def embedded_mode(monkeypatch):
+    monkeypatch.setattr(settings, "DAMAGES_STORAGE", "embedded")
+
+
+def test_fits_respects_size_guard(monkeypatch):
+    """Test fits compares the encoded claim + damage against the limit"""
+    claim_doc = {"_id": 1, "title": "Claim", "damages": []}
+    assert embedded_module.fits(claim_doc, DAMAGE_ITEM)
+
+    monkeypatch.setattr(settings, "EMBEDDED_DAMAGES_MAX_BYTES", 10)
+    assert not embedded_module.fits(claim_doc, DAMAGE_ITEM)
+
+
+@pytest.mark.asyncio
+async def test_load_damages_embedded_only(monkeypatch):
+    """Test embedded damages are read without extra queries"""
+    async def mock_find_many(*args, **kwargs):
+        raise AssertionError("no query expected")
+
+    monkeypatch.setattr(embedded_module, "find_many", mock_find_many)
+
+    damages = await embedded_module.load_damages({"_id": 1, "damages": [DAMAGE_ITEM]})
+
+    assert [d.id for d in damages] == [7]
+    assert damages[0].claim_id == 1
+
+
+@pytest.mark.asyncio
+async def test_load_damages_skips_deleted():
+    """Test soft-deleted embedded damages are not returned"""
+    deleted = {**DAMAGE_ITEM, "id": 8, "deleted_at": datetime(2024, 1, 1)}
+
+    damages = await embedded_module.load_damages(
+        {"_id": 1, "damages": [DAMAGE_ITEM, deleted]}
+    )
+
+    assert [d.id for d in damages] == [7]
+
+
+@pytest.mark.asyncio
+async def test_purge_deleted_damages(monkeypatch):
+    """Test the purge pulls expired deleted items from a batch of claims at a time"""
+    batches = [[{"_id": 1}, {"_id": 2}], [{"_id": 3}]]
+    pulls = []
+
+    async def mock_find_many(collection, filter_query, limit=0, projection=None):
+        assert filter_query["damages.deleted_at"]["$type"] == "date"
+        return batches.pop(0) if batches else []
+
+    async def mock_pull_many(collection, filter_query, field, condition):
+        pulls.append(filter_query["_id"]["$in"])
+        return len(filter_query["_id"]["$in"])
+
+    monkeypatch.setattr(embedded_module, "find_many", mock_find_many)
+    monkeypatch.setattr(embedded_module, "pull_many", mock_pull_many)
+
+    assert await embedded_module.purge_deleted_damages(batch_size=2) == 3
+    assert pulls == [[1, 2], [3]]
+
+
+@pytest.mark.asyncio
+async def test_load_damages_with_spill(monkeypatch):
+    """Test spilled damages are read from the damages collection"""
+    async def mock_find_many(collection, filter_query, read_method=None):
+        assert collection == "damages"
+        assert filter_query == {"claim_id": 1, "deleted_at": {"$type": "null"}}
+        return [{**DAMAGE_ITEM, "id": 8, "claim_id": 1}]
+
+    monkeypatch.setattr(embedded_module, "find_many", mock_find_many)
+
+    claim_doc = {"_id": 1, "damages": [DAMAGE_ITEM], "damages_spilled": True}
+    damages = await embedded_module.load_damages(claim_doc)
+
+    assert [d.id for d in damages] == [7, 8]
+
+
+@pytest.mark.asyncio
+async def test_add_damage_pushes_into_claim(monkeypatch):
+    """Test add_damage appends to the claim array while under the limit"""
+    calls = []
+
+    async def mock_push_one(collection, filter_query, field, value):
+        calls.append((collection, filter_query, field, value))
+        return 1
+
+    monkeypatch.setattr(embedded_module, "push_one", mock_push_one)
+
+    result = await embedded_module.add_damage(
+        {"_id": 1, "damages": []}, 7, {"part": "Door"}
+    )
+
+    assert result == 1
+    assert calls == [("claims", {"_id": 1}, "damages", {"id": 7, "part": "Door"})]
+
+
+@pytest.mark.asyncio
+async def test_add_damage_spills_over_limit(monkeypatch):
+    """Test add_damage writes to the damages collection when the claim is full"""
+    inserted, updated = [], []
+
+    async def mock_insert_one(collection, document):
+        inserted.append((collection, document))
+        return "7"
+
+    async def mock_update_one(collection, filter_query, update_data):
+        updated.append(update_data)
+        return 1
+
+    monkeypatch.setattr(settings, "EMBEDDED_DAMAGES_MAX_BYTES", 10)
+    monkeypatch.setattr(embedded_module, "insert_one", mock_insert_one)
+    monkeypatch.setattr(embedded_module, "update_one", mock_update_one)
+
+    result = await embedded_module.add_damage(
+        {"_id": 1, "damages": []}, 7, {"part": "Door"}
+    )
+
+    assert result == 1
+    assert inserted == [("damages", {"_id": 7, "claim_id": 1, "part": "Door"})]
+    assert updated == [{"damages_spilled": True}]
+
+
+@pytest.mark.asyncio
+async def test_replace_damage_uses_positional_operator(monkeypatch):
+    """Test embedded damages are updated through damages.$"""
+    calls = []
+
+    async def mock_update_one_matched(collection, filter_query, update_data):
+        calls.append((collection, filter_query, update_data))
+        return 1
+
+    monkeypatch.setattr(embedded_module, "update_one_matched", mock_update_one_matched)
+
+    await embedded_module.replace_damage(1, 7, {"part": "Door"}, True)
+
+    assert calls == [
+        (
+            "claims",
+            {"_id": 1, "damages.id": 7},
+            {"damages.$": {"id": 7, "part": "Door"}},
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_remove_and_restore_damage_soft_delete(monkeypatch):
+    """Test embedded damages are soft-deleted and restored via damages.$.deleted_at"""
+    calls = []
+
+    async def mock_update_one_matched(collection, filter_query, update_data):
+        calls.append((collection, filter_query, update_data))
+        return 1
+
+    monkeypatch.setattr(embedded_module, "update_one_matched", mock_update_one_matched)
+
+    await embedded_module.remove_damage(1, 7, True)
+    await embedded_module.restore_damage(1, 7, True)
+
+    assert [c[:2] for c in calls] == [("claims", {"_id": 1, "damages.id": 7})] * 2
+    assert isinstance(calls[0][2]["damages.$.deleted_at"], datetime)
+    assert calls[1][2] == {"damages.$.deleted_at": None}
+
+
+@pytest.mark.asyncio
+async def test_find_damage_embedded(monkeypatch, embedded_mode):
+    """Test find_damage resolves embedded damages with a single query"""
+    async def mock_find_one(collection, filter_query):
+        assert filter_query == {"damages.id": 7}
+        return {"_id": 1, "status": "PENDING", "damages": [DAMAGE_ITEM]}
+
+    monkeypatch.setattr(embedded_module, "find_one", mock_find_one)
+
+    claim_doc, item, is_embedded = await embedded_module.find_damage(7)
+
+    assert claim_doc["_id"] == 1
+    assert item == DAMAGE_ITEM
+    assert is_embedded
+
+
+@pytest.mark.asyncio
+async def test_get_claim_single_fetch(monkeypatch, embedded_mode):
+    """Test get_claim issues one document fetch in embedded mode"""
+    calls = []
+
+    async def mock_execute_one(collection, filter_query):
+        calls.append(collection)
+        return {
+            "_id": 1,
+            "title": "Claim 1",
+            "status": "PENDING",
+            "damages": [DAMAGE_ITEM],
+        }
+
+    async def mock_execute_query(*args, **kwargs):
+        raise AssertionError("no damages query expected")
+
+    monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(claims_module, "execute_query", mock_execute_query)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/claims/1")
+
+    assert r.status_code == 200
+    assert r.json()["damages"][0]["id"] == 7
+    assert calls == ["claims"]
+
+
+@pytest.mark.asyncio
+async def test_create_damage_embedded(monkeypatch, embedded_mode):
+    """Test create_damage pushes into the claim in embedded mode"""
+    async def mock_execute_one(collection, filter_query):
+        return {"_id": 1, "title": "Claim 1", "status": "PENDING", "damages": []}
+
+    async def mock_next_sequence(*args, **kwargs):
+        return 7
+
+    async def mock_push_one(*args, **kwargs):
+        return 1
+
+    monkeypatch.setattr(damages_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(damages_module, "next_sequence", mock_next_sequence)
+    monkeypatch.setattr(embedded_module, "push_one", mock_push_one)
+    monkeypatch.setattr(
+        damages_module, "schedule_image_check", mock_schedule_image_check
+    )
+    monkeypatch.setattr(damages_module, "schedule_refresh", mock_schedule_refresh)
+
+    payload = {k: v for k, v in DAMAGE_ITEM.items() if k != "id"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/v1/damages/?claim_id=1", json=payload)
+
+    assert r.status_code == 200
+    assert r.json()["id"] == 7
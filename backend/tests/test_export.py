@@ -0,0 +1,133 @@
+import asyncio
+import io
+from datetime import datetime
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from app.main import app
+from app.core import export
+from app.core.db import find_batches
+from app.core.deadline import DeadlineExceeded, bounded
+from app import seed
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+async def claims(memory_db):
+    await seed.generate(30, seed.Profile(damages="2:1"), batch_size=10, seed=5)
+    await memory_db["damages"].update_one(
+        {"_id": 1}, {"$set": {"deleted_at": datetime(2024, 1, 1)}}
+    )
+    return memory_db
+
+
+async def _download(path):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path)
+
+
+@pytest.mark.asyncio
+async def test_find_batches(claims):
+    """Test cursors are streamed in bounded, _id-ordered batches"""
+    batches = [
+        [d["_id"] for d in batch]
+        async for batch in find_batches("claims", batch_size=12)
+    ]
+
+    assert [len(b) for b in batches] == [12, 12, 6]
+    assert sum(batches, []) == list(range(1, 31))
+
+
+@pytest.mark.asyncio
+async def test_export_claims_parquet(claims):
+    """Test the endpoint streams a Parquet file with exact decimal totals"""
+    response = await _download("/api/v1/exports/claims?format=parquet")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 30
+    assert table.schema.field("total_price").type == pa.decimal128(18, 2)
+
+    first = table.slice(0, 1).to_pylist()[0]
+    live = (
+        await claims["damages"].find({"claim_id": 1, "deleted_at": None}).to_list(None)
+    )
+    assert first["damage_count"] == len(live) == 1
+    assert first["total_price"] == Decimal(live[0]["price"]) / 100
+
+
+@pytest.mark.asyncio
+async def test_export_damages_arrow(claims, monkeypatch):
+    """Test Arrow IPC export of live damages, one record batch per claims batch"""
+    monkeypatch.setattr(export.settings, "EXPORT_BATCH_SIZE", 10)
+    response = await _download("/api/v1/exports/damages?format=arrow")
+
+    reader = pa.ipc.open_file(pa.BufferReader(response.content))
+    table = reader.read_all()
+    assert reader.num_record_batches == 3
+    assert table.num_rows == 59
+    assert 1 not in table.column("id").to_pylist()
+    assert table.schema.field("price").type == pa.decimal128(10, 2)
+    assert all(isinstance(p, Decimal) for p in table.column("price").to_pylist())
+
+
+@pytest.mark.asyncio
+async def test_partitioned_export(claims, tmp_path):
+    """Test the partitioned output is a Hive-style status/month dataset"""
+    rows = await export.write_export(
+        "claims", "parquet", str(tmp_path), partitioned=True, batch_size=7
+    )
+
+    files = sorted(tmp_path.glob("status=*/month=*/part-0.parquet"))
+    assert rows == sum(pq.read_metadata(f).num_rows for f in files) == 30
+    for path in files:
+        status, month = (
+            path.parent.parent.name[len("status=") :],
+            path.parent.name[len("month=") :],
+        )
+        for row in pq.read_table(path).to_pylist():
+            assert (row["status"], row["status_changed_at"].strftime("%Y-%m")) == (
+                status,
+                month,
+            )
+
+
+@pytest.mark.asyncio
+async def test_export_requires_pyarrow(monkeypatch):
+    """Test the endpoint answers 503 when pyarrow is not installed"""
+    monkeypatch.setattr(export, "pa", None)
+    response = await _download("/api/v1/exports/claims")
+
+    assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_streamed_export_bounds_each_batch(claims, monkeypatch):
+    """Test a slow export outlasting the request deadline completes, batches bounded"""
+    monkeypatch.setattr(export.settings, "ROUTE_TIMEOUTS", {})
+    monkeypatch.setattr(export.settings, "REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(export.settings, "EXPORT_BATCH_SIZE", 10)
+    monkeypatch.setattr(export.settings, "EXPORT_BATCH_TIMEOUT", 0.15)
+    damages_of = export._damages_of
+
+    async def slow_damages_of(claims):
+        await bounded(asyncio.sleep(0.1))  # a slow query of each of the 3 batches
+        return await damages_of(claims)
+
+    monkeypatch.setattr(export, "_damages_of", slow_damages_of)
+    response = await _download("/api/v1/exports/claims?format=arrow")
+
+    assert response.status_code == 200
+    assert pa.ipc.open_file(pa.py_buffer(response.content)).read_all().num_rows == 30
+
+    # A batch past its own deadline aborts the download (headers are already sent)
+    monkeypatch.setattr(export.settings, "EXPORT_BATCH_TIMEOUT", 0.05)
+    with pytest.raises(RuntimeError) as exc:
+        await _download("/api/v1/exports/claims?format=arrow")
+    assert isinstance(exc.value.__cause__, DeadlineExceeded)
@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.core.documents import DAMAGE_PATHS, projection
+from app.core.fields import parse_fields, partial_model
+from app.schemas.models import Claim, Damage
+
+
+def test_parse_fields():
+    """Test field lists are split, stripped and deduplicated in order"""
+    assert parse_fields(None, Claim) is None
+    assert parse_fields("", Claim) is None
+    assert parse_fields(" id, title ,id", Claim) == ("id", "title")
+
+
+def test_parse_fields_rejects_unknown():
+    """Test unknown or empty field lists are a 400"""
+    with pytest.raises(HTTPException) as exc:
+        parse_fields("id,total", Claim)
+    assert exc.value.status_code == 400
+    assert "total" in exc.value.detail
+
+    with pytest.raises(HTTPException):
+        parse_fields(",", Claim)
+
+
+def test_partial_model_keeps_types_and_validators():
+    """Test the trimmed model validates like the full one"""
+    model = partial_model(Damage, ("price", "score"))
+
+    assert set(model.model_fields) == {"price", "score"}
+    assert model(price=10, score=3).price == Decimal("10.00")
+    with pytest.raises(ValidationError):
+        model(price=10, score=11)
+    assert partial_model(Damage, ("price", "score")) is model
+
+
+def test_projection():
+    """Test API fields map to document paths"""
+    assert projection(("id", "part"), DAMAGE_PATHS) == {"_id": 1, "part": 1}
+    assert projection(("part",), DAMAGE_PATHS, prefix="damages.") == {"damages.part": 1}
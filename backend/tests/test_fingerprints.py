@@ -0,0 +1,175 @@
+import httpx
+import pytest
+from bson.decimal128 import Decimal128
+
+from app.main import app
+from app.core import fingerprints
+from app import seed
+
+BUMPER = {
+    "part": "Bumper",
+    "severity": "LOW",
+    "image_url": "http://img.jpg",
+    "price": 100.0,
+    "score": 5,
+}
+DOOR = {
+    "part": "Door",
+    "severity": "HIGH",
+    "image_url": "http://img.jpg",
+    "price": 850.0,
+    "score": 9,
+}
+HOOD = {
+    "part": "Hood",
+    "severity": "MEDIUM",
+    "image_url": "http://img.jpg",
+    "price": 300.0,
+    "score": 6,
+}
+MIRROR = {
+    "part": "Mirror",
+    "severity": "LOW",
+    "image_url": "http://img.jpg",
+    "price": 40.0,
+    "score": 2,
+}
+
+
+def test_exact_fingerprint_is_order_and_format_insensitive():
+    """Test the fingerprint ignores damage order, part case/spacing and price format"""
+    a = [BUMPER, DOOR]
+    b = [
+        {**DOOR, "part": " door ", "price": Decimal128("850.00")},
+        {**BUMPER, "price": "100"},
+    ]
+
+    assert fingerprints.exact_fingerprint(a) == fingerprints.exact_fingerprint(b)
+    assert fingerprints.exact_fingerprint(a) != fingerprints.exact_fingerprint(
+        [BUMPER, {**DOOR, "price": 851}]
+    )
+    assert fingerprints.exact_fingerprint([]) is None
+
+
+def test_minhash_estimates_jaccard_similarity():
+    """Test signatures of damage sets agree about as often as the sets overlap"""
+    base = fingerprints.minhash(fingerprints.tokens([BUMPER, DOOR, HOOD]))
+    near = fingerprints.minhash(
+        fingerprints.tokens([BUMPER, DOOR, {**HOOD, "price": 310.0}])
+    )
+    other = fingerprints.minhash(fingerprints.tokens([MIRROR]))
+
+    assert fingerprints.similarity(base, base) == 1.0
+    assert 0.5 <= fingerprints.similarity(base, near) < 1.0
+    assert fingerprints.similarity(base, other) < 0.2
+    assert set(fingerprints.bands(base)) & set(fingerprints.bands(near))
+
+
+async def _run_refreshes(db):
+    """Run the queued fingerprint refreshes now (image checks are left queued)"""
+    for job in await db["jobs"].find({"type": "refresh_fingerprint"}).to_list(None):
+        await fingerprints.run_refresh(job["payload"])
+    await db["jobs"].delete_many({"type": "refresh_fingerprint"})
+
+
+async def _claim(client, db, claim_id, damages):
+    await db["claims"].insert_one(
+        {"_id": claim_id, "title": f"Claim {claim_id}", "status": "PENDING"}
+    )
+    ids = []
+    for damage in damages:
+        r = await client.post(f"/api/v1/damages/?claim_id={claim_id}", json=damage)
+        ids.append(r.json()["id"])
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_duplicates_endpoint(memory_db):
+    """Test damage writes keep the fingerprint current and duplicates are found by it"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await _claim(client, memory_db, 1, [BUMPER, DOOR, HOOD])
+        await _claim(client, memory_db, 2, [HOOD, {**BUMPER, "part": "BUMPER"}, DOOR])
+        near = await _claim(
+            client, memory_db, 3, [BUMPER, DOOR, {**HOOD, "price": 310.0}]
+        )
+        await _claim(client, memory_db, 4, [MIRROR])
+        await _run_refreshes(memory_db)
+
+        r = await client.get("/api/v1/claims/1/duplicates")
+        assert r.status_code == 200
+        found = r.json()
+        assert [(d["id"], d["exact"]) for d in found] == [(2, True), (3, False)]
+        assert found[0]["similarity"] == 1.0 and 0.5 <= found[1]["similarity"] < 1.0
+
+        # Deleting a damage refreshes the fingerprint of its claim
+        await client.delete(f"/api/v1/damages/{near[2]}")
+        await _run_refreshes(memory_db)
+        claim = await memory_db["claims"].find_one({"_id": 3})
+        assert claim["fingerprint"] == fingerprints.exact_fingerprint([BUMPER, DOOR])
+
+        assert (await client.get("/api/v1/claims/4/duplicates")).json() == []
+        assert (await client.get("/api/v1/claims/99/duplicates")).status_code == 404
+        assert (
+            await client.get("/api/v1/claims/1/duplicates?limit=0")
+        ).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_refreshes_are_queued_once_per_period(memory_db, monkeypatch):
+    """Test writes queue a refresh per claim and period; a late older one is ignored"""
+    await memory_db["claims"].insert_one(
+        {"_id": 1, "title": "Claim", "status": "PENDING"}
+    )
+    monkeypatch.setattr(fingerprints.time, "time", lambda: 1001.0)
+    monkeypatch.setattr(fingerprints.settings, "DUPLICATES_REFRESH_SECONDS", 5.0)
+
+    assert (
+        await fingerprints.schedule_refresh(1)
+        == await fingerprints.schedule_refresh(1)
+        == "fingerprint:1:201"
+    )
+    (job,) = await memory_db["jobs"].find({}).to_list(None)
+    assert job["payload"] == {"claim_id": 1, "as_of": 1005.0}
+
+    await memory_db["damages"].insert_one(
+        {"_id": 7, "claim_id": 1, "deleted_at": None, **BUMPER}
+    )
+    await fingerprints.run_refresh({"claim_id": 1, "as_of": 1010.0})
+    await memory_db["damages"].delete_one({"_id": 7})
+    await fingerprints.run_refresh(job["payload"])
+
+    claim = await memory_db["claims"].find_one({"_id": 1})
+    assert claim["fingerprint"] == fingerprints.exact_fingerprint([BUMPER])
+
+
+@pytest.mark.asyncio
+async def test_duplicate_candidates_are_capped(memory_db, monkeypatch):
+    """Test a lookup reads at most DUPLICATES_MAX_CANDIDATES claims"""
+    monkeypatch.setattr(fingerprints.settings, "DUPLICATES_MAX_CANDIDATES", 3)
+    fields = fingerprints.fingerprint_fields([BUMPER])
+    await memory_db["claims"].insert_many(
+        [{"_id": i, "status": "PENDING", **fields} for i in range(1, 11)]
+    )
+
+    assert [r[0] for r in await fingerprints.find_duplicates(1, 10)] == [2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_backfill(memory_db):
+    """Test the backfill fingerprints claims written without going through the API"""
+    await seed.generate(12, seed.Profile(damages="3:1"), batch_size=5, seed=3)
+    source = await memory_db["damages"].find({"claim_id": 1}).to_list(None)
+    await memory_db["claims"].insert_one(
+        {"_id": 13, "title": "Copy", "status": "PENDING"}
+    )
+    await memory_db["damages"].insert_many(
+        [{**d, "_id": 1000 + i, "claim_id": 13} for i, d in enumerate(source)]
+    )
+
+    assert await fingerprints.backfill(batch_size=5) == 13
+    assert (
+        await memory_db["claims"].count_documents({"fingerprint": {"$type": "string"}})
+        == 13
+    )
+    assert (13, True, 1.0) in await fingerprints.find_duplicates(1, 10)
@@ -0,0 +1,256 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import httpx
+from fastapi import HTTPException
+
+from app.core.deadline import DeadlineExceeded
+from app.main import app
+import app.core.idempotency as idempotency_module
+import app.api.routes.claims as claims_module
+
+
+@pytest.fixture
+def keys(memory_db):
+    """Documents of the idempotency_keys collection"""
+    return memory_db["idempotency_keys"].documents
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = idempotency_module.IdempotencyStore()
+    monkeypatch.setattr(claims_module, "idempotency_store", store)
+    return store
+
+
+def counting_operation(calls, result=None):
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return result or {"id": len(calls)}
+    return operation
+
+
+@pytest.mark.asyncio
+async def test_without_key_runs_every_time(keys, store):
+    """Test requests without a key are not deduplicated"""
+    calls = []
+    await store.run("claims", None, {}, counting_operation(calls))
+    await store.run("claims", None, {}, counting_operation(calls))
+
+    assert len(calls) == 2
+    assert keys == {}
+
+
+@pytest.mark.asyncio
+async def test_retry_is_replayed(keys, store):
+    """Test a retried key returns the stored response without running again"""
+    calls = []
+    first, replayed_first = await store.run(
+        "claims", "k1", {"a": 1}, counting_operation(calls)
+    )
+    second, replayed_second = await store.run(
+        "claims", "k1", {"a": 1}, counting_operation(calls)
+    )
+
+    assert len(calls) == 1
+    assert first == second == {"id": 1}
+    assert (replayed_first, replayed_second) == (False, True)
+    assert keys["claims:k1"]["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_replay_from_storage_after_cache_expiry(keys, store, monkeypatch):
+    """Test responses are replayed from the collection once the memory layer expires"""
+    monkeypatch.setattr(idempotency_module.settings, "IDEMPOTENCY_CACHE_SECONDS", 0)
+    calls = []
+    await store.run("claims", "k1", {"a": 1}, counting_operation(calls))
+    result, replayed = await store.run(
+        "claims", "k1", {"a": 1}, counting_operation(calls)
+    )
+
+    assert len(calls) == 1
+    assert replayed
+    assert result == {"id": 1}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_first(keys, store):
+    """Test in-flight duplicates share the first request's response"""
+    calls = []
+    results = await asyncio.gather(*[
+        store.run("claims", "k1", {"a": 1}, counting_operation(calls)) for _ in range(5)
+    ])
+
+    assert len(calls) == 1
+    assert {r[0]["id"] for r in results} == {1}
+    assert sum(1 for r in results if r[1]) == 4
+
+
+@pytest.mark.asyncio
+async def test_key_reused_with_other_body(keys, store):
+    """Test a key reused for a different request is rejected"""
+    await store.run("claims", "k1", {"a": 1}, counting_operation([]))
+
+    with pytest.raises(HTTPException) as exc:
+        await store.run("claims", "k1", {"a": 2}, counting_operation([]))
+    assert exc.value.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_failed_request_releases_key(keys, store):
+    """Test failures are not stored so the client can retry"""
+    async def failing():
+        raise HTTPException(status_code=404, detail="Claim not found")
+
+    with pytest.raises(HTTPException):
+        await store.run("damages", "k1", {}, failing)
+    assert keys == {}
+
+    calls = []
+    _, replayed = await store.run("damages", "k1", {}, counting_operation(calls))
+    assert not replayed
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_pending_in_other_process_times_out(memory_db, store, monkeypatch):
+    """Test a key still pending elsewhere answers 409 after the wait"""
+    monkeypatch.setattr(idempotency_module.settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    await memory_db["idempotency_keys"].insert_one(
+        {
+            "_id": "claims:k1",
+            "fingerprint": "x",
+            "status": "pending",
+            "owner": "other",
+            "created_at": datetime.utcnow(),
+        }
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        await store.run("claims", "k1", {}, counting_operation([]))
+    assert exc.value.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_abandoned_pending_key_is_taken_over(keys, store, monkeypatch):
+    """Test a key pending past its lease (dead worker) runs again instead of a 409"""
+    monkeypatch.setattr(
+        idempotency_module.settings, "IDEMPOTENCY_PENDING_LEASE_SECONDS", 60
+    )
+    stale = datetime.utcnow() - timedelta(seconds=61)
+    keys["claims:k1"] = {
+        "_id": "claims:k1",
+        "fingerprint": "x",
+        "status": "pending",
+        "owner": "dead",
+        "created_at": stale,
+    }
+
+    calls = []
+    result, replayed = await store.run(
+        "claims", "k1", {"a": 1}, counting_operation(calls)
+    )
+
+    assert (result, replayed, len(calls)) == ({"id": 1}, False, 1)
+    assert keys["claims:k1"]["status"] == "done"
+    assert keys["claims:k1"]["owner"] != "dead"
+
+
+@pytest.mark.asyncio
+async def test_taken_over_key_ignores_the_old_owner(keys, store, monkeypatch):
+    """Test a request whose marker was taken over neither stores nor releases the key"""
+    monkeypatch.setattr(
+        idempotency_module.settings, "IDEMPOTENCY_PENDING_LEASE_SECONDS", 0
+    )
+
+    async def slow_then_taken_over():
+        keys["claims:k1"]["owner"] = "successor"
+        return {"id": 1}
+
+    await store.run("claims", "k1", {"a": 1}, slow_then_taken_over)
+
+    assert keys["claims:k1"]["status"] == "pending"
+    assert keys["claims:k1"]["owner"] == "successor"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_first_request_is_not_run_again(keys, store, monkeypatch):
+    """Test duplicates of a cancelled request (maybe written) get 409, don't run"""
+    monkeypatch.setattr(idempotency_module.settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    started = asyncio.Event()
+
+    async def hanging():
+        started.set()
+        await asyncio.sleep(10)
+
+    first = asyncio.create_task(store.run("claims", "k1", {"a": 1}, hanging))
+    await started.wait()
+    calls = []
+    duplicate = asyncio.create_task(
+        store.run("claims", "k1", {"a": 1}, counting_operation(calls))
+    )
+    await asyncio.sleep(0)
+    first.cancel()
+
+    with pytest.raises(HTTPException) as exc:
+        await duplicate
+    assert exc.value.status_code == 409
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert keys["claims:k1"]["status"] == "pending"
+
+    # A later retry waits on the kept marker too
+    with pytest.raises(HTTPException) as exc:
+        await store.run("claims", "k1", {"a": 1}, counting_operation(calls))
+    assert exc.value.status_code == 409
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_deadline_after_write_keeps_key(keys, store, monkeypatch):
+    """Test a request that may have written (deadline, 5xx) keeps its marker"""
+    monkeypatch.setattr(idempotency_module.settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+
+    async def timed_out():
+        raise DeadlineExceeded()
+
+    with pytest.raises(DeadlineExceeded):
+        await store.run("damages", "k1", {}, timed_out)
+    assert keys["damages:k1"]["status"] == "pending"
+
+    calls = []
+    with pytest.raises(HTTPException) as exc:
+        await store.run("damages", "k1", {}, counting_operation(calls))
+    assert exc.value.status_code == 409
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_create_claim_with_idempotency_key(keys, store, monkeypatch):
+    """Test POST /claims retried with the same key creates a single claim"""
+    inserted = []
+
+    async def mock_next_sequence(*args, **kwargs):
+        return len(inserted) + 1
+
+    async def mock_insert_one(collection, document):
+        inserted.append(document)
+        return str(document["_id"])
+
+    monkeypatch.setattr(claims_module, "next_sequence", mock_next_sequence)
+    monkeypatch.setattr(claims_module, "insert_one", mock_insert_one)
+
+    payload = {"title": "New claim", "description": "Desc", "status": "PENDING"}
+    headers = {"Idempotency-Key": "abc-123"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.post("/api/v1/claims/", json=payload, headers=headers)
+        retry = await client.post("/api/v1/claims/", json=payload, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert first.json() == retry.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(inserted) == 1
@@ -0,0 +1,333 @@
+import asyncio
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import httpx
+
+from app.main import app
+from app.core.config import settings
+import app.core.images as images_module
+import app.api.routes.damages as damages_module
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+def _png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    PIL.new("RGB", (1024, 768), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+PNG = _png_bytes()
+ROUTES = {
+    "/car.png": (200, "image/png", PNG),
+    "/page.html": (200, "text/html; charset=utf-8", b"<html></html>"),
+    "/broken.png": (200, "image/png", b"not really a png"),
+}
+REDIRECTS = {
+    "/to-car": "/car.png",
+    "/to-metadata": "http://169.254.169.254/latest/meta-data/",
+}
+
+
+SEEN_HOSTS = []
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def _respond(self, with_body: bool):
+        SEEN_HOSTS.append(self.headers["Host"])
+        if self.path in REDIRECTS:
+            self.send_response(302)
+            self.send_header("Location", REDIRECTS[self.path])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        status, content_type, body = ROUTES.get(
+            self.path, (404, "text/plain", b"missing")
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def loopback_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def fixture_server(loopback_server, monkeypatch):
+    # Loopback is refused unless allowlisted, like an internal image store
+    monkeypatch.setattr(settings, "IMAGE_ALLOWED_HOSTS", ["127.0.0.1"])
+    return loopback_server
+
+
+@pytest.fixture
+def thumbnails_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "THUMBNAILS_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_builds_thumbnail(fixture_server, thumbnails_dir):
+    """Test a valid image is measured and thumbnailed on disk"""
+    async with httpx.AsyncClient() as client:
+        meta = await images_module.inspect_image(client, f"{fixture_server}/car.png")
+
+    assert meta["error"] is None
+    assert meta["content_type"] == "image/png"
+    assert meta["size"] == len(PNG)
+    thumbnail = thumbnails_dir / meta["thumbnail"]
+    assert thumbnail.is_file()
+    with PIL.open(thumbnail) as img:
+        assert max(img.size) == settings.THUMBNAIL_SIZE
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_rejects_non_image(fixture_server, thumbnails_dir):
+    """Test non-image content types are flagged after the HEAD check"""
+    async with httpx.AsyncClient() as client:
+        meta = await images_module.inspect_image(client, f"{fixture_server}/page.html")
+
+    assert meta["error"] == "not an image"
+    assert meta["thumbnail"] is None
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_missing(fixture_server, thumbnails_dir):
+    """Test 404 images are recorded as errors"""
+    async with httpx.AsyncClient() as client:
+        meta = await images_module.inspect_image(
+            client, f"{fixture_server}/missing.png"
+        )
+
+    assert meta["error"] == "HTTP 404"
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_undecodable(fixture_server, thumbnails_dir):
+    """Test broken image bytes do not produce a thumbnail"""
+    async with httpx.AsyncClient() as client:
+        meta = await images_module.inspect_image(client, f"{fixture_server}/broken.png")
+
+    assert meta["error"] == "unsupported image"
+    assert meta["thumbnail"] is None
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_too_large(fixture_server, thumbnails_dir, monkeypatch):
+    """Test images above IMAGE_MAX_BYTES are not downloaded"""
+    monkeypatch.setattr(settings, "IMAGE_MAX_BYTES", 100)
+    async with httpx.AsyncClient() as client:
+        meta = await images_module.inspect_image(client, f"{fixture_server}/car.png")
+
+    assert meta["error"] == "image too large"
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_refuses_internal_addresses(
+    loopback_server, thumbnails_dir
+):
+    """Test URLs to loopback, link-local, private hosts or other schemes are refused"""
+    urls = [
+        f"{loopback_server}/car.png",
+        "http://localhost/car.png",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.7/car.png",
+        "http://[::ffff:127.0.0.1]/car.png",
+        "file:///etc/passwd",
+    ]
+    async with httpx.AsyncClient() as client:
+        errors = [
+            (await images_module.inspect_image(client, url))["error"] for url in urls
+        ]
+
+    assert errors == ["address not allowed"] * 5 + ["unsupported URL"]
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_checks_every_redirect(fixture_server, thumbnails_dir):
+    """Test redirects are followed hop by hop; a refused hop stops the fetch"""
+    async with httpx.AsyncClient() as client:
+        followed = await images_module.inspect_image(client, f"{fixture_server}/to-car")
+        blocked = await images_module.inspect_image(
+            client, f"{fixture_server}/to-metadata"
+        )
+
+    assert followed["error"] is None and followed["thumbnail"]
+    assert blocked["error"] == "host not allowed"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_thumbnails(thumbnails_dir):
+    """Test two writers of the same thumbnail don't share a temporary file"""
+    path = str(thumbnails_dir / "same.jpg")
+    results = await asyncio.gather(*(
+        asyncio.to_thread(images_module.make_thumbnail, PNG, path) for _ in range(4)
+    ))
+
+    assert all(results)
+    assert [p.name for p in thumbnails_dir.iterdir()] == ["same.jpg"]
+
+
+@pytest.mark.asyncio
+async def test_check_damage_image_job(fixture_server, thumbnails_dir, monkeypatch):
+    """Test the background job stores image metadata for the damage"""
+    url = f"{fixture_server}/car.png"
+    stored = {}
+
+    async def mock_find_damage(damage_id):
+        return {"_id": 1}, {"id": damage_id, "image_url": url}, True
+
+    async def mock_upsert_one(collection, filter_query, update_data):
+        stored[filter_query["_id"]] = update_data
+        return 1
+
+    monkeypatch.setattr(images_module, "find_damage", mock_find_damage)
+    monkeypatch.setattr(images_module, "upsert_one", mock_upsert_one)
+
+    await images_module.check_damage_image({"damage_id": 7, "image_url": url})
+
+    assert stored[7]["content_type"] == "image/png"
+    assert stored[7]["thumbnail"]
+
+
+@pytest.mark.asyncio
+async def test_check_damage_image_skips_stale(monkeypatch):
+    """Test checks for an image URL that was edited since are skipped"""
+    async def mock_find_damage(damage_id):
+        return {"_id": 1}, {"id": damage_id, "image_url": "http://new.jpg"}, True
+
+    async def mock_upsert_one(*args, **kwargs):
+        raise AssertionError("stale check must not be stored")
+
+    monkeypatch.setattr(images_module, "find_damage", mock_find_damage)
+    monkeypatch.setattr(images_module, "upsert_one", mock_upsert_one)
+
+    await images_module.check_damage_image(
+        {"damage_id": 7, "image_url": "http://old.jpg"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_thumbnail_cache_headers(fixture_server, thumbnails_dir):
+    """Test thumbnails are served with long-lived cache headers"""
+    async with httpx.AsyncClient() as client:
+        meta = await images_module.inspect_image(client, f"{fixture_server}/car.png")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get(f"/api/v1/damages/thumbnails/{meta['thumbnail']}")
+        missing = await client.get(f"/api/v1/damages/thumbnails/{'0' * 64}.jpg")
+        invalid = await client.get("/api/v1/damages/thumbnails/..secret")
+
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/jpeg"
+    assert "immutable" in r.headers["cache-control"]
+    assert missing.status_code == 404
+    assert invalid.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_damage_image(monkeypatch):
+    """Test image metadata exposes the thumbnail URL"""
+    async def mock_find_one(collection, filter_query):
+        return {
+            "_id": 1,
+            "url": "http://img.jpg",
+            "content_type": "image/jpeg",
+            "size": 10,
+            "thumbnail": "abc.jpg",
+            "error": None,
+            "checked_at": "2024-01-01T00:00:00Z",
+        }
+
+    monkeypatch.setattr(damages_module, "find_one", mock_find_one)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/api/v1/damages/1/image")
+
+    assert r.status_code == 200
+    assert r.json()["thumbnail_url"] == "/api/v1/damages/thumbnails/abc.jpg"
+
+
+@pytest.mark.asyncio
+async def test_inspect_image_connects_to_the_checked_address(
+    loopback_server, thumbnails_dir, monkeypatch
+):
+    """Test the fetch goes to the checked address, not to a second DNS answer"""
+    port = loopback_server.rsplit(":", 1)[1]
+    answers = []
+
+    async def resolve_once(host, port, **kwargs):
+        # A rebinding resolver: only the first lookup is answered
+        if answers:
+            raise AssertionError("host resolved twice")
+        answers.append(host)
+        return [(None, None, None, "", ("127.0.0.1", int(port)))]
+
+    monkeypatch.setattr(
+        images_module, "_is_public", lambda address: address == "127.0.0.1"
+    )
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", resolve_once)
+    SEEN_HOSTS.clear()
+
+    async with httpx.AsyncClient() as client:
+        response = await images_module._send(
+            client, "GET", f"http://images.test:{port}/car.png"
+        )
+
+    assert response.status_code == 200
+    assert answers == ["images.test"]
+    assert SEEN_HOSTS == [f"images.test:{port}"]
+
+
+@pytest.mark.asyncio
+async def test_image_check_in_separate_storage(memory_db, monkeypatch):
+    """Test the background check finds damages in the damages collection (separate)"""
+    monkeypatch.setattr(settings, "DAMAGES_STORAGE", "separate")
+    await memory_db["claims"].insert_one(
+        {"_id": 1, "title": "Claim", "status": "PENDING"}
+    )
+    await memory_db["damages"].insert_one(
+        {
+            "_id": 5,
+            "claim_id": 1,
+            "image_url": "http://img.test/a.png",
+            "deleted_at": None,
+        }
+    )
+    inspected = []
+
+    async def mock_inspect(client, image_url):
+        inspected.append(image_url)
+        return {"url": image_url, "error": None}
+
+    monkeypatch.setattr(images_module, "inspect_image", mock_inspect)
+    await images_module.check_damage_image(
+        {"damage_id": 5, "image_url": "http://img.test/a.png"}
+    )
+
+    assert inspected == ["http://img.test/a.png"]
+    assert (await memory_db["damage_images"].find_one({"_id": 5}))[
+        "url"
+    ] == "http://img.test/a.png"
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+import app.core.jobs as jobs_module
+
+
+@pytest.fixture
+def jobs(memory_db):
+    """Documents of the jobs collection"""
+    return memory_db["jobs"].documents
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    monkeypatch.setattr(jobs_module, "_handlers", {})
+    return jobs_module._handlers
+
+
+def test_backoff_is_exponential_and_capped(monkeypatch):
+    """Test retry delays double per attempt up to the cap"""
+    monkeypatch.setattr(settings, "JOB_BACKOFF_SECONDS", 1.0)
+    monkeypatch.setattr(settings, "JOB_BACKOFF_MAX_SECONDS", 5.0)
+
+    assert [jobs_module.backoff(n) for n in (1, 2, 3, 4)] == [1.0, 2.0, 4.0, 5.0]
+
+
+@pytest.mark.asyncio
+async def test_enqueue_with_key_is_idempotent(jobs):
+    """Test enqueuing twice with the same key stores one job"""
+    queue = jobs_module.JobQueue()
+
+    first = await queue.enqueue("notify", {"claim_id": 1}, key="notify:1")
+    second = await queue.enqueue("notify", {"claim_id": 1}, key="notify:1")
+
+    assert first == second == "notify:1"
+    assert len(jobs) == 1
+
+
+@pytest.mark.asyncio
+async def test_enqueue_periodic_one_job_per_period(jobs):
+    """Test periodic jobs are keyed by period, so repeated scheduling is a no-op"""
+    queue = jobs_module.JobQueue()
+
+    current = await queue.enqueue_periodic("purge", 3600)
+    assert await queue.enqueue_periodic("purge", 3600) == current
+    following = await queue.enqueue_periodic("purge", 3600, next_period=True)
+
+    assert len(jobs) == 2
+    assert int(following.split(":")[1]) == int(current.split(":")[1]) + 1
+    assert jobs[following]["run_at"] > jobs[current]["run_at"]
+
+
+@pytest.mark.asyncio
+async def test_run_next_success(jobs, handlers):
+    """Test a due job runs its handler and is marked done"""
+    seen = []
+
+    @jobs_module.job_handler("notify")
+    async def notify(payload):
+        seen.append(payload)
+
+    queue = jobs_module.JobQueue()
+    job_id = await queue.enqueue("notify", {"claim_id": 1})
+
+    assert await queue.run_next()
+    assert not await queue.run_next()
+    assert seen == [{"claim_id": 1}]
+    assert jobs[jobs_module.ObjectId(job_id)]["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_run_next_retries_with_backoff(jobs, handlers, monkeypatch):
+    """Test failing jobs are rescheduled and finally marked failed"""
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "JOB_BACKOFF_SECONDS", 0.0)
+
+    @jobs_module.job_handler("flaky")
+    async def flaky(payload):
+        raise RuntimeError("boom")
+
+    queue = jobs_module.JobQueue()
+    await queue.enqueue("flaky", {}, key="flaky")
+
+    assert await queue.run_next()
+    assert jobs["flaky"]["status"] == "pending"
+    assert "boom" in jobs["flaky"]["last_error"]
+
+    assert await queue.run_next()
+    assert jobs["flaky"]["status"] == "failed"
+    assert jobs["flaky"]["attempts"] == 2
+
+
+@pytest.mark.asyncio
+async def test_delayed_job_waits(jobs, handlers):
+    """Test jobs are not run before their run_at"""
+    queue = jobs_module.JobQueue()
+    await queue.enqueue("notify", {}, delay=60)
+
+    assert not await queue.run_next()
+
+
+@pytest.mark.asyncio
+async def test_unknown_job_type_fails(jobs, handlers):
+    """Test jobs without a handler record the error"""
+    queue = jobs_module.JobQueue()
+    await queue.enqueue("missing", {}, key="missing")
+
+    assert await queue.run_next()
+    assert "No handler" in jobs["missing"]["last_error"]
+
+
+@pytest.mark.asyncio
+async def test_workers_process_enqueued_jobs(jobs, handlers):
+    """Test started workers pick up jobs as soon as they are enqueued"""
+    done = asyncio.Event()
+
+    @jobs_module.job_handler("notify")
+    async def notify(payload):
+        done.set()
+
+    queue = jobs_module.JobQueue()
+    await queue.start(workers=1)
+    try:
+        await queue.enqueue("notify", {})
+        await asyncio.wait_for(done.wait(), 1.0)
+    finally:
+        await queue.stop()
+
+    assert queue.workers == []
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_expire(memory_db):
+    """Test finished jobs are covered by a TTL index that leaves queued ones alone"""
+    indexes = await memory_db["jobs"].index_information()
+
+    ttl = indexes["finished_at_1"]
+    assert ttl["expireAfterSeconds"] == settings.JOB_RETENTION_SECONDS
+    assert ttl["partialFilterExpression"] == {"status": {"$in": ["done", "failed"]}}
@@ -7,13 +7,27 @@ from app.main import lifespan, app
 async def test_lifespan_startup_shutdown():
     """Test lifespan context manager calls connect and close"""
     with patch('app.main.connect_to_mongo', new_callable=AsyncMock) as mock_connect, \
+         patch('app.main.ensure_indexes', new_callable=AsyncMock) as mock_indexes, \
+         patch('app.main.job_queue') as mock_jobs, \
+         patch('app.main.audit_writer') as mock_audit, \
+         patch('app.main.start_damage_purge', new_callable=AsyncMock) as mock_purge, \
          patch('app.main.close_mongo_connection', new_callable=AsyncMock) as mock_close:
+        mock_jobs.start = AsyncMock()
+        mock_jobs.stop = AsyncMock()
+        mock_audit.start = AsyncMock()
+        mock_audit.stop = AsyncMock()
         
         async with lifespan(app):
             # Verify startup was called
             mock_connect.assert_called_once()
+            mock_indexes.assert_called_once()
+            mock_jobs.start.assert_called_once()
+            mock_audit.start.assert_called_once()
+            mock_purge.assert_called_once()
             # Verify shutdown not called yet
             mock_close.assert_not_called()
         
         # Verify shutdown was called after context exit
+        mock_jobs.stop.assert_called_once()
+        mock_audit.stop.assert_called_once()
         mock_close.assert_called_once()
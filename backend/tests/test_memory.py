@@ -0,0 +1,211 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.main import app
+import app.api.routes.claims as claims_module
+from app.core.audit import AuditWriter
+from app.core.config import settings
+from app.core.db import mongodb
+from app.core.memory import MemoryClient
+
+
+@pytest.fixture
+def coll():
+    return MemoryClient("mongodb://localhost/test").get_default_database()["claims"]
+
+
+@pytest.fixture
+async def client(memory_db, monkeypatch):
+    monkeypatch.setattr(claims_module, "audit_writer", AuditWriter())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def test_filters_projection_and_sort(coll):
+    """Test the query operators, dotted projections and multi-key sorts the app uses"""
+    await coll.insert_many(
+        [
+            {
+                "_id": 1,
+                "status": "PENDING",
+                "damages": [{"id": 10, "price": 5, "deleted_at": None}],
+            },
+            {
+                "_id": 2,
+                "status": "FINALIZED",
+                "damages": [
+                    {"id": 11, "price": 50, "deleted_at": datetime(2024, 1, 1)}
+                ],
+            },
+            {"_id": 3, "status": "PENDING"},
+        ]
+    )
+
+    async def ids(filter_query):
+        return [
+            d["_id"]
+            for d in await coll.find(filter_query).sort("_id", -1).to_list(None)
+        ]
+
+    assert await ids({"status": {"$in": ["PENDING"]}}) == [3, 1]
+    assert await ids({"damages.id": 11}) == [2]
+    assert await ids({"damages.price": {"$gte": 10}}) == [2]
+    assert await ids({"damages.deleted_at": {"$type": "date"}}) == [2]
+    assert await ids(
+        {"damages": {"$elemMatch": {"id": 10, "deleted_at": {"$type": "null"}}}}
+    ) == [1]
+    assert await ids({"damages": {"$exists": False}}) == [3]
+    assert await ids({"$or": [{"_id": 3}, {"status": "FINALIZED"}]}) == [3, 2]
+
+    doc = await coll.find_one({"_id": 1}, {"damages.id": 1, "_id": 0})
+    assert doc == {"damages": [{"id": 10}]}
+    sorted_docs = (
+        await coll.find({}, {"_id": 1}).sort([("status", 1), ("_id", -1)]).to_list(None)
+    )
+    assert [d["_id"] for d in sorted_docs] == [2, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_updates(coll):
+    """Test $set (also positional), $inc, $push, $pull, upserts and bulk writes"""
+    await coll.insert_one(
+        {"_id": 1, "damages": [{"id": 10, "price": 5}, {"id": 11, "price": 7}]}
+    )
+
+    await coll.update_one(
+        {"_id": 1, "damages.id": 11}, {"$set": {"damages.$.price": 9}}
+    )
+    await coll.update_one(
+        {"_id": 1}, {"$push": {"damages": {"id": 12}}, "$inc": {"version": 1}}
+    )
+    await coll.update_one({"_id": 1}, {"$pull": {"damages": {"id": 10}}})
+    doc = await coll.find_one({"_id": 1})
+    assert doc["damages"] == [{"id": 11, "price": 9}, {"id": 12}]
+    assert doc["version"] == 1
+
+    result = await coll.bulk_write([
+        UpdateOne({"_id": 1}, {"$set": {"status": "IN_REVIEW"}}),
+        UpdateOne({"_id": 2}, {"$set": {"status": "PENDING"}}, upsert=True),
+    ])
+    assert (result.matched_count, result.modified_count, result.upserted_count) == (
+        1,
+        1,
+        1,
+    )
+
+    counter = await coll.find_one_and_update(
+        {"_id": "seq"},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    assert counter == {"_id": "seq", "value": 1}
+
+    with pytest.raises(DuplicateKeyError):
+        await coll.insert_one({"_id": 1})
+
+    # A rejected update leaves the document as it was
+    with pytest.raises(OperationFailure):
+        await coll.update_one({"_id": 1}, {"$set": {"status": "CANCELED", "_id": 3}})
+    assert (await coll.find_one({"_id": 1}))["status"] == "IN_REVIEW"
+
+
+@pytest.mark.asyncio
+async def test_documents_are_copies_with_naive_utc_datetimes(coll):
+    """Test callers never share state with the store and dates read back like BSON"""
+    doc = {
+        "_id": 1,
+        "tags": ["a"],
+        "at": datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+    }
+    await coll.insert_one(doc)
+    doc["tags"].append("b")
+
+    stored = await coll.find_one({"_id": 1})
+    stored["tags"].append("c")
+
+    assert (await coll.find_one({"_id": 1}))["tags"] == ["a"]
+    assert stored["at"] == datetime(2024, 1, 1, 12, 0, 0, 123000)
+    assert (
+        await coll.count_documents(
+            {"at": {"$lt": datetime(2024, 1, 1, 13, tzinfo=timezone.utc)}}
+        )
+        == 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_claim_lifecycle_end_to_end(client):
+    """Test the API against the in-memory backend with no database server"""
+    created = await client.post(
+        "/api/v1/claims/", json={"title": "Golpe"}, headers={"X-User": "ana"}
+    )
+    assert created.status_code == 201
+    claim_id = created.json()["id"]
+
+    damage = {
+        "part": "Puerta",
+        "severity": "HIGH",
+        "image_url": "http://img.jpg",
+        "price": 900.0,
+        "score": 8,
+    }
+    added = await client.post(f"/api/v1/damages/?claim_id={claim_id}", json=damage)
+    assert added.status_code == 200
+    damage_id = added.json()["id"]
+
+    claim = (await client.get(f"/api/v1/claims/{claim_id}")).json()
+    assert [d["id"] for d in claim["damages"]] == [damage_id]
+
+    assert (await client.delete(f"/api/v1/damages/{damage_id}")).status_code == 204
+    assert (await client.get(f"/api/v1/claims/{claim_id}")).json()["damages"] == []
+    assert (
+        await client.post(f"/api/v1/damages/{damage_id}/restore")
+    ).status_code == 200
+
+    updated = await client.patch(
+        f"/api/v1/claims/{claim_id}/status", json={"status": "IN_REVIEW"}
+    )
+    assert updated.json()["status"] == "IN_REVIEW"
+
+    batch = await client.post("/api/v1/claims:batchGet", json={"ids": [claim_id, 999]})
+    assert [r["found"] for r in batch.json()] == [True, False]
+
+    await claims_module.audit_writer.flush()
+    history = (await client.get(f"/api/v1/claims/{claim_id}/history")).json()
+    assert [e["to_status"] for e in history] == ["PENDING", "IN_REVIEW"]
+
+
+@pytest.mark.asyncio
+async def test_embedded_storage_end_to_end(client, monkeypatch):
+    """Test damages kept inside the claim document work the same way"""
+    monkeypatch.setattr(settings, "DAMAGES_STORAGE", "embedded")
+    claim_id = (
+        await client.post("/api/v1/claims/", json={"title": "Embebido"})
+    ).json()["id"]
+
+    damage = {
+        "part": "Capó",
+        "severity": "LOW",
+        "image_url": "http://img.jpg",
+        "price": 50.0,
+        "score": 2,
+    }
+    damage_id = (
+        await client.post(f"/api/v1/damages/?claim_id={claim_id}", json=damage)
+    ).json()["id"]
+    updated = await client.put(
+        f"/api/v1/damages/{damage_id}", json={**damage, "price": 75.0}
+    )
+    assert updated.json()["price"] == "75.00"
+
+    stored = await mongodb.db["claims"].find_one({"_id": claim_id})
+    assert [(d["id"], d["price"]) for d in stored["damages"]] == [(damage_id, 7500)]
+    listing = (await client.get("/api/v1/damages/")).json()
+    assert [d["id"] for d in listing] == [damage_id]
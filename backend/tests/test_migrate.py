@@ -1,6 +1,12 @@
 import pytest
-from unittest.mock import patch, call
-from app.migrate import create_tables
+from unittest.mock import AsyncMock, patch, call
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+from app.core.config import settings
+from app.migrate import (
+    create_tables, for_tenants, migrate_damages_layout, migrate_money,
+    migrate_soft_delete
+)
 
 
 def test_create_tables(capsys):
@@ -29,3 +35,144 @@ def test_create_tables(capsys):
         # Verify success message
         captured = capsys.readouterr()
         assert "Tablas creadas exitosamente" in captured.out
+
+
+@pytest.mark.asyncio
+async def test_migrate_damages_to_embedded(capsys):
+    """Test damages move from their collection into the claim array"""
+    damage = {"_id": 7, "claim_id": 1, "part": "Door", "severity": "LOW",
+              "image_url": "http://img.jpg", "price": 10, "score": 3}
+
+    async def mock_find_many(collection, filter_query):
+        return [{"_id": 1, "title": "Claim"}] if collection == "claims" else [damage]
+
+    with patch('app.migrate.find_many', side_effect=mock_find_many), \
+         patch('app.migrate.update_one', new_callable=AsyncMock) as mock_update, \
+         patch('app.migrate.delete_many', new_callable=AsyncMock) as mock_delete:
+        moved = await migrate_damages_layout("embedded")
+
+    assert moved == 1
+    update_data = mock_update.call_args.args[2]
+    assert update_data["damages"] == [
+        {
+            "id": 7,
+            "part": "Door",
+            "severity": "LOW",
+            "image_url": "http://img.jpg",
+            "price": 10,
+            "score": 3,
+        }
+    ]
+    assert update_data["damages_spilled"] is False
+    mock_delete.assert_called_once_with("damages", {"_id": {"$in": [7]}})
+
+
+@pytest.mark.asyncio
+async def test_migrate_damages_to_separate(capsys):
+    """Test embedded damages move back to their own collection"""
+    claim = {"_id": 1, "title": "Claim", "damages": [{"id": 7, "part": "Door"}]}
+
+    with patch('app.migrate.find_many', new_callable=AsyncMock, return_value=[claim]), \
+         patch('app.migrate.insert_missing', new_callable=AsyncMock) as mock_insert, \
+         patch('app.migrate.unset_one', new_callable=AsyncMock) as mock_unset:
+        moved = await migrate_damages_layout("separate")
+
+    assert moved == 1
+    mock_insert.assert_called_once_with(
+        "damages", [{"_id": 7, "claim_id": 1, "deleted_at": None, "part": "Door"}]
+    )
+    mock_unset.assert_called_once_with(
+        "claims", {"_id": 1}, ["damages", "damages_spilled"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_migrate_damages_to_separate_resumes(memory_db, capsys):
+    """Test a run that died after copying the damages can be repeated"""
+    item = {"id": 7, "part": "Door"}
+    await memory_db["claims"].insert_one(
+        {"_id": 1, "title": "Claim", "damages": [item]}
+    )
+    await memory_db["damages"].insert_one(
+        {"_id": 7, "claim_id": 1, "deleted_at": None, "part": "Door"}
+    )
+
+    assert await migrate_damages_layout("separate") == 1
+    assert "damages" not in await memory_db["claims"].find_one({"_id": 1})
+    assert await memory_db["damages"].count_documents({}) == 1
+
+
+@pytest.mark.asyncio
+async def test_migrate_damages_invalid_target():
+    """Test unknown layouts are rejected"""
+    with pytest.raises(ValueError):
+        await migrate_damages_layout("other")
+
+
+@pytest.mark.asyncio
+async def test_migrate_money(memory_db, capsys):
+    """Test Decimal128 prices become Int64 cents in collections and embedded arrays"""
+    await memory_db["damages"].insert_many([
+        {"_id": 1, "claim_id": 1, "price": Decimal128("100.50")},
+        {"_id": 2, "claim_id": 1, "price": Int64(999)},
+    ])
+    await memory_db["claims_archive"].insert_one({"_id": 1, "damages": [
+        {"id": 3, "price": Decimal128("0.07")}, {"id": 4, "price": Int64(5)},
+    ]})
+
+    assert await migrate_money(batch_size=1) == 2
+    assert [d["price"] for d in await memory_db["damages"].find().to_list(None)] == [
+        10050,
+        999,
+    ]
+    archived = await memory_db["claims_archive"].find_one({"_id": 1})
+    assert [d["price"] for d in archived["damages"]] == [7, 5]
+    assert all(isinstance(d["price"], int) for d in archived["damages"])
+    assert "Documentos con precios en céntimos: 2" in capsys.readouterr().out
+
+    assert await migrate_money() == 0
+
+
+@pytest.fixture
+def tenants(monkeypatch):
+    monkeypatch.setattr(settings, "MULTI_TENANT", True)
+    monkeypatch.setattr(settings, "TENANTS", ["mapfre", "axa"])
+
+
+@pytest.mark.asyncio
+async def test_migration_runs_for_every_tenant(memory_db, tenants, capsys):
+    """Test a migration covers each tenant's collections, or only the one given"""
+    for tenant in ("mapfre", "axa"):
+        await memory_db[f"{tenant}.damages"].insert_one({"_id": 1, "claim_id": 1})
+
+    assert await for_tenants(migrate_soft_delete, "axa") == [1]
+    assert "deleted_at" not in await memory_db["mapfre.damages"].find_one({"_id": 1})
+
+    assert await for_tenants(migrate_soft_delete) == [1, 0]
+    assert (await memory_db["mapfre.damages"].find_one({"_id": 1}))[
+        "deleted_at"
+    ] is None
+    assert "Aseguradora: mapfre" in capsys.readouterr().out
+
+    with pytest.raises(ValueError):
+        await for_tenants(migrate_soft_delete, "zurich")
+
+
+@pytest.mark.asyncio
+async def test_migrate_money_every_tenant(memory_db, tenants, capsys):
+    """Test prices are converted in each tenant's collections, archive included"""
+    for tenant in ("mapfre", "axa"):
+        await memory_db[f"{tenant}.damages"].insert_one(
+            {"_id": 1, "claim_id": 1, "price": Decimal128("1.50")}
+        )
+        await memory_db[f"{tenant}.claims_archive"].insert_one(
+            {"_id": 1, "damages": [{"id": 2, "price": Decimal128("2.00")}]}
+        )
+
+    assert await for_tenants(migrate_money) == [2, 2]
+    for tenant in ("mapfre", "axa"):
+        assert (await memory_db[f"{tenant}.damages"].find_one({"_id": 1}))[
+            "price"
+        ] == 150
+        archived = await memory_db[f"{tenant}.claims_archive"].find_one({"_id": 1})
+        assert archived["damages"][0]["price"] == 200
@@ -6,6 +6,7 @@ from app.schemas.models import (
     DamageCreate, Damage,
     ClaimCreate, Claim
 )
+from app.core.money import Money
 
 
 def test_claim_status_enum():
@@ -23,8 +24,8 @@ def test_damage_severity_enum():
     assert DamageSeverity.HIGH == "HIGH"
 
 
-def test_normalize_price_from_float():
-    """Test normalize_price converts float to Decimal with 2 decimals"""
+def test_price_from_float():
+    """Test prices given as float become an amount with 2 decimals, kept as Money"""
     damage = DamageCreate(
         part="Bumper",
         severity=DamageSeverity.LOW,
@@ -32,12 +33,12 @@ def test_normalize_price_from_float():
         price=100.5,
         score=5
     )
-    assert damage.price == Decimal("100.50")
-    assert isinstance(damage.price, Decimal)
+    assert damage.price == Decimal("100.50") == 100.5
+    assert isinstance(damage.price, Money) and damage.price.cents == 10050
 
 
-def test_normalize_price_from_int():
-    """Test normalize_price converts int to Decimal with 2 decimals"""
+def test_price_from_int():
+    """Test prices given as int become an amount with 2 decimals"""
     damage = DamageCreate(
         part="Door",
         severity=DamageSeverity.MEDIUM,
@@ -48,8 +49,8 @@ def test_normalize_price_from_int():
     assert damage.price == Decimal("200.00")
 
 
-def test_normalize_price_from_string():
-    """Test normalize_price converts string to Decimal with 2 decimals"""
+def test_price_from_string():
+    """Test prices given as string become an amount with 2 decimals"""
     damage = DamageCreate(
         part="Hood",
         severity=DamageSeverity.HIGH,
@@ -60,8 +61,8 @@ def test_normalize_price_from_string():
     assert damage.price == Decimal("150.75")
 
 
-def test_normalize_price_from_decimal():
-    """Test normalize_price handles Decimal input"""
+def test_price_from_decimal():
+    """Test Decimal prices are rounded to cents"""
     damage = DamageCreate(
         part="Mirror",
         severity=DamageSeverity.LOW,
@@ -141,6 +142,20 @@ def test_damage_invalid_price_negative():
     assert "price" in str(exc_info.value)
 
 
+@pytest.mark.parametrize("price", ["abc", "NaN", None, True])
+def test_damage_invalid_price_not_an_amount(price):
+    """Test prices that are not amounts fail validation (422), not as a server error"""
+    with pytest.raises(ValidationError) as exc_info:
+        DamageCreate(
+            part="Bumper",
+            severity=DamageSeverity.LOW,
+            image_url="http://example.com/img.jpg",
+            price=price,
+            score=5
+        )
+    assert exc_info.value.errors()[0]["loc"] == ("price",)
+
+
 def test_claim_create_valid():
     """Test ClaimCreate with valid data"""
     claim = ClaimCreate(
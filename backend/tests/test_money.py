@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import pytest
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+
+from app.core import money
+from app.core.money import Money
+
+
+def test_parse_rounds_to_cents():
+    """Test amounts in any representation become integer cents"""
+    amounts = [Decimal("100.50"), Decimal128("0.07"), 19.99, "3", 2, Decimal("99.999")]
+    assert [Money.parse(a).cents for a in amounts] == [10050, 7, 1999, 300, 200, 10000]
+
+
+def test_arithmetic_and_comparisons():
+    """Test sums stay in integer cents and compare with Decimal amounts"""
+    total = sum([Money(10050), Money(25), Money(1)])
+
+    assert isinstance(total, Money) and total.cents == 10076
+    assert total == Decimal("100.76") and total != Decimal("100.77")
+    assert Money(500) == 5 and hash(Money(500)) == hash(Decimal("5.00"))
+    assert Money(1) < Money(2) <= Decimal("0.02") and Money(300) - Money(1) == Money(
+        299
+    )
+    assert str(Money(5)) == "0.05" and not Money()
+
+
+def test_float_comparisons_and_invalid_amounts():
+    """Test floats compare as written and non-amounts raise ValueError"""
+    assert Money(10050) == 100.5 and Money(10) == 0.1 and Money(10) < 0.11
+    assert Money(10) != float("nan") and Money(10) != "0.10"
+
+    for amount in ("abc", "inf", None, True):
+        with pytest.raises(ValueError):
+            Money.parse(amount)
+
+
+def test_documents():
+    """Test prices are stored as Int64 cents and legacy Decimal128 amounts still read"""
+    stored = money.to_document(Money.parse("12.30"))
+
+    assert isinstance(stored, Int64) and stored == 1230
+    assert (
+        money.from_document(stored)
+        == money.from_document(Decimal128("12.30"))
+        == Decimal("12.30")
+    )
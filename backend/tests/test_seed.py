@@ -0,0 +1,97 @@
+import io
+import random
+from datetime import datetime
+
+import pytest
+
+from app.core import money
+from app.core.config import settings
+from app.core.db import next_sequence
+from app.schemas.models import DamageCreate
+from app import seed
+
+
+def test_build_batch_respects_model_constraints():
+    """Test generated damages validate and match the claim business rules"""
+    profile = seed.Profile(damages="2:1", status="FINALIZED:1", severity="HIGH:1")
+    claims, damages = seed.build_batch(
+        random.Random(1), profile, 10, [2, 2, 2], 100, datetime.now()
+    )
+
+    assert [c["_id"] for c in claims] == [10, 11, 12]
+    assert [d["_id"] for d in damages] == list(range(100, 106))
+    assert [d["claim_id"] for d in damages] == [10, 10, 11, 11, 12, 12]
+    assert all(len(c["description"]) > 100 for c in claims)
+    for d in damages:
+        DamageCreate(**{**d, "price": money.from_document(d["price"])})
+        assert 7 <= d["score"] <= 10 and d["deleted_at"] is None
+
+
+def test_parse_weights():
+    """Test weight specs parse and reject nonsense"""
+    assert seed.parse_weights("0:1,3:2", int) == {0: 1.0, 3: 2.0}
+    with pytest.raises(ValueError):
+        seed.parse_weights("LOW:0")
+    with pytest.raises(ValueError):
+        seed.Profile(severity="CRITICAL:1")
+
+
+def test_parse_prices():
+    """Test price ranges parse to Money and reject nonsense"""
+    assert seed.parse_prices("LOW:20-400,HIGH:2000-15000.50") == {
+        "LOW": (money.Money(2000), money.Money(40000)),
+        "HIGH": (money.Money(200000), money.Money(1500050)),
+    }
+    for spec in ("LOW:400-20", "LOW:-5-10", "LOW:abc-10", "LOW:20"):
+        with pytest.raises(ValueError):
+            seed.parse_prices(spec)
+    with pytest.raises(ValueError):
+        seed.Profile(severity="LOW:1,HIGH:1", prices="LOW:1-2")
+    with pytest.raises(ValueError):
+        seed.Profile(prices="LOW:1-2,MEDIUM:1-2,HIGH:1-2,CRITICAL:1-2")
+
+    profile = seed.Profile(damages="3:1", severity="LOW:1", prices="LOW:10-10.25")
+    _, damages = seed.build_batch(random.Random(1), profile, 1, [3], 1, datetime.now())
+    assert all(1000 <= d["price"] <= 1025 for d in damages)
+
+
+@pytest.mark.asyncio
+async def test_generate_inserts_with_reserved_ids(memory_db):
+    """Test parallel batches land without taking IDs the API will hand out"""
+    claims, damages = await seed.generate(
+        25, seed.Profile(damages="1:1,3:1"), batch_size=10, seed=7
+    )
+
+    assert claims == 25
+    assert await memory_db["claims"].count_documents({}) == 25
+    assert await memory_db["damages"].count_documents({}) == damages
+    assert await next_sequence("claims") == 26
+    assert await next_sequence("damages") == damages + 1
+
+
+@pytest.mark.asyncio
+async def test_generate_embedded(memory_db, monkeypatch):
+    """Test damages go inside the claim in embedded mode"""
+    monkeypatch.setattr(settings, "DAMAGES_STORAGE", "embedded")
+    await seed.generate(5, seed.Profile(damages="2:1"), seed=7)
+
+    docs = await memory_db["claims"].find({}).to_list(None)
+    assert [len(d["damages"]) for d in docs] == [2] * 5
+    assert await memory_db["damages"].count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_fixture_round_trip(memory_db):
+    """Test a fixture file written without a database loads back identically"""
+    fixture = io.StringIO()
+    claims, damages = await seed.generate(
+        12, batch_size=5, seed=3, output=fixture, insert=False
+    )
+
+    fixture.seek(0)
+    loaded = await seed.load(fixture, batch_size=5)
+
+    assert loaded == {"claims": claims, "damages": damages}
+    assert await next_sequence("claims") == claims + 1
+    first = await memory_db["claims"].find_one({"_id": 1})
+    assert first["status_changed_at"].tzinfo is None
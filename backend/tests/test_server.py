@@ -0,0 +1,61 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app import server
+from app.core.config import settings
+from app.core.db import pool_size_per_worker
+
+
+@pytest.fixture(autouse=True)
+def restore_workers(monkeypatch):
+    """main() exports the worker count; keep it out of other tests"""
+    monkeypatch.setattr(settings, "SERVER_WORKERS", settings.SERVER_WORKERS)
+    monkeypatch.setenv("SERVER_WORKERS", str(settings.SERVER_WORKERS))
+
+
+def test_resolve_workers():
+    """Test 0 workers means one per CPU core"""
+    assert server.resolve_workers(3) == 3
+    with patch("app.server.os.cpu_count", return_value=8):
+        assert server.resolve_workers(0) == 8
+    with patch("app.server.os.cpu_count", return_value=None):
+        assert server.resolve_workers(0) == 1
+
+
+def test_loop_and_http_fallback():
+    """Test asyncio/h11 are used when uvloop/httptools are not installed"""
+    with patch("app.server.importlib.util.find_spec", return_value=None):
+        assert server.best_loop() == "asyncio"
+        assert server.best_http() == "h11"
+    with patch("app.server.importlib.util.find_spec", return_value=object()):
+        assert server.best_loop() == "uvloop"
+        assert server.best_http() == "httptools"
+
+
+def test_main_runs_uvicorn_workers():
+    """Test python -m app starts uvicorn with the requested workers"""
+    with patch("app.server.uvicorn.run") as mock_run:
+        server.main(["--workers", "4", "--port", "9000"])
+
+    args, kwargs = mock_run.call_args
+    assert args == ("app.main:app",)
+    assert kwargs["workers"] == 4
+    assert kwargs["port"] == 9000
+    assert kwargs["lifespan"] == "on"
+    assert kwargs["timeout_graceful_shutdown"] == settings.SERVER_GRACEFUL_TIMEOUT
+    # Worker processes read the count back when sizing their Mongo pool
+    assert os.environ["SERVER_WORKERS"] == "4"
+
+
+def test_pool_size_per_worker(monkeypatch):
+    """Test the Mongo connection budget is split between workers"""
+    monkeypatch.setattr(settings, "MONGO_MAX_POOL_SIZE", 100)
+
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 1)
+    assert pool_size_per_worker() == 100
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 4)
+    assert pool_size_per_worker() == 25
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 500)
+    assert pool_size_per_worker() == 1
@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+import httpx
+from unittest.mock import Mock
+
+from app.main import app
+from app.core.config import settings
+from app.core.db import mongodb, find_one, find_many, update_one
+from app.core.singleflight import SingleFlight, normalise, reads
+import app.api.routes.claims as claims_module
+
+
+class SlowCollection:
+    """Collection stand-in that counts queries and answers after a short delay"""
+
+    def __init__(self):
+        self.queries = 0
+        self.doc = {"_id": 1, "status": "PENDING"}
+
+    async def find_one(self, filter_query):
+        self.queries += 1
+        snapshot = dict(self.doc)
+        await asyncio.sleep(0.01)
+        return snapshot
+
+    def find(self, filter_query):
+        cursor = Mock()
+        cursor.limit.return_value = cursor
+
+        async def to_list(length=None):
+            self.queries += 1
+            await asyncio.sleep(0.01)
+            return [dict(self.doc)]
+
+        cursor.to_list = to_list
+        return cursor
+
+    async def update_one(self, filter_query, update):
+        self.doc.update(update["$set"])
+        result = Mock()
+        result.modified_count = 1
+        return result
+
+
+@pytest.fixture
+def slow_collection():
+    collection = SlowCollection()
+    mongodb.db = {"claims": collection}
+    yield collection
+    mongodb.db = None
+
+
+def test_normalise_ignores_key_order():
+    """Test filters with the same content share a key"""
+    assert normalise({"a": 1, "b": {"c": 2, "d": 3}}) == normalise(
+        {"b": {"d": 3, "c": 2}, "a": 1}
+    )
+    assert normalise({"a": 1}) != normalise({"a": "1"})
+    assert normalise(None) == normalise({})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_find_one_share_query(slow_collection):
+    """Test identical concurrent lookups issue a single query"""
+    results = await asyncio.gather(*[find_one("claims", {"_id": 1}) for _ in range(10)])
+
+    assert slow_collection.queries == 1
+    assert all(r == {"_id": 1, "status": "PENDING"} for r in results)
+    assert len({id(r) for r in results}) == 10
+    assert len(reads) == 0
+
+
+@pytest.mark.asyncio
+async def test_different_filters_not_coalesced(slow_collection):
+    """Test different filters or limits run separately"""
+    await asyncio.gather(
+        find_many("claims", {"status": "PENDING"}),
+        find_many("claims", {"status": "PENDING"}, limit=1),
+        find_many("claims", {"status": "FINALIZED"}),
+    )
+
+    assert slow_collection.queries == 3
+
+
+@pytest.mark.asyncio
+async def test_write_detaches_in_flight_reads(slow_collection):
+    """Test reads started after a write do not join a read started before it"""
+    before = asyncio.create_task(find_one("claims", {"_id": 1}))
+    await asyncio.sleep(0)
+    await update_one("claims", {"_id": 1}, {"status": "IN_REVIEW"})
+    after = await find_one("claims", {"_id": 1})
+
+    assert (await before)["status"] == "PENDING"
+    assert after["status"] == "IN_REVIEW"
+    assert slow_collection.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_disabled(slow_collection, monkeypatch):
+    """Test SINGLE_FLIGHT_READS=False queries every time"""
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_READS", False)
+    await asyncio.gather(*[find_one("claims", {"_id": 1}) for _ in range(3)])
+
+    assert slow_collection.queries == 3
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached():
+    """Test a failing leader fails its followers and the next call retries"""
+    flight = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        *[flight.do("k", failing) for _ in range(3)], return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(calls) == 1
+
+    with pytest.raises(RuntimeError):
+        await flight.do("k", failing)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over():
+    """Test followers run the query themselves if the leader is cancelled"""
+    flight = SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    leader = asyncio.create_task(flight.do("k", slow))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", slow))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "ok"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_claim_coalesced(monkeypatch):
+    """Test concurrent GET /claims/{id} share one claim and one damages query"""
+    calls = []
+
+    async def mock_execute_one(collection, filter_query):
+        calls.append(collection)
+        await asyncio.sleep(0.01)
+        return {"_id": 1, "title": "Claim 1", "status": "PENDING"}
+
+    async def mock_execute_query(collection, filter_query=None, read_method=None):
+        calls.append(collection)
+        return []
+
+    monkeypatch.setattr(claims_module, "execute_one", mock_execute_one)
+    monkeypatch.setattr(claims_module, "execute_query", mock_execute_query)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(
+            *[client.get("/api/v1/claims/1") for _ in range(5)]
+        )
+
+    assert all(r.status_code == 200 for r in responses)
+    assert calls == ["claims", "damages"]
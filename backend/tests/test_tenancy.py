@@ -0,0 +1,182 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.db import get_collection, mongodb
+from app.core.singleflight import SingleFlight
+from app.core.tenancy import (
+    TenantMiddleware, collection_name, current_tenant, tenant_scope
+)
+import app.core.audit as audit_module
+import app.core.jobs as jobs_module
+
+
+@pytest.fixture
+def tenants(monkeypatch):
+    monkeypatch.setattr(settings, "TENANTS", ["mapfre", "axa"])
+
+
+def test_collection_name():
+    """Test tenant collections are prefixed, shared ones are not"""
+    assert collection_name("claims") == "claims"
+    with tenant_scope("axa"):
+        assert collection_name("claims") == "axa.claims"
+        assert collection_name("jobs") == "jobs"
+    assert current_tenant() is None
+
+
+def test_get_collection_is_tenant_scoped():
+    """Test each tenant reads its own physical collection"""
+    mongodb.db = {"claims": "shared", "axa.claims": "axa", "mapfre.claims": "mapfre"}
+    try:
+        with tenant_scope("axa"):
+            assert get_collection("claims") == "axa"
+        with tenant_scope("mapfre"):
+            assert get_collection("claims") == "mapfre"
+        assert get_collection("claims") == "shared"
+    finally:
+        mongodb.db = None
+
+
+async def _echo_tenant(scope, receive, send):
+    await JSONResponse({"tenant": current_tenant()})(scope, receive, send)
+
+
+@pytest.mark.asyncio
+async def test_middleware_resolves_tenant(tenants):
+    """Test the header selects the tenant and prepare runs once per tenant"""
+    prepared = []
+
+    async def prepare():
+        prepared.append(current_tenant())
+
+    app = TenantMiddleware(_echo_tenant, prefix="/api", prepare=prepare)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        for _ in range(2):
+            response = await ac.get("/api/claims", headers={"X-Tenant-ID": "axa"})
+            assert response.json() == {"tenant": "axa"}
+        response = await ac.get("/health")
+
+    assert response.json() == {"tenant": None}
+    assert prepared == ["axa"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_missing_or_unknown_tenant(tenants):
+    """Test requests without a known tenant never reach the API"""
+    app = TenantMiddleware(_echo_tenant, prefix="/api")
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        missing = await ac.get("/api/claims")
+        unknown = await ac.get("/api/claims", headers={"X-Tenant-ID": "zurich"})
+
+    assert missing.status_code == 400
+    assert unknown.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_middleware_exempt_paths(tenants):
+    """Test shared paths (thumbnails) are served without a tenant header"""
+    app = TenantMiddleware(
+        _echo_tenant, prefix="/api", exempt=["/api/damages/thumbnails/"]
+    )
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        thumbnail = await ac.get("/api/damages/thumbnails/abc.jpg")
+        damages = await ac.get("/api/damages/")
+
+    assert thumbnail.json() == {"tenant": None}
+    assert damages.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_singleflight_not_shared_across_tenants():
+    """Test the same query from two tenants runs twice"""
+    flight = SingleFlight()
+    calls = []
+
+    async def query():
+        calls.append(current_tenant())
+        await asyncio.sleep(0.01)
+        return current_tenant()
+
+    async def as_tenant(tenant):
+        with tenant_scope(tenant):
+            return await flight.do("claims:find", query)
+
+    results = await asyncio.gather(
+        as_tenant("axa"), as_tenant("axa"), as_tenant("mapfre")
+    )
+
+    assert results == ["axa", "axa", "mapfre"]
+    assert sorted(calls) == ["axa", "mapfre"]
+
+
+@pytest.mark.asyncio
+async def test_audit_flush_writes_to_each_tenant(monkeypatch):
+    """Test buffered events are written to the collection of their tenant"""
+    batches = []
+
+    async def mock_insert_many(collection, documents):
+        batches.append(
+            (collection_name(collection), [d["claim_id"] for d in documents])
+        )
+
+    monkeypatch.setattr(audit_module, "insert_many", mock_insert_many)
+    writer = audit_module.AuditWriter()
+    for tenant, claim_id in (("axa", 1), ("axa", 2), ("mapfre", 1)):
+        with tenant_scope(tenant):
+            writer.record(claim_id, "PENDING", "IN_REVIEW")
+
+    with tenant_scope("mapfre"):
+        assert [e["claim_id"] for e in writer.pending(1)] == [1]
+        assert writer.pending(2) == []
+
+    await writer.flush()
+    assert batches == [("axa.claim_events", [1, 2]), ("mapfre.claim_events", [1])]
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_for_their_tenant(monkeypatch):
+    """Test a job keeps the tenant that enqueued it and keys do not collide"""
+    docs = {}
+
+    async def insert_one(collection, document):
+        docs[document["_id"]] = dict(document)
+
+    async def find_one_and_update(collection, filter_query, update, sort=None):
+        pending = [d for d in docs.values() if d["status"] == "pending"]
+        if not pending:
+            return None
+        pending[0].update(status="running", attempts=1)
+        return dict(pending[0])
+
+    async def update_one(collection, filter_query, update_data):
+        docs[filter_query["_id"]].update(update_data)
+
+    monkeypatch.setattr(jobs_module, "insert_one", insert_one)
+    monkeypatch.setattr(jobs_module, "find_one_and_update", find_one_and_update)
+    monkeypatch.setattr(jobs_module, "update_one", update_one)
+    monkeypatch.setattr(jobs_module, "_handlers", {})
+    seen = []
+
+    @jobs_module.job_handler("notify")
+    async def notify(payload):
+        seen.append(current_tenant())
+
+    queue = jobs_module.JobQueue()
+    for tenant in ("axa", "mapfre"):
+        with tenant_scope(tenant):
+            await queue.enqueue("notify", {"claim_id": 1}, key="notify:1")
+
+    assert set(docs) == {"axa:notify:1", "mapfre:notify:1"}
+    while await queue.run_next():
+        pass
+    assert seen == ["axa", "mapfre"]
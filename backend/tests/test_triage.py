@@ -0,0 +1,107 @@
+import math
+import random
+
+import httpx
+import pytest
+
+from app.main import app
+from app.core import triage
+from app.core.compact import DamageTable
+from app.core.config import settings
+from app import seed
+
+np = pytest.importorskip("numpy")
+
+
+def _expected(damages, k):
+    """Reference ranking, one damage at a time"""
+    totals, counts = {}, {}
+    for claim_id, severity, score, price in damages:
+        priority = (
+            settings.TRIAGE_SEVERITY_WEIGHTS[severity]
+            + settings.TRIAGE_SCORE_WEIGHT * score
+            + settings.TRIAGE_PRICE_WEIGHT * math.log1p(price)
+        )
+        totals[claim_id] = totals.get(claim_id, 0.0) + priority
+        counts[claim_id] = counts.get(claim_id, 0) + 1
+    ranked = sorted(totals, key=lambda c: (-totals[c], c))[:k]
+    return [(c, pytest.approx(totals[c]), counts[c]) for c in ranked]
+
+
+@pytest.mark.parametrize("id_scale", [1, 10 ** 9])
+def test_rank_matches_reference(id_scale):
+    """Test the vectorised ranking, for dense and sparse claim ids"""
+    rng = random.Random(3)
+    damages = [
+        (
+            rng.randint(1, 200) * id_scale,
+            rng.choice(triage.SEVERITIES),
+            rng.randint(1, 10),
+            rng.uniform(0, 5000),
+        )
+        for _ in range(2000)
+    ]
+    table = DamageTable()
+    for i, (claim_id, severity, score, price) in enumerate(damages):
+        table.add_document(
+            {"id": i, "severity": severity, "score": score, "price": price},
+            claim_id=claim_id,
+        )
+
+    assert triage.rank(*triage.columns(table), 10) == _expected(damages, 10)
+    assert len(triage.rank(*triage.columns(table), 10_000)) == len(
+        {d[0] for d in damages}
+    )
+    assert triage.rank(*triage.columns(DamageTable()), 10) == []
+
+
+def test_rank_ties_by_lower_id():
+    """Test claims with the same priority keep a stable order"""
+    ids = np.array([5, 3, 9], dtype=np.int64)
+    same = np.zeros(3)
+
+    assert [
+        r[0] for r in triage.rank(ids, np.zeros(3, dtype=np.int8), same, same, 2)
+    ] == [3, 5]
+
+
+async def _triage(path):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["separate", "embedded"])
+async def test_triage_endpoint(memory_db, monkeypatch, storage):
+    """Test GET /claims:triage ranks only live damages of PENDING claims"""
+    monkeypatch.setattr(settings, "DAMAGES_STORAGE", storage)
+    await seed.generate(60, seed.Profile(damages="1:1,3:1"), batch_size=25, seed=9)
+
+    damages = []
+    for claim in await memory_db["claims"].find({"status": "PENDING"}).to_list(None):
+        items = claim.get("damages") or await memory_db["damages"].find(
+            {"claim_id": claim["_id"]}
+        ).to_list(None)
+        damages += [
+            (claim["_id"], d["severity"], d["score"], d["price"] / 100) for d in items
+        ]
+
+    response = await _triage("/api/v1/claims:triage?k=5")
+
+    assert response.status_code == 200
+    assert [
+        (r["id"], r["priority"], r["damage_count"]) for r in response.json()
+    ] == _expected(damages, 5)
+
+
+@pytest.mark.asyncio
+async def test_triage_validates_k(monkeypatch):
+    """Test k is bounded and a missing NumPy is reported"""
+    assert (await _triage("/api/v1/claims:triage?k=0")).status_code == 400
+    assert (
+        await _triage(f"/api/v1/claims:triage?k={settings.TRIAGE_MAX_K + 1}")
+    ).status_code == 400
+
+    monkeypatch.setattr(triage, "np", None)
+    assert (await _triage("/api/v1/claims:triage")).status_code == 503